@@ -0,0 +1,13 @@
+"""ProDy benchmarks, to be run with `airspeed velocity
+<https://asv.readthedocs.io/>`_ from the :file:`benchmarks` folder::
+
+  asv run
+  asv compare master HEAD
+
+or without :program:`asv`, using :file:`benchmarks/run.py`::
+
+  python run.py --max-size 10000 --save baseline.json
+  python run.py --max-size 10000 --compare baseline.json
+
+Benchmarks report time and peak memory for synthetic systems from 1k to 1M
+atoms, which are generated by :mod:`.synthetic` on first use."""
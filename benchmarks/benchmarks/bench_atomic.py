@@ -0,0 +1,28 @@
+"""Benchmarks for atom selections."""
+
+from prody import Select
+
+from .common import withPeakMemory
+from .synthetic import SIZES, buildAtoms
+
+SELECTIONS = {
+    'keyword': 'calpha',
+    'names': 'name CA CB and resname ALA LEU VAL',
+    'ranges': 'chain A B and resnum 10 to 200',
+    'numeric': 'x > 20 and y < 40 and beta > 30',
+    'within': 'within 5 of (resnum 100 and name CA)',
+}
+
+
+@withPeakMemory
+class SelectAtoms(object):
+
+    params = (SIZES, sorted(SELECTIONS))
+    param_names = ['n_atoms', 'selection']
+
+    def setup(self, n_atoms, selection):
+        self.atoms = buildAtoms(n_atoms)
+        self.select = Select()
+
+    def time_select(self, n_atoms, selection):
+        self.select.select(self.atoms, SELECTIONS[selection])
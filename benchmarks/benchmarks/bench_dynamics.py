@@ -0,0 +1,75 @@
+"""Benchmarks for building elastic network models and calculating modes.
+Networks are built for Cα atoms, so number of nodes is one fifth of
+*n_atoms*."""
+
+from prody import ANM, GNM, PCA
+
+from .common import withPeakMemory, skip
+from .synthetic import SIZES, buildAtoms, buildConformations, RESIDUE
+
+DENSE_NODES = 10000
+
+
+def _calphas(n_atoms):
+    return buildAtoms(n_atoms).select('calpha').getCoords()
+
+
+@withPeakMemory
+class BuildHessian(object):
+
+    params = ([1000, 10000], [False, True])
+    param_names = ['n_atoms', 'sparse']
+    timeout = 600
+
+    def setup(self, n_atoms, sparse):
+        self.coords = _calphas(n_atoms)
+
+    def time_buildHessian(self, n_atoms, sparse):
+        ANM().buildHessian(self.coords, sparse=sparse)
+
+
+@withPeakMemory
+class CalcANMModes(object):
+
+    params = ([1000, 5000], [False, True])
+    param_names = ['n_atoms', 'sparse']
+    timeout = 600
+
+    def setup(self, n_atoms, sparse):
+        if sparse and n_atoms > 1000:
+            skip('sparse eigensolver converges slowly for large networks')
+        self.anm = ANM()
+        self.anm.buildHessian(_calphas(n_atoms), sparse=sparse)
+
+    def time_calcModes(self, n_atoms, sparse):
+        self.anm.calcModes(20)
+
+
+@withPeakMemory
+class BuildKirchhoff(object):
+
+    params = (SIZES, [False, True])
+    param_names = ['n_atoms', 'sparse']
+    timeout = 600
+
+    def setup(self, n_atoms, sparse):
+        if not sparse and n_atoms // len(RESIDUE) > DENSE_NODES:
+            skip('dense Kirchhoff matrix is too large')
+        self.coords = _calphas(n_atoms)
+
+    def time_buildKirchhoff(self, n_atoms, sparse):
+        GNM().buildKirchhoff(self.coords, sparse=sparse)
+
+
+@withPeakMemory
+class BuildCovariance(object):
+
+    params = ([1000, 10000], [100, 1000])
+    param_names = ['n_atoms', 'n_confs']
+    timeout = 600
+
+    def setup(self, n_atoms, n_confs):
+        self.coordsets = buildConformations(n_atoms // len(RESIDUE), n_confs)
+
+    def time_buildCovariance(self, n_atoms, n_confs):
+        PCA().buildCovariance(self.coordsets)
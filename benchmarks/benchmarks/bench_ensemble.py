@@ -0,0 +1,20 @@
+"""Benchmarks for superposing ensembles."""
+
+from .common import withPeakMemory, quiet
+from .synthetic import SIZES, buildEnsemble
+
+
+@withPeakMemory
+class Iterpose(object):
+
+    params = (SIZES[:-1], [10, 100])
+    param_names = ['n_atoms', 'n_confs']
+    number = 1
+    timeout = 600
+
+    def setup(self, n_atoms, n_confs):
+        self.ensemble = buildEnsemble(n_atoms, n_confs)
+
+    @quiet
+    def time_iterpose(self, n_atoms, n_confs):
+        self.ensemble.iterpose()
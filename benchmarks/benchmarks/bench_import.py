@@ -0,0 +1,47 @@
+"""Benchmarks for the time it takes to import ProDy, and to resolve public
+names that import subpackages on first access.  Each statement is timed in
+a new interpreter.  Without :program:`asv`, run this module as a script to
+print median times."""
+
+import sys
+import timeit
+from subprocess import check_call
+
+STATEMENTS = {
+    'import_prody': 'import prody',
+    'import_parsePDB': 'import prody; prody.parsePDB',
+    'import_ANM': 'import prody; prody.ANM',
+    'import_star': 'from prody import *',
+}
+
+
+class TimeImport(object):
+
+    def timeraw_import_prody(self):
+        return STATEMENTS['import_prody']
+
+    def timeraw_import_parsePDB(self):
+        return STATEMENTS['import_parsePDB']
+
+    def timeraw_import_ANM(self):
+        return STATEMENTS['import_ANM']
+
+    def timeraw_import_star(self):
+        return STATEMENTS['import_star']
+
+
+def timeImport(statement, repeat=5):
+    """Returns median time of running *statement* in a new interpreter, less
+    the time of starting an interpreter that imports :mod:`numpy`."""
+
+    def run(code):
+        timer = timeit.Timer(lambda: check_call([sys.executable, '-c', code]))
+        times = sorted(timer.repeat(repeat, 1))
+        return times[len(times) // 2]
+
+    return run(statement) - run('import numpy')
+
+
+if __name__ == '__main__':
+    for name, statement in sorted(STATEMENTS.items()):
+        print('{0:20s} {1:8.3f} s'.format(name, timeImport(statement)))
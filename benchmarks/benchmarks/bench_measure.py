@@ -0,0 +1,37 @@
+"""Benchmarks for identifying contacts."""
+
+from prody import findNeighbors, findNeighborArrays, buildContactMap
+
+from .common import withPeakMemory
+from .synthetic import SIZES, buildAtoms
+
+
+@withPeakMemory
+class FindNeighbors(object):
+
+    params = SIZES
+    param_names = ['n_atoms']
+    timeout = 600
+
+    def setup(self, n_atoms):
+        self.atoms = buildAtoms(n_atoms)
+
+    def time_findNeighborArrays(self, n_atoms):
+        findNeighborArrays(self.atoms, 4.5)
+
+    def time_buildContactMap(self, n_atoms):
+        buildContactMap(self.atoms, 4.5, sparse=True)
+
+
+@withPeakMemory
+class FindNeighborAtoms(object):
+
+    params = SIZES[:2]
+    param_names = ['n_atoms']
+    timeout = 600
+
+    def setup(self, n_atoms):
+        self.atoms = buildAtoms(n_atoms)
+
+    def time_findNeighbors(self, n_atoms):
+        findNeighbors(self.atoms, 4.5)
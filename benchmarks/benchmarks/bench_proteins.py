@@ -0,0 +1,72 @@
+"""Benchmarks for parsing structure files, and for matching chains and
+building ensembles from homologous structures."""
+
+from prody import parsePDB, parseCIF, matchChains, buildPDBEnsemble
+
+from .common import withPeakMemory, quiet
+from .synthetic import SIZES, pathPDB, pathCIF, buildAtoms, buildHomologs
+
+
+@withPeakMemory
+class ParsePDB(object):
+
+    params = SIZES
+    param_names = ['n_atoms']
+    timeout = 600
+
+    def setup(self, n_atoms):
+        self.filename = pathPDB(n_atoms)
+
+    def time_parsePDB(self, n_atoms):
+        parsePDB(self.filename)
+
+    def time_parsePDB_calpha(self, n_atoms):
+        parsePDB(self.filename, subset='ca')
+
+
+@withPeakMemory
+class ParseCIF(object):
+
+    params = SIZES[:-1]
+    param_names = ['n_atoms']
+    timeout = 600
+
+    def setup(self, n_atoms):
+        self.filename = pathCIF(n_atoms)
+
+    def time_parseCIF(self, n_atoms):
+        parseCIF(self.filename)
+
+
+@withPeakMemory
+class MatchChains(object):
+
+    params = SIZES[:-1]
+    param_names = ['n_atoms']
+    timeout = 600
+
+    def setup(self, n_atoms):
+        self.atoms = buildAtoms(n_atoms)
+        self.homolog = buildHomologs(n_atoms, 1)[0]
+
+    def time_matchChains(self, n_atoms):
+        matchChains(self.atoms, self.homolog)
+
+
+@withPeakMemory
+class BuildPDBEnsemble(object):
+
+    params = ([1000, 10000], [10, 50])
+    param_names = ['n_atoms', 'n_structures']
+    timeout = 600
+
+    def setup(self, n_atoms, n_structures):
+        self.structures = [buildAtoms(n_atoms)]
+        self.structures.extend(buildHomologs(n_atoms, n_structures - 1))
+        ensemble = quiet(buildPDBEnsemble)(self.structures)
+        assert ensemble.numConfs() == n_structures, \
+            'all homologs must map onto the reference'
+
+    @quiet
+    def time_buildPDBEnsemble(self, n_atoms, n_structures):
+        buildPDBEnsemble(self.structures)
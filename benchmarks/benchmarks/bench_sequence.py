@@ -0,0 +1,34 @@
+"""Benchmarks for coevolution analysis of multiple sequence alignments."""
+
+from prody import buildMutinfoMatrix, buildDirectInfoMatrix
+
+from .common import withPeakMemory
+from .synthetic import buildMSA
+
+
+@withPeakMemory
+class BuildMutinfoMatrix(object):
+
+    params = ([100, 1000, 10000], [100, 300])
+    param_names = ['n_sequences', 'length']
+    timeout = 600
+
+    def setup(self, n_sequences, length):
+        self.msa = buildMSA(n_sequences, length)
+
+    def time_buildMutinfoMatrix(self, n_sequences, length):
+        buildMutinfoMatrix(self.msa)
+
+
+@withPeakMemory
+class BuildDirectInfoMatrix(object):
+
+    params = ([100, 1000], [50, 150])
+    param_names = ['n_sequences', 'length']
+    timeout = 600
+
+    def setup(self, n_sequences, length):
+        self.msa = buildMSA(n_sequences, length)
+
+    def time_buildDirectInfoMatrix(self, n_sequences, length):
+        buildDirectInfoMatrix(self.msa)
@@ -0,0 +1,30 @@
+"""Benchmarks for reading DCD files.  Number of frames decreases with
+*n_atoms*, so that each file has about ten million coordinates."""
+
+from prody import DCDFile
+
+from .common import withPeakMemory
+from .synthetic import SIZES, pathDCD, numFrames
+
+
+@withPeakMemory
+class ReadDCD(object):
+
+    params = SIZES
+    param_names = ['n_atoms']
+    timeout = 600
+
+    def setup(self, n_atoms):
+        self.filename = pathDCD(n_atoms, numFrames(n_atoms))
+
+    def time_getCoordsets(self, n_atoms):
+        dcd = DCDFile(self.filename)
+        dcd.getCoordsets()
+        dcd.close()
+
+    def time_nextCoordset(self, n_atoms):
+        dcd = DCDFile(self.filename)
+        coords = dcd.nextCoordset()
+        while coords is not None:
+            coords = dcd.nextCoordset()
+        dcd.close()
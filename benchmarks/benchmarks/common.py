@@ -0,0 +1,51 @@
+"""This module defines helpers shared by benchmark modules.  Importing it
+limits log messages to warnings.  Progress bars switch verbosity to
+*progress* while they run, so benchmarks of functions that report progress
+are wrapped with :func:`quiet`."""
+
+import os
+import sys
+from functools import wraps
+
+from prody import LOGGER
+
+__all__ = ['withPeakMemory', 'quiet', 'skip']
+
+
+def withPeakMemory(cls):
+    """Class decorator that adds a ``peakmem_`` benchmark for each ``time_``
+    benchmark of *cls*, so that time and peak memory are reported for the
+    same operations and sizes."""
+
+    for name, method in list(vars(cls).items()):
+        if name.startswith('time_'):
+            peakmem = 'peakmem_' + name[len('time_'):]
+            if peakmem not in vars(cls):
+                setattr(cls, peakmem, method)
+    return cls
+
+
+def quiet(method):
+    """Decorator that redirects ``sys.stderr`` to :data:`os.devnull` while
+    *method* runs, so that progress bars are not written during timing."""
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        stderr = sys.stderr
+        with open(os.devnull, 'w') as devnull:
+            sys.stderr = devnull
+            try:
+                return method(*args, **kwargs)
+            finally:
+                sys.stderr = stderr
+    return wrapper
+
+
+def skip(reason):
+    """Raises :exc:`NotImplementedError`, which marks a parameter combination
+    as skipped when raised from ``setup``."""
+
+    raise NotImplementedError(reason)
+
+
+LOGGER.verbosity = 'warning'
@@ -0,0 +1,284 @@
+"""This module defines functions that generate synthetic, size-parameterized
+inputs for benchmarks, so that no files need to be downloaded.  Structures
+are protein-like: chains of 500 residues with five atoms each (N, CA, C, O,
+CB) that fill space at protein density, so systems from 1k to 1M atoms have
+realistic numbers of neighbors.  Files are written once into a data folder,
+:file:`benchmarks/data` or the folder set by :envvar:`PRODY_BENCHMARK_DATA`,
+and reused in later runs."""
+
+import os
+from os.path import abspath, dirname, isdir, isfile, join
+
+import numpy as np
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+RESIDUE = ['N', 'CA', 'C', 'O', 'CB']
+ELEMENTS = ['N', 'C', 'C', 'O', 'C']
+BONDS = [1.46, 0., 1.52, 2.40, 1.53]
+RESNAMES = ['ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLN', 'GLU', 'HIS', 'ILE',
+            'LEU', 'LYS', 'MET', 'PHE', 'PRO', 'SER', 'THR', 'TRP', 'TYR',
+            'VAL']
+ALPHABET = 'ACDEFGHIKLMNPQRSTVWY-'
+CHAINIDS = ('ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+            'abcdefghijklmnopqrstuvwxyz0123456789')
+
+CHAIN_LENGTH = 500
+RESIDUE_VOLUME = 135.
+
+_CACHE = {}
+
+
+def pathData(filename=None):
+    """Returns path to the benchmark data folder, or to *filename* in it.
+    The folder is made if it does not exist."""
+
+    folder = os.environ.get('PRODY_BENCHMARK_DATA',
+                            join(dirname(dirname(abspath(__file__))), 'data'))
+    if not isdir(folder):
+        os.makedirs(folder)
+    if filename is None:
+        return folder
+    return join(folder, filename)
+
+
+def _randomWalk(n_steps, box, random):
+    """Returns a random walk with 3.8 A steps that is reflected back into a
+    cubic *box*."""
+
+    steps = random.normal(size=(n_steps, 3))
+    steps *= 3.8 / np.sqrt((steps ** 2).sum(1))[:, np.newaxis]
+    walk = np.empty((n_steps, 3))
+    position = random.uniform(0, box, 3)
+    for i in range(n_steps):
+        position = position + steps[i]
+        position = np.abs(position)
+        position = box - np.abs(box - position)
+        walk[i] = position
+    return walk
+
+
+def buildCoords(n_atoms, seed=0):
+    """Returns coordinates of a protein-like system with *n_atoms* atoms.
+    Chains are random walks of Cα atoms, each confined to its own box of
+    protein density, and boxes are laid out on a cubic grid."""
+
+    random = np.random.RandomState(seed)
+    n_res = -(-n_atoms // len(RESIDUE))
+    n_chains = -(-n_res // CHAIN_LENGTH)
+    box = (CHAIN_LENGTH * RESIDUE_VOLUME) ** (1. / 3)
+    n_grid = int(np.ceil(n_chains ** (1. / 3)))
+
+    calphas = np.empty((n_res, 3))
+    for chain in range(n_chains):
+        start = chain * CHAIN_LENGTH
+        stop = min(start + CHAIN_LENGTH, n_res)
+        corner = np.array([chain % n_grid, chain // n_grid % n_grid,
+                           chain // n_grid ** 2]) * box
+        calphas[start:stop] = corner + _randomWalk(stop - start, box, random)
+
+    offsets = random.normal(size=(n_res, len(RESIDUE), 3))
+    offsets *= (np.array(BONDS) /
+                np.sqrt((offsets ** 2).sum(2)))[:, :, np.newaxis]
+    coords = calphas[:, np.newaxis] + offsets
+    return coords.reshape((-1, 3))[:n_atoms]
+
+
+def buildAtoms(n_atoms, seed=0):
+    """Returns an :class:`.AtomGroup` of a protein-like system with *n_atoms*
+    atoms, see :func:`buildCoords`."""
+
+    key = ('atoms', n_atoms, seed)
+    if key in _CACHE:
+        return _CACHE[key].copy()
+
+    from prody import AtomGroup
+
+    random = np.random.RandomState(seed)
+    n_res = -(-n_atoms // len(RESIDUE))
+    residues = np.arange(n_res)
+    chains = residues // CHAIN_LENGTH
+
+    atoms = AtomGroup('synthetic {0}'.format(n_atoms))
+    atoms.setCoords(buildCoords(n_atoms, seed))
+    atoms.setNames(np.tile(RESIDUE, n_res)[:n_atoms])
+    atoms.setElements(np.tile(ELEMENTS, n_res)[:n_atoms])
+    resnames = np.array(RESNAMES)[random.randint(len(RESNAMES), size=n_res)]
+    atoms.setResnames(np.repeat(resnames, len(RESIDUE))[:n_atoms])
+    atoms.setResnums(np.repeat(residues % CHAIN_LENGTH + 1,
+                               len(RESIDUE))[:n_atoms])
+    chids = np.array(list(CHAINIDS))[chains % len(CHAINIDS)]
+    atoms.setChids(np.repeat(chids, len(RESIDUE))[:n_atoms])
+    segnames = np.array(['S{0:03d}'.format(i % 1000)
+                         for i in range(chains[-1] + 1)])[chains]
+    atoms.setSegnames(np.repeat(segnames, len(RESIDUE))[:n_atoms])
+    atoms.setSerials(np.arange(1, n_atoms + 1))
+    atoms.setBetas(random.uniform(10, 60, n_atoms).round(2))
+    atoms.setOccupancies(np.ones(n_atoms))
+
+    _CACHE[key] = atoms
+    return atoms.copy()
+
+
+def buildHomologs(n_atoms, n_structures, seed=0):
+    """Returns a list of *n_structures* structures homologous to the system
+    with *n_atoms* atoms, that have mutated residues, missing terminal
+    residues, and perturbed and displaced coordinates.  Each homolog has 5%
+    of residues mutated and at most 4 N-terminal residues missing, and keeps
+    chain identifiers and residue numbers of the system, so that all of them
+    map onto it with default sequence identity and coverage thresholds of
+    :func:`.buildPDBEnsemble`."""
+
+    reference = buildAtoms(n_atoms, seed)
+    random = np.random.RandomState(seed + 1)
+    resnames = reference.getResnames()
+    n_res = len(resnames) // len(RESIDUE)
+    structures = []
+    for i in range(n_structures):
+        atoms = reference.copy()
+        atoms.setTitle('homolog {0}'.format(i))
+        mutated = random.permutation(n_res) < n_res // 20
+        mutated = np.repeat(mutated, len(RESIDUE))
+        mutated = mutated[:len(resnames)]
+        atoms.setResnames(np.where(mutated, 'GLY', resnames))
+        coords = atoms.getCoords()
+        coords += random.normal(scale=.5, size=coords.shape)
+        coords = np.dot(coords, _randomRotation(random)) + random.normal(
+            scale=10, size=3)
+        atoms.setCoords(coords)
+        trim = random.randint(0, 5) * len(RESIDUE)
+        structures.append(atoms[trim:].copy())
+    return structures
+
+
+def _randomRotation(random):
+    """Returns a random rotation matrix."""
+
+    q, r = np.linalg.qr(random.normal(size=(3, 3)))
+    q *= np.sign(np.diag(r))
+    if np.linalg.det(q) < 0:
+        q[:, 0] *= -1
+    return q
+
+
+def buildConformations(n_atoms, n_confs, seed=0):
+    """Returns an array of *n_confs* conformations of a system with *n_atoms*
+    atoms, which are rotated, translated, and deformed along a few collective
+    motions."""
+
+    random = np.random.RandomState(seed)
+    coords = buildCoords(n_atoms, seed)
+    modes = random.normal(size=(4, n_atoms, 3))
+    modes = np.cumsum(modes, axis=1)
+    modes /= np.sqrt((modes ** 2).sum((1, 2)))[:, np.newaxis, np.newaxis]
+    amplitudes = random.normal(scale=np.sqrt(n_atoms) * np.array([1., .7, .5, .3]),
+                               size=(n_confs, 4))
+    confs = np.empty((n_confs, n_atoms, 3))
+    for i in range(n_confs):
+        conf = coords + np.tensordot(amplitudes[i], modes, 1)
+        conf += random.normal(scale=.3, size=conf.shape)
+        confs[i] = np.dot(conf, _randomRotation(random)) + random.normal(
+            scale=5, size=3)
+    return confs
+
+
+def buildEnsemble(n_atoms, n_confs, seed=0):
+    """Returns an :class:`.Ensemble` of conformations from
+    :func:`buildConformations`, with the first one as reference."""
+
+    from prody import Ensemble
+
+    confs = buildConformations(n_atoms, n_confs, seed)
+    ensemble = Ensemble('synthetic {0}x{1}'.format(n_confs, n_atoms))
+    ensemble.setCoords(confs[0])
+    ensemble.addCoordset(confs)
+    return ensemble
+
+
+def buildMSA(n_sequences, length, seed=0):
+    """Returns an :class:`.MSA` with *n_sequences* sequences of *length*
+    residues.  Columns are sampled from random profiles, and pairs of columns
+    are coupled so that coevolution scores have signal."""
+
+    from prody import MSA
+
+    random = np.random.RandomState(seed)
+    alphabet = np.array(list(ALPHABET), dtype='|S1')
+    profiles = random.dirichlet(np.ones(len(alphabet)) * .3, size=length)
+    cumulative = np.cumsum(profiles, axis=1)
+    draws = random.rand(n_sequences, length, 1)
+    indices = (draws > cumulative[np.newaxis]).sum(2)
+    indices = np.minimum(indices, len(alphabet) - 1)
+    for i, j in random.randint(length, size=(length // 4, 2)):
+        indices[:, j] = (indices[:, i] * 7 + 3) % len(alphabet)
+    msa = alphabet[indices]
+    labels = ['seq{0}'.format(i) for i in range(n_sequences)]
+    return MSA(msa, title='synthetic', labels=labels)
+
+
+def pathPDB(n_atoms, seed=0):
+    """Returns path to a PDB file of the system with *n_atoms* atoms."""
+
+    filename = pathData('synthetic_{0}_{1}.pdb'.format(n_atoms, seed))
+    if not isfile(filename):
+        from prody import writePDB
+        writePDB(filename + '.tmp', buildAtoms(n_atoms, seed), autoext=False)
+        os.rename(filename + '.tmp', filename)
+    return filename
+
+
+def pathCIF(n_atoms, seed=0):
+    """Returns path to an mmCIF file of the system with *n_atoms* atoms."""
+
+    filename = pathData('synthetic_{0}_{1}.cif'.format(n_atoms, seed))
+    if not isfile(filename):
+        atoms = buildAtoms(n_atoms, seed)
+        fields = ['group_PDB', 'id', 'type_symbol', 'label_atom_id',
+                  'label_alt_id', 'label_comp_id', 'label_asym_id',
+                  'label_seq_id', 'pdbx_PDB_ins_code', 'Cartn_x', 'Cartn_y',
+                  'Cartn_z', 'occupancy', 'B_iso_or_equiv', 'auth_seq_id',
+                  'auth_comp_id', 'auth_asym_id', 'auth_atom_id',
+                  'pdbx_PDB_model_num']
+        line = ('ATOM {0} {1} {2} . {3} {4} {5} ? {6:.3f} {7:.3f} {8:.3f} '
+                '{9:.2f} {10:.2f} {5} {3} {4} {2} 1\n')
+        with open(filename + '.tmp', 'w') as out:
+            out.write('data_SYNT\n#\nloop_\n')
+            for field in fields:
+                out.write('_atom_site.{0}\n'.format(field))
+            for serial, element, name, resname, chid, resnum, xyz, occ, beta \
+                    in zip(atoms.getSerials(), atoms.getElements(),
+                           atoms.getNames(), atoms.getResnames(),
+                           atoms.getChids(), atoms.getResnums(),
+                           atoms.getCoords(), atoms.getOccupancies(),
+                           atoms.getBetas()):
+                out.write(line.format(serial, element, name, resname, chid,
+                                      resnum, xyz[0], xyz[1], xyz[2], occ,
+                                      beta))
+            out.write('#\n')
+        os.rename(filename + '.tmp', filename)
+    return filename
+
+
+def pathDCD(n_atoms, n_frames, seed=0):
+    """Returns path to a DCD file with *n_frames* frames of the system with
+    *n_atoms* atoms."""
+
+    filename = pathData('synthetic_{0}x{1}_{2}.dcd'
+                        .format(n_frames, n_atoms, seed))
+    if not isfile(filename):
+        from prody import DCDFile
+        coords = buildCoords(n_atoms, seed)
+        random = np.random.RandomState(seed)
+        dcd = DCDFile(filename + '.tmp', 'w')
+        for i in range(n_frames):
+            dcd.write(coords + random.normal(scale=.5, size=coords.shape))
+        dcd.close()
+        os.rename(filename + '.tmp', filename)
+    return filename
+
+
+def numFrames(n_atoms, n_values=10000000):
+    """Returns number of frames such that a trajectory of *n_atoms* atoms has
+    about *n_values* coordinates, but at least 10 frames."""
+
+    return max(10, n_values // (3 * n_atoms))
@@ -0,0 +1,215 @@
+"""Runs benchmarks in :file:`benchmarks/benchmarks` without :program:`asv`,
+and compares results with a stored baseline::
+
+  python benchmarks/run.py --max-size 10000 --save baseline.json
+  python benchmarks/run.py --max-size 10000 --compare baseline.json
+
+Benchmarks follow :program:`asv` conventions: classes with ``params`` and
+``param_names``, ``setup`` and ``teardown`` methods, and ``time_``,
+``peakmem_``, and ``timeraw_`` methods.  Peak memory is measured with
+:mod:`tracemalloc`, which traces allocations made by Python and NumPy.
+Parameter combinations with a size above ``--max-size`` are skipped, as are
+those for which ``setup`` raises :exc:`NotImplementedError`.  When
+comparing, a benchmark that is slower or uses more memory than the baseline
+by more than ``--factor`` is reported as a regression, and the exit status
+is 1."""
+
+import os
+import re
+import sys
+import json
+import timeit
+import argparse
+import itertools
+import importlib
+from os.path import abspath, dirname, join
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+HERE = dirname(abspath(__file__))
+SIZE_NAMES = ('n_atoms', 'n_sequences')
+PREFIXES = ('time_', 'peakmem_', 'timeraw_')
+
+
+def iterBenchmarks(pattern=None):
+    """Yields ``(name, cls, method)`` for benchmarks whose names match
+    *pattern*."""
+
+    sys.path.insert(0, HERE)
+    folder = join(HERE, 'benchmarks')
+    for filename in sorted(os.listdir(folder)):
+        if not (filename.startswith('bench_') and filename.endswith('.py')):
+            continue
+        module = importlib.import_module('benchmarks.' + filename[:-3])
+        for clsname, cls in sorted(vars(module).items()):
+            if not isinstance(cls, type) or cls.__module__ != module.__name__:
+                continue
+            for method in sorted(dir(cls)):
+                if not method.startswith(PREFIXES):
+                    continue
+                name = '.'.join([filename[:-3], clsname, method])
+                if pattern is None or re.search(pattern, name):
+                    yield name, cls, method
+
+
+def iterParams(cls):
+    """Yields parameter combinations of benchmark class *cls*."""
+
+    params = getattr(cls, 'params', [])
+    names = getattr(cls, 'param_names', [])
+    if not params:
+        yield ()
+        return
+    if len(names) <= 1:
+        params = [params]
+    for combination in itertools.product(*params):
+        yield combination
+
+
+def _timeit(func, number=None, repeat=3):
+    """Returns the smallest time per call of *func*, which is called enough
+    times per repeat to take at least 0.2 s unless *number* is given."""
+
+    timer = timeit.Timer(func)
+    if number is None:
+        number = 1
+        while True:
+            elapsed = timer.timeit(number)
+            if elapsed >= .2 or number >= 1000:
+                break
+            number *= 10
+        times = [elapsed] + timer.repeat(repeat - 1, number)
+    else:
+        times = timer.repeat(repeat, number)
+    return min(times) / number
+
+
+def _peakmem(func):
+    """Returns peak memory in bytes allocated while calling *func*."""
+
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _timeraw(code, repeat=3):
+    """Returns the smallest time of running *code* in a new interpreter."""
+
+    from subprocess import check_call
+    timer = timeit.Timer(lambda: check_call([sys.executable, '-c', code]))
+    return min(timer.repeat(repeat, 1))
+
+
+def runBenchmark(cls, method, params):
+    """Returns result of benchmark *method* of *cls* for *params*, or
+    **None** when it is skipped."""
+
+    instance = cls()
+    if hasattr(instance, 'setup'):
+        try:
+            instance.setup(*params)
+        except NotImplementedError:
+            return None
+    try:
+        func = getattr(instance, method)
+        if method.startswith('timeraw_'):
+            return _timeraw(func(*params))
+        if method.startswith('peakmem_'):
+            if tracemalloc is None:
+                return None
+            return _peakmem(lambda: func(*params))
+        number = getattr(cls, 'number', None) or None
+        if number == 1 and hasattr(instance, 'setup'):
+            times = []
+            for _ in range(getattr(cls, 'repeat', 3) or 3):
+                instance.setup(*params)
+                times.append(_timeit(lambda: func(*params), 1, 1))
+            return min(times)
+        return _timeit(lambda: func(*params), number)
+    finally:
+        if hasattr(instance, 'teardown'):
+            instance.teardown(*params)
+
+
+def formatResult(method, value):
+    """Returns *value* formatted as time or memory based on *method*."""
+
+    if value is None:
+        return 'skipped'
+    if method.startswith('peakmem_'):
+        for unit in ['B', 'kB', 'MB', 'GB']:
+            if value < 1024 or unit == 'GB':
+                return '{0:.3g} {1}'.format(value, unit)
+            value /= 1024.
+    for unit, scale in [('s', 1.), ('ms', 1e-3), ('us', 1e-6)]:
+        if value >= scale or unit == 'us':
+            return '{0:.3g} {1}'.format(value / scale, unit)
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--bench', '-b', metavar='REGEX',
+                        help='run benchmarks whose names match REGEX')
+    parser.add_argument('--max-size', type=int, default=None,
+                        help='skip parameters sizes larger than this')
+    parser.add_argument('--save', metavar='FILE',
+                        help='save results to FILE as a JSON file')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare results with those saved in FILE')
+    parser.add_argument('--factor', type=float, default=1.2,
+                        help='ratio to baseline considered a regression, '
+                             'default is %(default)s')
+    args = parser.parse_args(args)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as inp:
+            baseline = json.load(inp)
+
+    results = {}
+    regressions = []
+    for name, cls, method in iterBenchmarks(args.bench):
+        names = getattr(cls, 'param_names', [])
+        for params in iterParams(cls):
+            if args.max_size is not None and any(
+                    value > args.max_size for key, value in zip(names, params)
+                    if key in SIZE_NAMES):
+                continue
+            key = name
+            if params:
+                key += '(' + ', '.join('{0}={1}'.format(*item)
+                                       for item in zip(names, params)) + ')'
+            value = runBenchmark(cls, method, params)
+            results[key] = value
+            line = '{0:75s} {1:>10s}'.format(key, formatResult(method, value))
+            old = baseline.get(key)
+            if value is not None and old:
+                ratio = value / old
+                line += '  {0:5.2f}x'.format(ratio)
+                if ratio > args.factor:
+                    line += '  REGRESSION'
+                    regressions.append(key)
+            print(line)
+            sys.stdout.flush()
+
+    if args.save:
+        with open(args.save, 'w') as out:
+            json.dump(results, out, indent=1, sort_keys=True)
+    if regressions:
+        print('{0} regression(s) by more than {1}x:'
+              .format(len(regressions), args.factor))
+        for key in regressions:
+            print('  ' + key)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
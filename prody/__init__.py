@@ -3,8 +3,10 @@
 __version__ = '1.10.8'
 __release__ = __version__ # + '-dev' # comment out '-dev' before a release
 
+import os
 import sys
 import warnings
+from importlib import import_module
 
 if sys.version_info[:2] < (2, 7):
     sys.stderr.write('Python 2.6 and older is not supported\n')
@@ -70,62 +72,73 @@ LOGGER = PackageLogger('.prody')
 SETTINGS = PackageSettings('prody', logger=LOGGER)
 SETTINGS.load()
 
-from . import kdtree
-from .kdtree import *
-__all__.extend(kdtree.__all__)
-__all__.append('kdtree')
-
-from . import atomic
-from .atomic import *
-__all__.extend(atomic.__all__)
-__all__.append('atomic')
-
-from .atomic import SELECT
-
-from . import proteins
-from .proteins import *
-__all__.extend(proteins.__all__)
-__all__.append('proteins')
-
-from . import measure
-from .measure import *
-__all__.extend(measure.__all__)
-__all__.append('measure')
-
-from . import database
-from .database import *
-__all__.extend(database.__all__)
-__all__.append('database')
-
-from . import sequence
-from .sequence import *
-__all__.extend(sequence.__all__)
-__all__.append('sequence')
-
-from . import dynamics
-from .dynamics import *
-__all__.extend(dynamics.__all__)
-__all__.append('dynamics')
-
-from . import ensemble
-from .ensemble import *
-__all__.extend(ensemble.__all__)
-__all__.append('ensemble')
-
-from . import trajectory
-from .trajectory import *
-__all__.extend(trajectory.__all__)
-__all__.append('trajectory')
-
-from . import chromatin
-from .chromatin import *
-__all__.extend(chromatin.__all__)
-__all__.append('chromatin')
-
-from . import domain_decomposition
-from .domain_decomposition import *
-__all__.extend(domain_decomposition.__all__)
-__all__.append('domain_decomposition')
+# Subpackages, in the order their public names are added to __all__
+_SUBPACKAGES = ['kdtree', 'atomic', 'proteins', 'measure', 'database',
+                'sequence', 'dynamics', 'ensemble', 'trajectory',
+                'chromatin', 'domain_decomposition']
+
+# Subpackages, in the order they are searched for a public name, so that
+# a name is found before subpackages that its own does not need are imported
+_LOOKUP = ['kdtree', 'atomic', 'proteins', 'measure', 'sequence',
+           'ensemble', 'trajectory', 'dynamics', 'database',
+           'chromatin', 'domain_decomposition']
+
+# public names that are not listed in __all__ of their subpackage
+_NAMES = {'SELECT': 'atomic'}
+
+_BASE_ALL = __all__
+
+
+def _importSubpackages():
+    """Import all subpackages, add their public names to the namespace, and
+    return the list of all public names."""
+
+    names = list(_BASE_ALL)
+    namespace = globals()
+    for name in _SUBPACKAGES:
+        module = import_module('.' + name, __name__)
+        for item in module.__all__:
+            namespace[item] = getattr(module, item)
+        names.extend(module.__all__)
+        names.append(name)
+    for item, name in _NAMES.items():
+        namespace[item] = getattr(namespace[name], item)
+    names.append('prody')
+    namespace['__all__'] = names
+    return names
+
+
+def __getattr__(name):
+    """Returns public *name*, after importing the subpackage that defines it.
+    Subpackages are imported on first access, so that importing ProDy does
+    not import modules and dependencies that are not used."""
+
+    if name == '__all__':
+        return _importSubpackages()
+    if name in _SUBPACKAGES:
+        return import_module('.' + name, __name__)
+    if not name.startswith('__'):
+        for subpackage in _LOOKUP:
+            module = import_module('.' + subpackage, __name__)
+            if (name in getattr(module, '__all__', ()) or
+                    _NAMES.get(name) == subpackage):
+                value = getattr(module, name)
+                globals()[name] = value
+                return value
+    raise AttributeError('module {0} has no attribute {1}'
+                         .format(repr(__name__), repr(name)))
+
+
+def __dir__():
+
+    return sorted(set(globals()).union(__getattr__('__all__')))
+
+
+if sys.version_info[:2] < (3, 7):
+    # module level __getattr__ is not supported, so import eagerly
+    _importSubpackages()
+else:
+    del __all__
 
 #from . import comd
 #from .comd import *
@@ -133,7 +146,35 @@ __all__.append('domain_decomposition')
 #__all__.append('comd')
 
 import prody
-__all__.append('prody')
+
+
+def _pathPDBMirror(path):
+
+    from .proteins import pathPDBMirror
+    return pathPDBMirror(path)
+
+
+def _pathPDBFolder(folder):
+
+    from .proteins import pathPDBFolder
+    return pathPDBFolder(folder)
+
+def _traceEnviron(value):
+    """Turn on tracing when :envvar:`PRODY_TRACE` is set to a value other
+    than ``0``.  Unless the value is ``1``, it is taken as a filename that
+    spans are written to in Chrome trace format at exit."""
+
+    if value in ('', '0'):
+        return
+    LOGGER.trace = True
+    if value != '1':
+        import atexit
+
+        def export():
+            if LOGGER.trace:
+                LOGGER.exportTrace(value, 'chrome')
+
+        atexit.register(export)
 
 # default, acceptable values, setter
 CONFIGURATION = {
@@ -147,8 +188,9 @@ CONFIGURATION = {
     'selection_warning': (True, None, None),
     'verbosity': ('debug', list(utilities.LOGGING_LEVELS),
                   LOGGER._setverbosity),
-    'pdb_mirror_path': ('', None, proteins.pathPDBMirror),
-    'local_pdb_folder': ('', None, proteins.pathPDBFolder),
+    'pdb_mirror_path': ('', None, _pathPDBMirror),
+    'local_pdb_folder': ('', None, _pathPDBFolder),
+    'trace': (False, None, LOGGER._settrace),
 }
 
 
@@ -213,6 +255,8 @@ for _key in _keys:
         SETTINGS[_key] = default
 
 LOGGER._setverbosity(confProDy('verbosity'))
+LOGGER._settrace(confProDy('trace'))
+_traceEnviron(os.environ.get('PRODY_TRACE', ''))
 
 confProDy.__doc__ += '\n\n' + tabulate(['Option'] + _keys,
                                        ['Default (acceptable values)'] + _vals
@@ -2,8 +2,7 @@ from numbers import Integral
 
 from numpy import ma
 import numpy as np
-from scipy.sparse import coo_matrix
-from scipy.stats import mode
+from scipy.sparse import coo_matrix, csr_matrix, diags, issparse, triu, tril
 from prody.chromatin.norm import VCnorm, SQRTVCnorm, Filenorm
 from prody.chromatin.functions import div0, showMap, showDomains, _getEigvecs
 
@@ -20,6 +19,10 @@ class HiC(object):
 
     """This class is used to store and preprocess Hi-C contact map. A :class:`.GNM`
     instance for analyzing the contact map can be also created by using this class.
+
+    The contact map is stored as a :class:`~scipy.sparse.csr_matrix`, which is 
+    also what :attr:`map` returns.  It is converted to a dense array only when 
+    it is requested via :meth:`getCompleteMap` or :meth:`getTrimedMap`.
     """
 
     def __init__(self, title='Unknown', map=None, bin=None):
@@ -34,40 +37,61 @@ class HiC(object):
     @property
     def map(self):
         if self.masked:
-            return self.getTrimedMap()
+            return self.getTrimedMap(sparse=True)
         else:
-            return self._map
+            return self.getCompleteMap(sparse=True)
 
     @map.setter
     def map(self, value):
-        if map is None: 
+        if value is None: 
             self._map = None
         else:
-            self._map = np.array(value)
+            if issparse(value):
+                self._map = csr_matrix(value, dtype=float)
+            else:
+                self._map = csr_matrix(np.asarray(value, dtype=float))
             self._makeSymmetric()
             self._maskUnmappedRegions()
-            self._labels = np.zeros(len(self._map))
+            self._labels = np.zeros(self._map.shape[0])
 
     def __repr__(self):
 
-        return '<HiC: {0} ({1} mapped loci; {2} in total)>'.format(self._title, len(self.getTrimedMap()), len(self._map))
+        return '<HiC: {0} ({1} mapped loci; {2} in total)>'.format(self._title, self._numLoci(True), self._numLoci(False))
 
     def __str__(self):
 
         return 'HiC ' + self._title
 
     def __getitem__(self, index):
+        M = self.getTrimedMap(True) if self.masked else self._map
         if isinstance(index, Integral):
-            return self.map.flatten()[index]
+            n = M.shape[0] * M.shape[1]
+            if index < 0:
+                index += n
+            if not 0 <= index < n:
+                raise IndexError('index out of range')
+            return M[divmod(index, M.shape[1])]
         else:
             i, j = index
-            return self.map[i,j]
+            ret = M[i,j]
+            if issparse(ret):
+                ret = ret.toarray()
+            return ret
 
     def __len__(self):
-        return len(self.map)
+        return self._numLoci(self.masked)
     
     def numAtoms(self):
-        return len(self.map)
+        return self._numLoci(self.masked)
+
+    def _numLoci(self, trimmed=True):
+        """Returns the number of loci in the trimmed or complete map."""
+
+        if self._map is None:
+            return 0
+        if trimmed and not np.isscalar(self.mask):
+            return int(np.sum(self.mask))
+        return self._map.shape[0]
 
     def getTitle(self):
         """Returns title of the instance."""
@@ -79,22 +103,27 @@ class HiC(object):
 
         self._title = str(title)
 
-    def getCompleteMap(self):
-        """Obtains the complete contact map with unmapped regions."""
+    def getCompleteMap(self, sparse=False):
+        """Obtains the complete contact map with unmapped regions. A 
+        :class:`~scipy.sparse.csr_matrix` is returned if *sparse* is **True**."""
 
-        return self._map
+        if self._map is None or sparse:
+            return self._map
+        return self._map.toarray()
         
-    def getTrimedMap(self):
-        """Obtains the contact map without unmapped regions."""
+    def getTrimedMap(self, sparse=False):
+        """Obtains the contact map without unmapped regions. A 
+        :class:`~scipy.sparse.csr_matrix` is returned if *sparse* is **True**."""
 
         if self._map is None: 
             return None
-        if np.isscalar(self.mask):
-            return self._map
-
-        M = ma.array(self._map)
-        M.mask = np.diag(~self.mask)
-        return ma.compress_rowcols(M)
+        M = self._map
+        if not np.isscalar(self.mask):
+            indices = np.flatnonzero(self.mask)
+            M = M[indices][:, indices]
+        if sparse:
+            return M
+        return M.toarray()
     
     def align(self, array, axis=None):
         if not isinstance(map, np.ndarray):
@@ -107,8 +136,8 @@ class HiC(object):
 
         mask = self.mask.copy()
 
-        l_full = self.getCompleteMap().shape[0]
-        l_trim = self.getTrimedMap().shape[0]
+        l_full = self._numLoci(False)
+        l_trim = self._numLoci(True)
         
         if len(array.shape) == 0:
             raise ValueError('Aligned array cannot be empty.')
@@ -161,7 +190,7 @@ class HiC(object):
                 elif s[axis] == l_full:
                     mask = np.expand_dims(mask, axis=otheraxis)
                     mask = mask.repeat(s[otheraxis])
-                    ret = self._map[mask]
+                    ret = array[mask]
                 else:
                     raise ValueError('The size of the array (%d) does not '
                                     'match that of either the full (%d) '
@@ -171,29 +200,27 @@ class HiC(object):
         return ret
 
     def getKirchhoff(self):
-        """Builds a Kirchhoff matrix based on the contact map."""
+        """Builds a Kirchhoff matrix based on the contact map. The matrix is 
+        returned as a :class:`~scipy.sparse.csr_matrix`."""
 
-        if self.map is None:
+        if self._map is None:
             return None
         else:
-            M = self.map
+            M = self.getTrimedMap(True) if self.masked else self._map
             
-            I = np.eye(M.shape[0], dtype=bool)
-            A = M.copy()
-            A[I] = 0.
-            D = np.diag(np.sum(A, axis=0))
+            A = M - diags(M.diagonal())
+            A.eliminate_zeros()
+            D = diags(np.asarray(A.sum(axis=0)).ravel())
             K = D - A
-            return K
+            return K.tocsr()
 
     def _maskUnmappedRegions(self):
         """Finds and masks unmapped regions in the contact map."""
 
         M = self._map
         if M is None: return
-        # Obtain the diagonal values, need to make sure d is an array 
-        # instead of a matrix, otherwise diag() later will not work as 
-        # intended.
-        d = np.array(np.diag(M))
+        # Obtain the diagonal values
+        d = M.diagonal()
         # mask if a diagonal value is zero
         mask_zero = np.array(d==0)
         # mask if a diagonal value is NAN
@@ -210,15 +237,16 @@ class HiC(object):
         if M is None: return
         
         # determine which part of the matrix has values
-        U = np.triu(M, k=1)
-        L = np.tril(M, k=-1)
+        U = triu(M, k=1)
+        L = tril(M, k=-1)
 
-        if np.sum(U) == 0:
-            M += L.T
-        elif np.sum(L) == 0:
-            M += U.T
+        if U.sum() == 0:
+            M = M + L.T
+        elif L.sum() == 0:
+            M = M + U.T
         else:
             M = (M + M.T) / 2.
+        self._map = M.tocsr()
         return self._map
     
     def calcGNM(self, n_modes=None):
@@ -228,17 +256,22 @@ class HiC(object):
             gnm = MaskedGNM(self._title, self.mask)
         else:
             gnm = GNM(self._title)
-        gnm.setKirchhoff(self.getKirchhoff())
+        K = self.getKirchhoff()
+        if n_modes is None or n_modes >= K.shape[0] - 1:
+            K = K.toarray()
+        gnm.setKirchhoff(K)
         gnm.calcModes(n_modes=n_modes)
         return gnm
     
     def normalize(self, method=VCnorm, **kwargs):
-        """Applies chosen normalization on the current Hi-C map."""
+        """Applies chosen normalization on the current Hi-C map. The sparse 
+        contact map is passed to *method*, and the normalized map is returned 
+        as a :class:`~scipy.sparse.csr_matrix`."""
 
         M = self._map
         N = method(M, **kwargs)
         self.map = N
-        return N
+        return self._map
     
     def setDomains(self, labels, **kwargs):
         """Uses spectral clustering to identify structural domains on the chromosome.
@@ -315,7 +348,8 @@ class HiC(object):
             elif k.startswith('domain_'):
                 dm_kwargs[k[7:]] = kwargs.pop(k)
 
-        im = showMap(self.map, spec, **kwargs)
+        M = self.getTrimedMap() if self.masked else self.getCompleteMap()
+        im = showMap(M, spec, **kwargs)
 
         domains = self.getDomainList()
         if len(domains) > 1:
@@ -368,21 +402,25 @@ def parseHiCStream(stream, **kwargs):
     import csv
     dialect = csv.Sniffer().sniff(stream.read(1024))
     stream.seek(0)
-    reader = csv.reader(stream, dialect)
-    D = list()
-    for row in reader:
-        d = list()
-        for element in row:
-            d.append(np.double(element))
-        D.append(d)
-    D = np.array(D)
+    text = stream.read()
+    delimiter = dialect.delimiter
+    if delimiter.strip():
+        text = text.replace(delimiter, ' ')
+
+    lines = text.lstrip().split('\n', 1)
+    n_cols = len(lines[0].split())
+    tokens = text.split()
+    if n_cols <= 1:
+        raise ValueError("cannot parse the file: input file only contains one column.")
+    if len(tokens) % n_cols:
+        raise ValueError("cannot parse the file: rows have different numbers of columns.")
+    D = np.array(tokens, dtype=float).reshape((-1, n_cols))
+    del tokens, text
 
     bin = kwargs.get('bin', None)
     size = D.shape
-    if len(D.shape) <= 1:
-        raise ValueError("cannot parse the file: input file only contains one column.")
     if size[0] == size[1]:
-        M = D
+        M = csr_matrix(D)
     else:
         try:
             I, J, value = D.T[:3]
@@ -392,22 +430,15 @@ def parseHiCStream(stream, **kwargs):
             raise ValueError('the sparse matrix format should have three columns')
         # determine the bin size by the most frequent interval
         if bin is None:
-            loci = np.unique(np.sort(I))
-            bins = np.diff(loci)
-            bin = mode(bins)[0][0]
+            loci = np.unique(I)
+            bins, counts = np.unique(np.diff(loci), return_counts=True)
+            bin = bins[counts.argmax()]
         # convert coordinate from basepair to locus index
         I = I // bin
         J = J // bin
         # make sure that the matrix is square
-        if np.max(I) != np.max(J):
-            b = np.max(np.append(I, J))
-            I = np.append(I, b)
-            J = np.append(J, b)
-            value = np.append(value, 0.)
-        # Convert to sparse matrix format, then full matrix format
-        # and finally array type. Matrix format is avoided because
-        # diag() won't work as intended for Matrix instances.
-        M = np.array(coo_matrix((value, (I, J))).todense())
+        n = max(I.max(), J.max()) + 1
+        M = coo_matrix((value, (I, J)), shape=(n, n)).tocsr()
     return HiC(title=title, map=M, bin=bin)
 
 def parseHiCBinary(filename, **kwargs):
@@ -421,13 +452,14 @@ def parseHiCBinary(filename, **kwargs):
     from .straw import straw
     import sys
     result = straw(norm,filename,chrloc,chrloc,unit,res)
-    x = np.array(result[0])//res
-    y = np.array(result[1])//res
-    value = np.array(result[0])
+    x = np.asarray(result[0])//res
+    y = np.asarray(result[1])//res
+    value = np.asarray(result[2], dtype=float)
     if sys.version_info[0] == 2:
         x = x.astype(np.int64,copy=False)
         y = y.astype(np.int64,copy=False)
-    M = np.array(coo_matrix((value, (x, y))).todense())
+    n = max(x.max(), y.max()) + 1 if len(x) else 0
+    M = coo_matrix((value, (x, y)), shape=(n, n)).tocsr()
     return HiC(title=title, map=M, bin=res)
 
 def writeMap(filename, map, bin=None, format='%f'):
@@ -437,31 +469,37 @@ def writeMap(filename, map, bin=None, format='%f'):
     :type filename: str
 
     :arg map: a Hi-C contact map.
-    :type map: :class:`numpy.ndarray`
+    :type map: :class:`numpy.ndarray`, :class:`~scipy.sparse.spmatrix`
 
     :arg bin: bin size of the *map*. If bin is `None`, *map* will be 
-    written in full matrix format.
+    written in full matrix format. Otherwise, the upper triangle is written in 
+    sparse format, skipping zero elements of sparse maps.
     :type bin: int
 
     :arg format: output format for map elements.
     :type format: str
     """
 
-    assert isinstance(map, np.ndarray), 'map must be a numpy.ndarray.'
+    assert isinstance(map, np.ndarray) or issparse(map), \
+        'map must be a numpy.ndarray or a scipy sparse matrix.'
 
     if bin is None:
+        if issparse(map):
+            map = map.toarray()
         return writeArray(filename, map, format=format)
     else:
-        L = int(map.size - np.diag(map).size)/2 + np.diag(map).size
-        spmat = np.zeros((L,3))
-        m,n = map.shape
-        l = 0
-        for i in range(m):
-            for j in range(i,n):
-                spmat[l,0] = i * bin
-                spmat[l,1] = j * bin
-                spmat[l,2] = map[i,j]
-                l += 1
+        if issparse(map):
+            upper = triu(map).tocoo()
+            order = np.lexsort((upper.col, upper.row))
+            I, J, V = upper.row[order], upper.col[order], upper.data[order]
+        else:
+            m, n = map.shape
+            I, J = np.triu_indices(m, 0, n)
+            V = map[I, J]
+        spmat = np.zeros((len(V), 3))
+        spmat[:,0] = I * bin
+        spmat[:,1] = J * bin
+        spmat[:,2] = V
         fmt = ['%d', '%d', format]
         return writeArray(filename, spmat, format=fmt)
 
@@ -484,8 +522,13 @@ def saveHiC(hic, filename=None, map=True, **kwargs):
         filename += '.hic.npz'
 
     attr_dict = hic.__dict__.copy()
-    if not map:
-        attr_dict.pop('_map')
+    M = attr_dict.pop('_map')
+    if map and M is not None:
+        M = M.tocoo()
+        attr_dict['_map_data'] = M.data
+        attr_dict['_map_row'] = M.row
+        attr_dict['_map_col'] = M.col
+        attr_dict['_map_shape'] = np.array(M.shape)
 
     ostream = openFile(filename, 'wb', **kwargs)
     np.savez(ostream, **attr_dict)
@@ -504,8 +547,18 @@ def loadHiC(filename):
     keys = attr_dict.keys()
 
     for k in keys:
+        if k.startswith('_map_'):
+            continue
         val = attr_dict[k]
         if len(val.shape) == 0:
             val = np.asscalar(val)
         setattr(hic, k, val)
+
+    if '_map_data' in keys:
+        hic._map = coo_matrix((attr_dict['_map_data'], 
+                               (attr_dict['_map_row'], attr_dict['_map_col'])),
+                              shape=tuple(attr_dict['_map_shape'])).tocsr()
+    elif hic._map is not None:
+        # files saved by earlier versions contain dense maps
+        hic._map = csr_matrix(hic._map)
     return hic
@@ -1,75 +1,114 @@
 import numpy as np
+from scipy.sparse import csr_matrix, issparse
 
 from prody.chromatin.functions import div0
-from prody.utilities import importLA
 from prody import LOGGER
 
-__all__ = ['VCnorm', 'SQRTVCnorm', 'Filenorm', 'SCN']
+__all__ = ['VCnorm', 'SQRTVCnorm', 'Filenorm', 'SCN', 'ICEnorm']
 
-def VCnorm(M, **kwargs):
-    """ Performs vanilla coverage normalization on matrix *M*."""
+def _sums(M, axis):
+    """Returns sums of *M* along *axis* as a 1D array for both dense and
+    sparse matrices."""
 
-    total_count = kwargs.get('total_count', 'original')
+    return np.asarray(M.sum(axis=axis)).ravel()
 
-    C = np.diag(div0(1., np.sum(M, axis=0)))
-    R = np.diag(div0(1., np.sum(M, axis=1)))
+def _matvec(M, v):
+    """Returns the product of *M* and vector *v* as a 1D array."""
 
-    # N = R * M * C
-    N = np.dot(np.dot(R,M),C)
+    return np.asarray(M.dot(v)).ravel()
+
+def _scale(M, r, c):
+    """Returns ``R * M * C``, where *R* and *C* are diagonal matrices with
+    row biases *r* and column biases *c* on their diagonals. Dense matrices
+    are scaled by broadcasting, and sparse matrices by scaling their stored
+    values, so diagonal matrices are never built."""
+
+    if issparse(M):
+        N = csr_matrix(M, dtype=float, copy=True)
+        rows = np.repeat(np.arange(N.shape[0]), np.diff(N.indptr))
+        N.data *= r[rows] * c[N.indices]
+        N.eliminate_zeros()
+        return N
+    return np.asarray(M, dtype=float) * r[:, np.newaxis] * c
+
+def _rescale(M, N, total_count):
+    """Scales *N* so that its sum is *total_count*, which can be
+    ``'original'`` for the sum of *M*."""
 
-    if total_count is 'original':
-        total_count = np.sum(M)
+    if isinstance(total_count, str) and total_count == 'original':
+        total_count = M.sum()
 
     if total_count is not None:
-        sum_N = np.sum(N)
+        sum_N = N.sum()
         k = total_count / sum_N
         N = N * k
     return N
 
-def SQRTVCnorm(M, **kwargs):
-    """ Performs square-root vanilla coverage normalization on matrix *M*."""
+def VCnorm(M, **kwargs):
+    """ Performs vanilla coverage normalization on matrix *M*, which can be
+    dense or sparse."""
 
     total_count = kwargs.get('total_count', 'original')
 
-    C = np.diag(np.sqrt(div0(1., np.sum(M, axis=0))))
-    R = np.diag(np.sqrt(div0(1., np.sum(M, axis=1))))
+    c = div0(1., _sums(M, 0))
+    r = div0(1., _sums(M, 1))
 
     # N = R * M * C
-    N = np.dot(np.dot(R,M),C)
+    N = _scale(M, r, c)
+    return _rescale(M, N, total_count)
 
-    if total_count is 'original':
-        total_count = np.sum(M)
+def SQRTVCnorm(M, **kwargs):
+    """ Performs square-root vanilla coverage normalization on matrix *M*,
+    which can be dense or sparse."""
 
-    if total_count is not None:
-        sum_N = np.sum(N)
-        k = total_count / sum_N
-        N = N * k
-    return N
+    total_count = kwargs.get('total_count', 'original')
+
+    c = np.sqrt(div0(1., _sums(M, 0)))
+    r = np.sqrt(div0(1., _sums(M, 1)))
+
+    # N = R * M * C
+    N = _scale(M, r, c)
+    return _rescale(M, N, total_count)
 
 def SCN(M, **kwargs):
-    la = importLA()
+    """ Performs sequential component normalization on matrix *M*, which can
+    be dense or sparse, by alternately normalizing its columns and rows until
+    the asymmetry of the normalized matrix stops changing. Only row and column
+    biases are updated in each iteration, and residuals are logged.
+
+    :arg max_loops: maximum number of iterations, default is 100
+    :type max_loops: int
+
+    :arg tol: tolerance for the change in relative asymmetry, default is 1e-5
+    :type tol: float
+    """
+
     total_count = kwargs.pop('total_count', None)
     max_loops = kwargs.pop('max_loops', 100)
     tol = kwargs.pop('tol', 1e-5)
 
-    N = M.copy()
+    r = np.ones(M.shape[0])
+    c = np.ones(M.shape[1])
+    Mt = M.T
+    size = float(M.shape[0] * M.shape[1])
     n = 0
     d0 = None
     p = 1
     last_p = None
 
     while True:
-        C = np.diag(div0(1., np.sum(N, axis=0)))
-        N = np.dot(N, C)
-
-        R = np.diag(div0(1., np.sum(N, axis=1)))
-        N = np.dot(R, N)
+        # normalize columns, then rows of N = R * M * C
+        c = c * div0(1., c * _matvec(Mt, r))
+        r = r * div0(1., r * _matvec(M, c))
 
         n += 1
 
         # check convergence of symmetry
-        d = np.mean(np.abs(N - N.T))
-        
+        N = _scale(M, r, c)
+        d = abs(N - N.T).sum() / size
+        colsums = c * _matvec(Mt, r)
+        res = np.abs(colsums[colsums != 0] - 1).max() if colsums.any() else 0.
+
         if d0 is not None:
             p = div0(d, d0)
             dp = np.abs(p - last_p)
@@ -77,9 +116,10 @@ def SCN(M, **kwargs):
                 break
         else:
             d0 = d
-        LOGGER.debug('Iteration {0}: d = {1}, p = {2}'.format(str(n), str(d), str(p)))
+        LOGGER.debug('Iteration {0}: d = {1}, p = {2}, column sum residual = {3}'
+                     .format(str(n), str(d), str(p), str(res)))
         last_p = p
-        
+
         if max_loops is not None:
             if n >= max_loops:
                 LOGGER.warn('The SCN algorithm did not converge after {0} '
@@ -87,20 +127,58 @@ def SCN(M, **kwargs):
                 break
     # guarantee symmetry
     N = (N + N.T) / 2.
-    if total_count is 'original':
-        total_count = np.sum(M)
+    return _rescale(M, N, total_count)
 
-    if total_count is not None:
-        sum_N = np.sum(N)
-        k = total_count / sum_N
-        N = N * k
-    return N
+def ICEnorm(M, **kwargs):
+    """ Performs iterative correction (ICE) on symmetric matrix *M*, which can
+    be dense or sparse. A single bias vector *b* is refined until all nonzero
+    row sums of ``N[i,j] = M[i,j]*b[i]*b[j]`` are equal, and residuals are
+    logged in each iteration.
+
+    :arg max_loops: maximum number of iterations, default is 200
+    :type max_loops: int
+
+    :arg tol: tolerance for the largest relative deviation of row sums from
+        their mean, default is 1e-5
+    :type tol: float
+    """
+
+    total_count = kwargs.pop('total_count', 'original')
+    max_loops = kwargs.pop('max_loops', 200)
+    tol = kwargs.pop('tol', 1e-5)
+
+    b = np.ones(M.shape[0])
+    n = 0
+    while True:
+        s = b * _matvec(M, b)
+        nonzero = s != 0
+        if not nonzero.any():
+            break
+        s = s / s[nonzero].mean()
+        res = np.abs(s[nonzero] - 1).max()
+
+        n += 1
+        LOGGER.debug('Iteration {0}: row sum residual = {1}'
+                     .format(str(n), str(res)))
+        if res < tol:
+            break
+
+        b = b * div0(1., s)
+
+        if max_loops is not None:
+            if n >= max_loops:
+                LOGGER.warn('The ICE algorithm did not converge after {0} '
+                            'iterations.'.format(max_loops))
+                break
+
+    N = _scale(M, b, b)
+    return _rescale(M, N, total_count)
 
 def Filenorm(M, **kwargs):
-    """ Performs normalization on matrix *M* given a file. *filename* specifies 
-    the path to the file. The file should be one-column, and ideally has the 
-    same number of entries with the size of *M* (extra entries will be ignored). 
-    Say *F* is vector of the normalization factors, *N* is the normalized matrix, 
+    """ Performs normalization on matrix *M* given a file. *filename* specifies
+    the path to the file. The file should be one-column, and ideally has the
+    same number of entries with the size of *M* (extra entries will be ignored).
+    Say *F* is vector of the normalization factors, *N* is the normalized matrix,
     if *expected* is **True**, ``N[i,j] = M[i,j]/F[i]/F[j]``. If *expected* is
     **True**, ``N[i,j] = M[i,j]/F[|i-j|]``."""
 
@@ -113,13 +191,15 @@ def Filenorm(M, **kwargs):
     L = M.shape[0]
     if not expected:
         factors.resize(L)
-        norm_mat = np.outer(factors, factors)
-        
-        N = div0(M, norm_mat)
-        return N
-    else:
-        N = np.zeros(M.shape)
-        for i in range(L):
-            for j in range(L):
-                N[i,j] = div0(M[i,j], factors[abs(i-j)])
-        return N
+        f = div0(1., factors)
+        return _scale(M, f, f)
+
+    if issparse(M):
+        M = M.tocoo()
+        N = M.copy()
+        N.data = div0(M.data, factors[np.abs(M.row - M.col)])
+        return N.tocsr()
+
+    I, J = np.indices(M.shape)
+    N = div0(M, factors[np.abs(I - J)])
+    return N
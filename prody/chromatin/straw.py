@@ -32,6 +32,10 @@ import struct
 import zlib
 import requests
 import io
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
 
 blockMap = dict()
 # global version
@@ -149,24 +153,18 @@ def readFooter(req, c1, c2, norm, unit, resolution):
         str_ = __readcstr(req)
         binSize = struct.unpack('<i',req.read(4))[0]
         nValues = struct.unpack('<i',req.read(4))[0]
-        for j in range(nValues):
-            v = struct.unpack('<d',req.read(8))[0]
+        req.read(8*nValues)
         nNormalizationFactors = struct.unpack('<i',req.read(4))[0]
-        for j in range(nNormalizationFactors):
-            chrIdx = struct.unpack('<i',req.read(4))[0]
-            v = struct.unpack('<d',req.read(8))[0]
+        req.read(12*nNormalizationFactors)
     nExpectedValues = struct.unpack('<i',req.read(4))[0]
     for i in range(nExpectedValues):
         str_ = __readcstr(req)
         str_ = __readcstr(req)
         binSize = struct.unpack('<i',req.read(4))[0]
         nValues = struct.unpack('<i',req.read(4))[0]
-        for j in range(nValues):
-            v = struct.unpack('<d',req.read(8))[0]
+        req.read(8*nValues)
         nNormalizationFactors = struct.unpack('<i',req.read(4))[0]
-        for j in range(nNormalizationFactors):
-            chrIdx = struct.unpack('<i',req.read(4))[0]
-            v = struct.unpack('<d',req.read(8))[0]
+        req.read(12*nNormalizationFactors)
     nEntries = struct.unpack('<i',req.read(4))[0]
     found1=False
     found2=False
@@ -223,15 +221,11 @@ def readMatrixZoomData(req, myunit, mybinsize):
         myBlockColumnCount=blockColumnCount
         storeBlockData=True
     nBlocks = struct.unpack('<i',req.read(4))[0]
-    for b in range(nBlocks):
-        blockNumber = struct.unpack('<i',req.read(4))[0]
-        filePosition = struct.unpack('<q',req.read(8))[0]
-        blockSizeInBytes = struct.unpack('<i',req.read(4))[0]
-        entry=dict()
-        entry['size'] = blockSizeInBytes
-        entry['position'] = filePosition
-        if (storeBlockData):
-            blockMap[blockNumber] = entry
+    blocks = np.frombuffer(req.read(16*nBlocks), dtype=BLOCK_INDEX_DTYPE)
+    if (storeBlockData):
+        for blockNumber, filePosition, blockSizeInBytes in blocks.tolist():
+            blockMap[blockNumber] = {'size': blockSizeInBytes,
+                                     'position': filePosition}
     return [storeBlockData, myBlockBinCount, myBlockColumnCount]
 
 def readMatrix(req, unit, binsize):
@@ -298,6 +292,70 @@ def getBlockNumbersForRegionFromBinPosition(regionIndices, blockBinCount, blockC
     # print(str(blocksSet))
     return blocksSet
 
+# block index entries: block number, file position and size in bytes
+BLOCK_INDEX_DTYPE = np.dtype([('number', '<i4'), ('position', '<i8'),
+                              ('size', '<i4')])
+
+# contact records of blocks written by versions older than 7
+BLOCK_RECORD_DTYPE = np.dtype([('binX', '<i4'), ('binY', '<i4'),
+                               ('counts', '<f4')])
+
+def decodeBlock(uncompressedBytes, version):
+    """ Decodes the records of an uncompressed block using structured numpy
+    arrays instead of unpacking records one at a time.
+
+    Args:
+       uncompressedBytes (bytes): Decompressed block data
+       version (int): Version of the .hic file
+
+    Returns:
+       tuple of binX, binY and counts arrays for this block
+    """
+    nRecords = struct.unpack('<i',uncompressedBytes[0:4])[0]
+    if (version < 7):
+        records = np.frombuffer(uncompressedBytes, dtype=BLOCK_RECORD_DTYPE,
+                                count=nRecords, offset=4)
+        return (records['binX'].astype(np.int64),
+                records['binY'].astype(np.int64),
+                records['counts'].astype(float))
+
+    binXOffset, binYOffset, useShort, type_ = \
+        struct.unpack('<iibb', uncompressedBytes[4:14])
+    counts_dtype = '<i2' if useShort == 0 else '<f4'
+    if (type_==1):
+        row_dtype = np.dtype([('x', '<i2'), ('counts', counts_dtype)])
+        rowCount = struct.unpack('<h',uncompressedBytes[14:16])[0]
+        temp = 16
+        binX = np.empty(nRecords, dtype=np.int64)
+        binY = np.empty(nRecords, dtype=np.int64)
+        counts = np.empty(nRecords, dtype=float)
+        index = 0
+        for i in range(rowCount):
+            y, colCount = struct.unpack('<hh',uncompressedBytes[temp:(temp+4)])
+            temp = temp+4
+            row = np.frombuffer(uncompressedBytes, dtype=row_dtype,
+                                count=colCount, offset=temp)
+            temp = temp + colCount*row_dtype.itemsize
+            binX[index:index+colCount] = row['x']
+            binX[index:index+colCount] += binXOffset
+            binY[index:index+colCount] = y + binYOffset
+            counts[index:index+colCount] = row['counts']
+            index = index + colCount
+        return binX[:index], binY[:index], counts[:index]
+    elif (type_== 2):
+        nPts, w = struct.unpack('<ih',uncompressedBytes[14:20])
+        values = np.frombuffer(uncompressedBytes, dtype=counts_dtype,
+                               count=nPts, offset=20)
+        if (useShort==0):
+            keep = values != -32768
+        else:
+            keep = ~np.isnan(values)
+        i = np.flatnonzero(keep)
+        return (binXOffset + i % w, binYOffset + i // w,
+                values[keep].astype(float))
+    empty = np.zeros(0, dtype=np.int64)
+    return empty, empty, np.zeros(0)
+
 def readBlock(req, size):
     """ Reads the block - reads the compressed bytes, decompresses, and stores
     results in array. Presumes file pointer is in correct position.
@@ -308,87 +366,17 @@ def readBlock(req, size):
        size (int): How many bytes to read
 
     Returns:
-       array containing row, column, count data for this block
+       tuple of binX, binY and counts arrays for this block
     """
     compressedBytes = req.read(size)
-    uncompressedBytes = zlib.decompress(compressedBytes)
-    nRecords = struct.unpack('<i',uncompressedBytes[0:4])[0]
-    v=[]
     global version
-    if (version < 7):
-        for i in range(nRecords):
-            binX = struct.unpack('<i',uncompressedBytes[(12*i+4):(12*i+8)])[0]
-            binY = struct.unpack('<i',uncompressedBytes[(12*i+8):(12*i+12)])[0]
-            counts = struct.unpack('<f',uncompressedBytes[(12*i+12):(12*i+16)])[0]
-            record = dict()
-            record['binX'] = binX
-            record['binY'] = binY
-            record['counts'] = counts
-            v.append(record)
-    else:
-        binXOffset = struct.unpack('<i',uncompressedBytes[4:8])[0]
-        binYOffset = struct.unpack('<i',uncompressedBytes[8:12])[0]
-        useShort = struct.unpack('<b',uncompressedBytes[12:13])[0]
-        type_ = struct.unpack('<b',uncompressedBytes[13:14])[0]
-        index=0
-        if (type_==1):
-            rowCount = struct.unpack('<h',uncompressedBytes[14:16])[0]
-            temp = 16
-            for i in range(rowCount):
-                y = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-                temp=temp+2
-                binY = y + binYOffset
-                colCount = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-                temp=temp+2
-                for j in range(colCount):
-                    x = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-                    temp=temp+2
-                    binX = binXOffset + x
-                    if (useShort==0):
-                        c = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-                        temp=temp+2
-                        counts = c
-                    else:
-                        counts = struct.unpack('<f',uncompressedBytes[temp:(temp+4)])[0]
-                        temp=temp+4
-                    record = dict()
-                    record['binX'] = binX
-                    record['binY'] = binY
-                    record['counts'] = counts
-                    v.append(record)
-                    index = index + 1
-        elif (type_== 2):
-            temp=14
-            nPts = struct.unpack('<i',uncompressedBytes[temp:(temp+4)])[0]
-            temp=temp+4
-            w = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-            temp=temp+2
-            for i in range(nPts):
-                row=int(i/w)
-                col=i-row*w
-                bin1=int(binXOffset+col)
-                bin2=int(binYOffset+row)
-                if (useShort==0):
-                    c = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-                    temp=temp+2
-                    if (c != -32768):
-                        record = dict()
-                        record['binX'] = bin1
-                        record['binY'] = bin2
-                        record['counts'] = c
-                        v.append(record)
-                        index = index + 1
-                else:
-                    counts = struct.unpack('<f',uncompressedBytes[temp:(temp+4)])[0]
-                    temp=temp+4
-                    if (countsnot != 0x7fc00000):
-                        record = dict()
-                        record['binX'] = bin1
-                        record['binY'] = bin2
-                        record['counts'] = counts
-                        v.append(record)
-                        index = index + 1
-    return v
+    return decodeBlock(zlib.decompress(compressedBytes), version)
+
+def _decompressBlock(args):
+    """ Decompresses and decodes a block, zlib releases the GIL so that
+    blocks can be handled by a thread pool"""
+    compressedBytes, version = args
+    return decodeBlock(zlib.decompress(compressedBytes), version)
 
 def readNormalizationVector(req):
     """ Reads the normalization vector from the file; presumes file pointer is
@@ -402,17 +390,14 @@ def readNormalizationVector(req):
       Array of normalization values
 
     """
-    value = []
     nValues = struct.unpack('<i',req.read(4))[0]
-    for i in range(nValues):
-        d = struct.unpack('<d',req.read(8))[0]
-        value.append(d)
-    return value
+    return np.frombuffer(req.read(8*nValues), dtype='<d', count=nValues)
 
-def straw(norm, infile, chr1loc, chr2loc, unit, binsize):
+def straw(norm, infile, chr1loc, chr2loc, unit, binsize, n_threads=None):
     """ This is the main workhorse method of the module. Reads a .hic file and
     extracts the given contact matrix. Stores in an array in sparse upper
-    triangular format: row, column, (normalized) count
+    triangular format: row, column, (normalized) count. Blocks are
+    decompressed and decoded by a pool of threads.
 
     Args:
        norm(str): Normalization type, one of VC, KR, VC_SQRT, or NONE
@@ -421,6 +406,11 @@ def straw(norm, infile, chr1loc, chr2loc, unit, binsize):
        chr2loc(str): Chromosome name and (optionally) range, i.e. "1" or "1:10000:25000"
        unit(str): One of BP or FRAG
        binsize(int): Resolution, i.e. 25000 for 25K
+       n_threads(int): Number of threads for decoding blocks, default is the
+       number of CPUs
+
+    Returns:
+       list of row, column and count arrays
     """
     # clear the global variable blockMap so that it won't keep the data from previous calls
     for blockNum in list(blockMap.keys()):
@@ -540,45 +530,59 @@ def straw(norm, infile, chr1loc, chr2loc, unit, binsize):
     blockBinCount=list1[0]
     blockColumnCount=list1[1]
     blockNumbers = getBlockNumbersForRegionFromBinPosition(regionIndices, blockBinCount, blockColumnCount, c1==c2)
-    yActual=[]
-    xActual=[]
-    counts=[]
-
+    compressedBlocks=[]
     for i_set in (blockNumbers):
-        idx=dict()
-        if(i_set in blockMap):
-            idx=blockMap[i_set]
-        else:
-            idx['size']=0
-            idx['position']=0
-        if (idx['size']==0):
-            records=[]
+        idx=blockMap.get(i_set)
+        if (idx is None or idx['size']==0):
+            continue
+        if (infile.startswith("http")):
+            endrange='bytes={0}-{1}'.format(idx['position'], idx['position']+idx['size'])
+            headers={'range' : endrange, 'x-amz-meta-requester' : 'straw'}
+            r=s.get(infile, headers=headers);
+            req=io.BytesIO(r.content);
         else:
-            if (infile.startswith("http")):
-                endrange='bytes={0}-{1}'.format(idx['position'], idx['position']+idx['size'])
-                headers={'range' : endrange, 'x-amz-meta-requester' : 'straw'}
-                r=s.get(infile, headers=headers);
-                req=io.BytesIO(r.content);
-            else:
-                req.seek(idx['position'])
-            records=readBlock(req, idx['size'])
-
-        for j in range(len(records)):
-            rec=records[j]
-            x=rec['binX']*binsize
-            y=rec['binY']*binsize
-            c=rec['counts']
-            if (norm != "NONE"):
-                a=c1Norm[rec['binX']]*c2Norm[rec['binY']]
-                if (a!=0.0):
-                    c=(c/(c1Norm[rec['binX']]*c2Norm[rec['binY']]))
-                else:
-                    c="inf"
-            if ((x>=origRegionIndices[0] and x<=origRegionIndices[1] and y>=origRegionIndices[2] and y<=origRegionIndices[3]) or ((c1==c2) and y>=origRegionIndices[0] and y<=origRegionIndices[1] and x>= origRegionIndices[2] and x<=origRegionIndices[3])):
-	            xActual.append(x)
-	            yActual.append(y)
-	            counts.append(c)
-    return [xActual, yActual, counts]
+            req.seek(idx['position'])
+        compressedBlocks.append((req.read(idx['size']), version))
+
+    if n_threads is None:
+        n_threads = cpu_count()
+    if (n_threads > 1 and len(compressedBlocks) > 1):
+        pool = ThreadPool(min(n_threads, len(compressedBlocks)))
+        try:
+            blocks = pool.map(_decompressBlock, compressedBlocks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        blocks = [_decompressBlock(block) for block in compressedBlocks]
+    del compressedBlocks
+
+    n_records = sum(len(block[2]) for block in blocks)
+    binX = np.empty(n_records, dtype=np.int64)
+    binY = np.empty(n_records, dtype=np.int64)
+    counts = np.empty(n_records, dtype=float)
+    index = 0
+    for bx, by, c in blocks:
+        n = len(c)
+        binX[index:index+n] = bx
+        binY[index:index+n] = by
+        counts[index:index+n] = c
+        index += n
+    del blocks
+
+    if (norm != "NONE"):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = c1Norm[binX]*c2Norm[binY]
+            counts = np.where(a != 0.0, counts/a, np.inf)
+
+    xActual = binX*binsize
+    yActual = binY*binsize
+    keep = ((xActual>=origRegionIndices[0]) & (xActual<=origRegionIndices[1]) &
+            (yActual>=origRegionIndices[2]) & (yActual<=origRegionIndices[3]))
+    if (c1==c2):
+        keep |= ((yActual>=origRegionIndices[0]) & (yActual<=origRegionIndices[1]) &
+                 (xActual>=origRegionIndices[2]) & (xActual<=origRegionIndices[3]))
+    return [xActual[keep], yActual[keep], counts[keep]]
 
 def printme(norm, infile, chr1loc, chr2loc, unit, binsize,outfile):
     """ Reads a .hic file and extracts and prints the given contact matrix
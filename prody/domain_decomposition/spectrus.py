@@ -1,31 +1,44 @@
 import numpy as np
 from scipy import sparse
 from prody import LOGGER, SETTINGS
-from prody import buildDistMatrix, calcDistFlucts
+from prody.kdtree import KDTree
+from prody.dynamics import NMA, ModeSet, Mode
 
 __all__ = ['calcSpectrusSims', 'MBSPointMutation', 'calcMBS', 'calcMBSfromSim']
 
 
 def calcSpectrusSims(distFlucts, pdb, cutoff=10., sigma='MRSDF', **kwargs):
-    
+    """Returns the sparse similarity matrix of atoms in *pdb* used by SPECTRUS 
+    and the *sigma* parameter of Gaussian weights. *distFlucts* may be the 
+    matrix of distance fluctuations or normal modes, in which case distance 
+    fluctuations are computed only for pairs of atoms within *cutoff* found 
+    using a :class:`.KDTree`, and the similarity matrix is built without 
+    dense intermediates."""
+
     coords = pdb.getCoords()
     n = coords.shape[0]
-    
-    if distFlucts.shape != (n, n):
+
+    if isinstance(distFlucts, (NMA, ModeSet, Mode)):
+        if distFlucts.numAtoms() != n:
+            raise ValueError('modes and atoms must have same number of atoms '
+                             '(now %d and %d)' %(distFlucts.numAtoms(), n))
+    elif distFlucts.shape != (n, n):
         raise ValueError('distFlucts and atoms must have same linear '
                          'size (now %d and %d)' %(distFlucts.shape[0], n))
 
     # identify atom pairs within cutoff and store relative dist. flucts
-    nearestNeighs = np.full((n, n), True, dtype=bool)
-    np.fill_diagonal(nearestNeighs, False)
     if isinstance(cutoff, (int, float)):
-        # compute inter-atomic distances
-        dist = buildDistMatrix(coords)
-        nearestNeighs &= (dist <= cutoff)
-    elif cutoff is not None:
+        rows, cols = _getContactPairs(coords, cutoff)
+    elif cutoff is None:
+        rows, cols = np.triu_indices(n, 1)
+    else:
         raise ValueError('cutoff must be either a number or None. '
                          'Got: {0}'.format(type(cutoff)))
-    nnDistFlucts = distFlucts[nearestNeighs]
+
+    if isinstance(distFlucts, (NMA, ModeSet, Mode)):
+        nnDistFlucts = _calcPairDistFlucts(distFlucts, rows, cols)
+    else:
+        nnDistFlucts = np.asarray(distFlucts[rows, cols]).ravel()
 
     # set the sigma parameter for the Gaussian weights
     if sigma == 'MRSDF':
@@ -46,28 +59,70 @@ def calcSpectrusSims(distFlucts, pdb, cutoff=10., sigma='MRSDF', **kwargs):
 
     # compute the Gaussian weights only for residue pairs
     # within the distance cutoff
-    reducedSims = np.where(nearestNeighs, np.exp(-distFlucts/ss), 0)
-    np.fill_diagonal(reducedSims, 1.)
-    sparseSims  = sparse.csr_matrix(reducedSims)
+    weights = np.exp(-nnDistFlucts/ss)
+    diagonal = np.arange(n)
+    data = np.concatenate([weights, weights, np.ones(n)])
+    rows, cols = (np.concatenate([rows, cols, diagonal]),
+                  np.concatenate([cols, rows, diagonal]))
+    sparseSims = sparse.coo_matrix((data, (rows, cols)), shape=(n, n)).tocsr()
     sparse.csr_matrix.eliminate_zeros(sparseSims)
     
     return sparseSims, sigma
 
 
-def MBSPointMutation(simMatrix, index, **kwargs):
+def _getContactPairs(coords, cutoff):
+    """Returns row and column indices of pairs of atoms within *cutoff* of 
+    each other, where rows are smaller than columns."""
 
-    if sparse.issparse(simMatrix):
-        # slightly faster
-        newSim = simMatrix.tolil()
+    kdtree = KDTree(coords)
+    kdtree.search(float(cutoff))
+    if not kdtree.getCount():
+        return np.zeros(0, int), np.zeros(0, int)
+    pairs = kdtree.getIndices()
+    pairs.sort(axis=1)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _calcPairDistFlucts(modes, rows, cols, chunk_size=2**16):
+    """Returns fluctuations of distances between atoms at *rows* and *cols*
+    computed from *modes*, i.e. the same elements of the matrix returned by
+    :func:`.calcDistFlucts` with ``norm=False``."""
+
+    n_atoms = modes.numAtoms()
+    array = modes._getArray()
+    if isinstance(modes, Mode):
+        variances = np.array([modes.getVariance()])
     else:
-        newSim = simMatrix.copy()
+        variances = modes.getVariances()
+    array = array.reshape((n_atoms, -1, len(variances))) * variances ** 0.5
+
+    flucts = np.empty(len(rows))
+    for start in range(0, len(rows), chunk_size):
+        stop = start + chunk_size
+        diff = array[rows[start:stop]] - array[cols[start:stop]]
+        flucts[start:stop] = (diff ** 2).sum(axis=(1, 2))
+    return flucts
+
+
+def MBSPointMutation(simMatrix, index, **kwargs):
+
     n = simMatrix.shape[0]
 
+    if sparse.issparse(simMatrix):
+        newSim = sparse.coo_matrix(simMatrix)
+        # cut non-adjacent links around atom 'index'
+        cut = ((newSim.row == index) | (newSim.col == index)) & \
+              (np.abs(newSim.row - newSim.col) > 1)
+        newSim = sparse.coo_matrix((newSim.data[~cut], (newSim.row[~cut],
+                                   newSim.col[~cut])), shape=newSim.shape)
+        return newSim.tolil()
+
+    newSim = simMatrix.copy()
     # cut non-adjacent links around atom 'index'
     nonNearestNeighs = list(range(0,index-1)) + list(range(index+2,n))
-    for j in nonNearestNeighs:
-        newSim[index, j] = 0
-        newSim[j, index] = 0
+    newSim[index, nonNearestNeighs] = 0
+    newSim[nonNearestNeighs, index] = 0
     return newSim
 
 
@@ -89,28 +144,178 @@ def _removeOutliers(data, Delta=100., **kwargs):
     return data 
 
 
+_MBS_STATE = {}
+
+def _initMBS(simMatrix, nEvals=20):
+    """Prepares the unmutated problem shared by all point mutations, i.e.
+    the adjacency matrix and degrees of *simMatrix*, and a starting vector
+    from the unmutated spectrum of the normalized Laplacian. The state is kept
+    in a module-level dictionary, so that worker processes prepare it once."""
+
+    _MBS_STATE.clear()
+    simMatrix = sparse.csr_matrix(simMatrix, dtype=float)
+    n = simMatrix.shape[0]
+
+    # links of atoms to themselves do not contribute to the laplacian
+    adjacency = simMatrix - sparse.diags(simMatrix.diagonal())
+    adjacency.eliminate_zeros()
+    adjacency.sort_indices()
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+
+    k = min(nEvals, n - 1)
+    _MBS_STATE.update(adjacency=adjacency, degrees=degrees, k=k, v0=None)
+
+    if (degrees <= 0).any() or n < 3:
+        return
+
+    try:
+        _, vectors = _calcSmallestEigs(adjacency, degrees, k,
+                                       return_eigenvectors=True)
+    except Exception as err:
+        LOGGER.debug('Unable to compute the unmutated spectrum. {0}'
+                     .format(err))
+        return
+
+    # eigensolves of point mutations start from the unmutated spectrum
+    _MBS_STATE['v0'] = vectors.sum(axis=1)
+
+
+def _calcSmallestEigs(adjacency, degrees, k, index=None, cols=None,
+                      weights=None, v0=None, return_eigenvectors=False):
+    """Returns *k* smallest eigenvalues of the normalized Laplacian
+    ``I - D^(-1/2) A D^(-1/2)`` of *adjacency* with *degrees*. If *index* is 
+    given, links of the atom at *index* to atoms at *cols* with *weights* are 
+    removed from the adjacency matrix, which is not modified or copied. 
+    Eigenvalues of the normalized Laplacian are within [0, 2], so the largest
+    eigenvalues of ``I + D^(-1/2) A D^(-1/2)`` are computed."""
+
+    from scipy.sparse.linalg import LinearOperator, eigsh
+
+    n = len(degrees)
+    scale = 1. / np.sqrt(degrees)
+
+    def matvec(x):
+        y = np.asarray(x, dtype=float).ravel() * scale
+        z = adjacency.dot(y)
+        if index is not None:
+            z[index] -= np.dot(weights, y[cols])
+            z[cols] -= weights * y[index]
+        z *= scale
+        z += np.asarray(x).ravel()
+        return z
+
+    operator = LinearOperator((n, n), matvec=matvec, dtype=float)
+    result = eigsh(operator, k=k, which='LA', v0=v0,
+                   return_eigenvectors=return_eigenvectors)
+    if return_eigenvectors:
+        return 2. - result[0], result[1]
+    return 2. - result
+
+
+def _calcMBSDirect(index):
+    """Returns MBS at *index* by solving the eigenproblem of the normalized
+    Laplacian of the mutated similarity matrix from scratch."""
+
+    from scipy.sparse.linalg import eigsh
+
+    # cut "non-covalent" bonds around atom 'index'
+    adjacency = MBSPointMutation(_MBS_STATE['adjacency'], index).tocsr()
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    # isolated atoms have zero rows in the normalized laplacian
+    isolated = degrees == 0
+    scale = 1. / np.sqrt(np.where(isolated, 1., degrees))
+    laplacian = sparse.diags(1. - isolated) - \
+                sparse.diags(scale) * adjacency * sparse.diags(scale)
+    evals = eigsh(laplacian, k=_MBS_STATE['k'], which='SM',
+                  return_eigenvectors=False)
+    # sort eigvals in ascending order
+    evals = np.sort(evals)
+    # compute MBS at site i
+    return np.sum(1./evals[1:])
+
+
+def _calcMBSAt(index):
+    """Returns MBS at *index*. The point mutation removes links of the atom to
+    non-adjacent atoms, which is a low-rank edit of the shared adjacency 
+    matrix, so the mutated Laplacian is applied without being built."""
+
+    adjacency = _MBS_STATE['adjacency']
+    degrees = _MBS_STATE['degrees']
+
+    start, stop = adjacency.indptr[index], adjacency.indptr[index + 1]
+    cols = adjacency.indices[start:stop]
+    weights = adjacency.data[start:stop]
+    cut = np.abs(cols - index) > 1
+    cols = cols[cut]
+    weights = weights[cut]
+
+    newDegrees = degrees.copy()
+    newDegrees[index] -= weights.sum()
+    newDegrees[cols] -= weights
+    if (newDegrees <= 0).any():
+        # isolated atoms have zero rows in the normalized laplacian
+        return _calcMBSDirect(index)
+
+    evals = _calcSmallestEigs(adjacency, newDegrees, _MBS_STATE['k'], index,
+                              cols, weights, v0=_MBS_STATE['v0'])
+    # sort eigvals in ascending order
+    evals = np.sort(evals)
+    # compute MBS at site i
+    return np.sum(1./evals[1:])
+
+
+def _calcMBSChunk(indices):
+    """Returns MBS at *indices* and error messages for failed positions."""
+
+    mbs = np.zeros(len(indices))
+    errors = []
+    for j, i in enumerate(indices):
+        try:
+            mbs[j] = _calcMBSAt(i)
+        except Exception as err:
+            errors.append('Unable to compute MBS at position '
+                          '{0}. {1}'.format(i, err))
+            mbs[j] = np.nan
+    return mbs, errors
+
+
 def calcMBSfromSim(simMatrix, nEvals=20, remove_outliers=True,
                    remove_offset=True, **kwargs):
+    """Returns the mechanical bridging score (MBS) profile computed from 
+    similarity matrix *simMatrix*. Point mutations are applied as edits of 
+    the shared Laplacian of *simMatrix* without copying it, and eigensolves 
+    of mutated Laplacians start from the unmutated spectrum.
+
+    :arg n_cpu: number of processes that positions are distributed to, 
+        default is 1
+    :type n_cpu: int
+    """
+
+    n_cpu = int(kwargs.pop('n_cpu', 1))
 
     LOGGER.timeit('_MBS')
     n = simMatrix.shape[0]
-    mbs = np.zeros(n) 
-    for i in range(n):
+    chunks = np.array_split(np.arange(n), min(max(n_cpu, 1), n) or 1)
+    if n_cpu > 1 and len(chunks) > 1:
+        from multiprocessing import Pool
+
+        pool = Pool(len(chunks), initializer=_initMBS,
+                    initargs=(sparse.csr_matrix(simMatrix), nEvals))
         try:
-            # cut "non-covalent" bonds around atom 'i'
-            modSim = MBSPointMutation(simMatrix, i)
-            # compute laplacian's spectrum of eigvals
-            laplacian = sparse.csgraph.laplacian(modSim, normed=True)
-            evals = sparse.linalg.eigsh(laplacian, k=min(nEvals, n-1), 
-                                        which='SM', return_eigenvectors=False)
-            # sort eigvals in ascending order
-            evals = np.sort(evals)
-            # compute MBS at site i
-            mbs[i] = np.sum(1./evals[1:])
-        except Exception as err:
-            LOGGER.warn('Unable to compute MBS at position '
-                        '{0}. {1}'.format(i, err))
-            mbs[i] = np.nan
+            results = pool.map(_calcMBSChunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _initMBS(simMatrix, nEvals)
+        results = [_calcMBSChunk(chunk) for chunk in chunks]
+        _MBS_STATE.clear()
+
+    mbs = np.concatenate([result[0] for result in results])
+    for result in results:
+        for error in result[1]:
+            LOGGER.warn(error)
+
     if any(~np.isnan(mbs)):
         # remove outliers
         if remove_outliers is True:
@@ -127,8 +332,7 @@ def calcMBSfromSim(simMatrix, nEvals=20, remove_outliers=True,
 def calcMBS(anm, atomGroup, remove_outliers=True, remove_offset=True, 
             **kwargs):
 
-    distFlucts = calcDistFlucts(anm, norm=False)
-    sparseSim, sigma = calcSpectrusSims(distFlucts, atomGroup, **kwargs)
+    sparseSim, sigma = calcSpectrusSims(anm, atomGroup, **kwargs)
     mbs = calcMBSfromSim(sparseSim, **kwargs)
 
     return mbs
@@ -83,6 +83,7 @@ Following functions can be used to generate conformers along normal modes:
 
   * :func:`.deformAtoms` - deform atoms along a mode
   * :func:`.sampleModes` - deform along random combination of a set of modes
+  * :func:`.iterSampleModes` - yield blocks of conformations sampled along modes
   * :func:`.traverseMode` - traverse a mode along both directions
 
 Editing models
@@ -2,8 +2,6 @@
 """This module defines functions for calculating physical properties from normal
 modes."""
 
-import time
-
 import numpy as np
 
 from prody import LOGGER
@@ -14,7 +12,7 @@ from prody.trajectory import TrajBase
 from prody.utilities import importLA, checkCoords
 from numpy import sqrt, arange, log, polyfit, array, arccos, dot
 
-from .nma import NMA
+from .nma import NMA, _calcCovariance
 from .modeset import ModeSet
 from .mode import VectorBase, Mode, Vector
 from .gnm import GNMBase
@@ -31,47 +29,46 @@ def calcCollectivity(mode, masses=None):
     """Returns collectivity of the mode.  This function implements collectivity
     as defined in equation 5 of [BR95]_.  If *masses* are provided, they will
     be incorporated in the calculation.  Otherwise, atoms are assumed to have
-    uniform masses.
+    uniform masses.  For a :class:`.ModeSet` or :class:`.NMA`, collectivities
+    of all modes are calculated at once from the eigenvector matrix.
 
     .. [BR95] Bruschweiler R. Collective protein dynamics and nuclear
        spin relaxation. *J Chem Phys* **1995** 102:3396-3403.
 
     :arg mode: mode or vector
-    :type mode: :class:`.Mode` or :class:`.Vector`
+    :type mode: :class:`.Mode`, :class:`.ModeSet`, or :class:`.NMA`
 
     :arg masses: atomic masses
     :type masses: :class:`numpy.ndarray`"""
 
-    if not isinstance(mode, (Mode, ModeSet)):
-        raise TypeError('mode must be a Mode or ModeSet instance')
-    if isinstance(mode, Mode):
-        mode = [mode]
-    
-    colls = []
-
-    def log0(a):
-        return log(a + np.finfo(float).eps)
-
-    for m in mode:
-        is3d = m.is3d()
-        if masses is not None:
-            if len(masses) != m.numAtoms():
-                raise ValueError('length of masses must be equal to number of atoms')
-            if is3d:
-                u2in = (m.getArrayNx3() ** 2).sum(1) / masses
-        else:
-            if is3d:
-                u2in = (m.getArrayNx3() ** 2).sum(1)
-            else:
-                u2in = (m.getArrayNx3() ** 2)
-        u2in = u2in * (1 / u2in.sum() ** 0.5)
-        coll = np.exp(-(u2in * log0(u2in)).sum()) / m.numAtoms()
-        colls.append(coll)
-    
-    if len(mode) == 1:
-        return coll
+    if not isinstance(mode, (Mode, ModeSet, NMA)):
+        raise TypeError('mode must be a Mode, ModeSet, or NMA instance')
+
+    n_atoms = mode.numAtoms()
+    if masses is not None and len(masses) != n_atoms:
+        raise ValueError('length of masses must be equal to number of atoms')
+
+    array, _ = _getModeArrays(mode)
+    colls = _calcCollectivity(array, n_atoms, mode.is3d(), masses)
+
+    if isinstance(mode, Mode) or len(colls) == 1:
+        return colls[0]
     else:
-        return colls
+        return list(colls)
+
+
+def _calcCollectivity(array, n_atoms, is3d, masses=None):
+    """Returns collectivities of eigenvectors in columns of *array*."""
+
+    array = array.reshape((array.shape[0], -1))
+    u2in = array ** 2
+    if is3d:
+        u2in = u2in.reshape((n_atoms, 3, -1)).sum(1)
+    if masses is not None:
+        u2in /= np.asarray(masses, dtype=float)[:, np.newaxis]
+    u2in *= 1 / u2in.sum(0) ** 0.5
+    return np.exp(-(u2in * log(u2in + np.finfo(float).eps)).sum(0)) / n_atoms
+
 
 def calcSpecDimension(mode):
 
@@ -119,7 +116,7 @@ def calcFractVariance(mode):
     return var / trace
 
 
-def calcProjection(ensemble, modes, rmsd=True, norm=True):
+def calcProjection(ensemble, modes, rmsd=True, norm=True, **kwargs):
     """Returns projection of conformational deviations onto given modes.
     *ensemble* coordinates are used to calculate the deviations that are
     projected onto *modes*.  For K conformations and M modes, a (K,M)
@@ -129,55 +126,150 @@ def calcProjection(ensemble, modes, rmsd=True, norm=True):
         deviation(s) will be projected, or a deformation vector
     :type ensemble: :class:`.Ensemble`, :class:`.Conformation`,
         :class:`.Vector`, :class:`.Trajectory`
-    :arg modes: up to three normal modes
-    :type modes: :class:`.Mode`, :class:`.ModeSet`, :class:`.NMA`
+    :arg modes: up to three normal modes, or a list of modes from different
+        models, in which case a list of projections is returned
+    :type modes: :class:`.Mode`, :class:`.ModeSet`, :class:`.NMA`, list
 
     By default root-mean-square deviation (RMSD) along the normal mode is
     calculated. To calculate the projection pass ``rmsd=True``.
     :class:`.Vector` instances are accepted as *ensemble* argument to allow
-    for projecting a deformation vector onto normal modes."""
+    for projecting a deformation vector onto normal modes.
+
+    Frames of trajectories are read in blocks, which are projected onto all
+    *modes* at once, so that only projections are kept in memory.
+
+    :arg chunk_size: number of frames read at once, default is 1000
+    :type chunk_size: int
+
+    :arg superpose: if **True**, frames of a trajectory are superposed onto
+        its reference coordinates before deviations are calculated, default
+        is **False**
+    :type superpose: bool"""
+
+    chunk_size = kwargs.pop('chunk_size', 1000)
+    superpose = kwargs.pop('superpose', False)
 
     if not isinstance(ensemble, (Ensemble, Conformation, Vector, TrajBase)):
         raise TypeError('ensemble must be Ensemble, Conformation, Vector, '
                         'or a TrajBase, not {0}'.format(type(ensemble)))
-    if not isinstance(modes, (NMA, ModeSet, VectorBase)):
-        raise TypeError('rows must be NMA, ModeSet, or Mode, not {0}'
-                        .format(type(modes)))
-    if not modes.is3d():
-        raise ValueError('modes must be 3-dimensional')
+
+    multiple = isinstance(modes, (list, tuple))
+    modesets = modes if multiple else [modes]
+    for modes in modesets:
+        if not isinstance(modes, (NMA, ModeSet, VectorBase)):
+            raise TypeError('rows must be NMA, ModeSet, or Mode, not {0}'
+                            .format(type(modes)))
+        if not modes.is3d():
+            raise ValueError('modes must be 3-dimensional')
     if isinstance(ensemble, Vector):
         n_atoms = ensemble.numAtoms()
     else:
         n_atoms = ensemble.numSelected()
-    if n_atoms != modes.numAtoms():
-        raise ValueError('number of atoms are not the same')
-    if isinstance(ensemble, Vector):
-        if not ensemble.is3d():
-            raise ValueError('ensemble must be a 3d vector instance')
-        deviations = ensemble._getArray()
-    elif isinstance(ensemble, (Ensemble, Conformation)):
-        deviations = ensemble.getDeviations()
-    else:
-        nfi = ensemble.nextIndex()
-        ensemble.goto(0)
-        deviations = np.array([frame.getDeviations() for frame in ensemble])
-        ensemble.goto(nfi)
-    if deviations.ndim == 3:
-        deviations = deviations.reshape((deviations.shape[0],
-                                         deviations.shape[1] * 3))
-    elif deviations.ndim == 2:
-        deviations = deviations.reshape((1, deviations.shape[0] * 3))
+    for modes in modesets:
+        if n_atoms != modes.numAtoms():
+            raise ValueError('number of atoms are not the same')
+
+    # modes are stacked to project deviations onto all of them at once
+    n_atoms = int(n_atoms)
+    arrays = [modes._getArray() for modes in modesets]
+    array = np.hstack([arr.reshape((n_atoms * 3, -1)) for arr in arrays])
+
+    if isinstance(ensemble, TrajBase):
+        projection, sqsum = _projectTrajectory(ensemble, array, chunk_size,
+                                               superpose)
     else:
-        deviations = deviations.reshape((1, deviations.shape[0]))
-    la = importLA()
+        if isinstance(ensemble, Vector):
+            if not ensemble.is3d():
+                raise ValueError('ensemble must be a 3d vector instance')
+            deviations = ensemble._getArray()
+        else:
+            deviations = ensemble.getDeviations()
+        deviations = deviations.reshape((-1, n_atoms * 3))
+        projection = np.dot(deviations, array)
+        sqsum = (deviations ** 2).sum()
+
     if norm:
-        N = la.norm(deviations)
+        N = sqsum ** 0.5
         if N != 0:
-            deviations = deviations / N
-    projection = np.dot(deviations, modes._getArray())
+            projection /= N
     if rmsd:
-        projection = (1 / (n_atoms ** 0.5)) * projection
-    return projection
+        projection *= (1 / (n_atoms ** 0.5))
+
+    projections = []
+    start = 0
+    for arr in arrays:
+        stop = start + (1 if arr.ndim == 1 else arr.shape[1])
+        proj = projection[:, start:stop]
+        if arr.ndim == 1:
+            proj = proj[:, 0]
+        projections.append(proj)
+        start = stop
+
+    if multiple:
+        return projections
+    return projections[0]
+
+
+def _projectTrajectory(traj, array, chunk_size=1000, superpose=False):
+    """Returns projections of deviations of frames of *traj* onto columns of
+    *array* and sum of squared deviations. Frames are read in blocks of
+    *chunk_size*, and are superposed onto reference coordinates if
+    *superpose* is **True**."""
+
+    n_atoms = traj.numSelected()
+    target = traj._getCoords()
+    if target is None:
+        raise ValueError('reference coordinates of trajectory are not set')
+    weights = traj._getWeights()
+
+    nfi = traj.nextIndex()
+    traj.reset()
+
+    blocks = []
+    sqsum = 0.
+    while True:
+        coords = traj.nextCoordsets(chunk_size)
+        if coords is None:
+            break
+        if superpose:
+            coords = _superposeBlock(coords, target, weights)
+        deviations = (coords - target).reshape((len(coords), n_atoms * 3))
+        blocks.append(np.dot(deviations, array))
+        sqsum += (deviations ** 2).sum()
+
+    traj.goto(nfi)
+
+    if blocks:
+        return np.concatenate(blocks), sqsum
+    return np.zeros((0, array.shape[1])), sqsum
+
+
+def _superposeBlock(coords, target, weights=None):
+    """Returns coordinate sets in *coords* superposed onto *target*, which
+    are rotated at once using stacked singular value decompositions."""
+
+    if weights is None:
+        tar_com = target.mean(0)
+        mob_com = coords.mean(1)
+        tar_org = target - tar_com
+        mob_org = coords - mob_com[:, np.newaxis]
+        matrix = np.matmul(tar_org.T, mob_org)
+    else:
+        weights = weights.reshape((-1, 1))
+        weights_sum = weights.sum()
+        tar_com = (target * weights).sum(0) / weights_sum
+        mob_com = (coords * weights).sum(1) / weights_sum
+        tar_org = target - tar_com
+        mob_org = coords - mob_com[:, np.newaxis]
+        matrix = np.matmul((tar_org * weights).T, mob_org * weights)
+
+    U, s, Vh = np.linalg.svd(matrix)
+    Id = np.ones((len(coords), 3))
+    Id[:, 2] = np.sign(np.linalg.det(matrix))
+    # rotation = Vh.T * Id * U.T for each coordinate set
+    rotation = np.matmul(Vh.transpose(0, 2, 1) * Id[:, np.newaxis, :],
+                         U.transpose(0, 2, 1))
+    return np.matmul(mob_org, rotation) + tar_com
 
 
 def calcCrossProjection(ensemble, mode1, mode2, scale=None, **kwargs):
@@ -213,8 +305,11 @@ def calcCrossProjection(ensemble, mode1, mode2, scale=None, **kwargs):
         scale = scale.lower()
         assert scale in ('x', 'y'), 'scale must be x or y'
 
-    xcoords = calcProjection(ensemble, mode1, kwargs.get('rmsd', True), kwargs.get('norm', True))
-    ycoords = calcProjection(ensemble, mode2, kwargs.pop('rmsd', True), kwargs.pop('norm', True))
+    xcoords, ycoords = calcProjection(ensemble, [mode1, mode2],
+                                      kwargs.pop('rmsd', True),
+                                      kwargs.pop('norm', True),
+                                      chunk_size=kwargs.pop('chunk_size', 1000),
+                                      superpose=kwargs.pop('superpose', False))
     if scale:
         scalar = kwargs.get('scalar', None)
         if scalar:
@@ -256,7 +351,7 @@ def calcSqFlucts(modes):
                     raise TypeError('modes can be a list of Mode instances, '
                                     'not {0}'.format(type(mode)))
                 modes2.append(mode)
-            mode = list(modes2)
+            modes = list(modes2)
         except TypeError:
             raise TypeError('modes must be a Mode, NMA, ModeSet instance, '
                             'or a list of Mode instances, not {0}'.format(type(modes)))
@@ -272,27 +367,61 @@ def calcSqFlucts(modes):
             return (modes._getArrayNx3()**2).sum(axis=1)
         else:
             return (modes._getArray() ** 2)
+    elif isinstance(modes, (Mode, ModeSet, NMA)):
+        array, variances = _getModeArrays(modes)
+        return _calcSqFlucts(array, variances, is3d)
     else:
         sq_flucts = np.zeros(n_atoms)
-        if isinstance(modes, VectorBase):
-            modes = [modes]
         for mode in modes:
-            if is3d:
-                sq_flucts += ((mode._getArrayNx3()**2).sum(axis=1) *
-                              mode.getVariance())
-            else:
-                sq_flucts += (mode._getArray() ** 2) * mode.getVariance()
+            sq_flucts += _calcSqFlucts(mode._getArray(),
+                                       [mode.getVariance()], is3d)
         return sq_flucts
 
 
-def calcCrossCorr(modes, n_cpu=1, norm=True):
+def _calcSqFlucts(array, variances, is3d):
+    """Returns square fluctuations for eigenvectors in columns of *array*
+    weighted by *variances*, summed over all modes in a single product."""
+
+    array = array.reshape((array.shape[0], -1))
+    sq_flucts = np.dot(array ** 2, np.asarray(variances, dtype=float))
+    if is3d:
+        sq_flucts = sq_flucts.reshape((-1, 3)).sum(1)
+    return sq_flucts
+
+
+def _getModeArrays(modes):
+    """Returns eigenvectors and variances of *modes*."""
+
+    if isinstance(modes, Mode):
+        return modes._getArray(), np.array([modes.getVariance()])
+    elif isinstance(modes, ModeSet):
+        return modes._getArray(), modes.getVariances()
+    elif isinstance(modes, NMA):
+        return modes._getArray(), modes._vars
+    raise TypeError('modes must be a Mode, NMA, or ModeSet instance, '
+                    'not {0}'.format(type(modes)))
+
+def calcCrossCorr(modes, n_cpu=1, norm=True, **kwargs):
     """Returns cross-correlations matrix.  For a 3-d model, cross-correlations
     matrix is an NxN matrix, where N is the number of atoms.  Each element of
     this matrix is the trace of the submatrix corresponding to a pair of atoms.
     Covariance matrix may be calculated using all modes or a subset of modes
     of an NMA instance.  For large systems, calculation of cross-correlations
-    matrix may be time consuming.  Optionally, multiple processors may be
-    employed to perform calculations by passing ``n_cpu=2`` or more."""
+    matrix may be time consuming.  The matrix is calculated in blocks of rows, 
+    and optionally, multiple threads may be employed to calculate blocks by 
+    passing ``n_cpu=2`` or more.
+
+    :arg out: an array or a :class:`~numpy.memmap` with shape ``(N, N)`` that 
+        the matrix is written into block by block, e.g. for matrices that do 
+        not fit into memory
+    :type out: :class:`~numpy.ndarray`
+
+    :arg dtype: data type of the matrix, ``np.float32`` halves memory usage, 
+        default is the type of *out* or float
+    :type dtype: :class:`~numpy.dtype`
+
+    :arg block_size: number of rows calculated at once
+    :type block_size: int"""
 
     if not isinstance(n_cpu, int):
         raise TypeError('n_cpu must be an integer')
@@ -303,69 +432,12 @@ def calcCrossCorr(modes, n_cpu=1, norm=True):
         raise TypeError('modes must be a Mode, NMA, or ModeSet instance, '
                         'not {0}'.format(type(modes)))
 
-    if modes.is3d():
-        model = modes
-        if isinstance(modes, (Mode, ModeSet)):
-            model = modes._model
-            if isinstance(modes, (Mode)):
-                indices = [modes.getIndex()]
-                n_modes = 1
-            else:
-                indices = modes.getIndices()
-                n_modes = len(modes)
-        else:
-            n_modes = len(modes)
-            indices = np.arange(n_modes)
-        array = model._getArray()
-        n_atoms = model._n_atoms
-        variances = model._vars
-        if n_cpu == 1:
-            s = (n_modes, n_atoms, 3)
-            arvar = (array[:, indices]*variances[indices]).T.reshape(s)
-            array = array[:, indices].T.reshape(s)
-            covariance = np.tensordot(array.transpose(2, 0, 1),
-                                      arvar.transpose(0, 2, 1),
-                                      axes=([0, 1], [1, 0]))
-        else:
-            import multiprocessing
-            n_cpu = min(multiprocessing.cpu_count(), n_cpu)
-            queue = multiprocessing.Queue()
-            size = n_modes / n_cpu
-            for i in range(n_cpu):
-                if n_cpu - i == 1:
-                    indices = modes.indices[i*size:]
-                else:
-                    indices = modes.indices[i*size:(i+1)*size]
-                process = multiprocessing.Process(
-                    target=_crossCorrelations,
-                    args=(queue, n_atoms, array, variances, indices))
-                process.start()
-            while queue.qsize() < n_cpu:
-                time.sleep(0.05)
-            covariance = queue.get()
-            while queue.qsize() > 0:
-                covariance += queue.get()
-    else:
-        covariance = calcCovariance(modes)
-    if norm:
-        diag = np.power(covariance.diagonal(), 0.5)
-        covariance /= np.outer(diag, diag)
-    return covariance
-
+    array, variances = _getModeArrays(modes)
+    return _calcCovariance(array, variances, trace=modes.is3d(), norm=norm,
+                           n_cpu=n_cpu, **kwargs)
 
-def _crossCorrelations(queue, n_atoms, array, variances, indices):
-    """Calculate covariance-matrix for a subset of modes."""
 
-    n_modes = len(indices)
-    arvar = (array[:, indices] * variances[indices]).T.reshape((n_modes,
-                                                                n_atoms, 3))
-    array = array[:, indices].T.reshape((n_modes, n_atoms, 3))
-    covariance = np.tensordot(array.transpose(2, 0, 1),
-                              arvar.transpose(0, 2, 1),
-                              axes=([0, 1], [1, 0]))
-    queue.put(covariance)
-
-def calcDistFlucts(modes, n_cpu=1, norm=True):
+def calcDistFlucts(modes, n_cpu=1, norm=True, **kwargs):
     """Returns the matrix of distance fluctuations (i.e. an NxN matrix
     where N is the number of residues, of MSFs in the inter-residue distances)
     computed from the cross-correlation matrix (see Eq. 12.E.1 in [IB18]_). 
@@ -374,17 +446,26 @@ def calcDistFlucts(modes, n_cpu=1, norm=True):
     .. [IB18] Dill K, Jernigan RL, Bahar I. Protein Actions: Principles and
        Modeling. *Garland Science* **2017**. """
 
-    cc = calcCrossCorr(modes, n_cpu=n_cpu, norm=norm)
-    cc_diag = np.diag(cc).reshape(-1,1)
-    distFluct = cc_diag.T + cc_diag -2.*cc
-    return distFluct
+    cc = calcCrossCorr(modes, n_cpu=n_cpu, norm=norm, **kwargs)
+    cc_diag = np.diag(cc).copy()
+
+    # the cross-correlation matrix is overwritten block by block
+    n = len(cc_diag)
+    block_size = kwargs.get('block_size') or max(2**22 // max(n, 1), 1)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = cc[start:stop]
+        block *= -2.
+        block += cc_diag
+        block += cc_diag[start:stop, np.newaxis]
+    return cc
 
 def calcTempFactors(modes, atoms):
     """Returns temperature (β) factors calculated using *modes* from a
     :class:`.ANM` or :class:`.GNM` instance scaled according to the 
     experimental B-factors from *atoms*."""
 
-    model = modes.getModel()
+    model = modes if isinstance(modes, NMA) else modes.getModel()
     if not isinstance(model, GNMBase):
         raise TypeError('modes must come from GNM or ANM')
     if model.numAtoms() != atoms.numAtoms():
@@ -393,17 +474,19 @@ def calcTempFactors(modes, atoms):
     return sqf / ((sqf**2).sum()**0.5) * (atoms.getBetas()**2).sum()**0.5
 
 
-def calcCovariance(modes):
-    """Returns covariance matrix calculated for given *modes*."""
+def calcCovariance(modes, **kwargs):
+    """Returns covariance matrix calculated for given *modes*.  *out*, *dtype*, 
+    *n_cpu*, and *block_size* arguments of :func:`.calcCrossCorr` may be used 
+    to control the calculation of the matrix."""
 
     if isinstance(modes, Mode):
         array = modes._getArray()
         return np.outer(array, array) * modes.getVariance()
-    elif isinstance(modes, ModeSet):
-        array = modes._getArray()
-        return np.dot(array, np.dot(np.diag(modes.getVariances()), array.T))
-    elif isinstance(modes, NMA):
+    elif isinstance(modes, NMA) and not kwargs:
         return modes.getCovariance()
+    elif isinstance(modes, (ModeSet, NMA)):
+        array, variances = _getModeArrays(modes)
+        return _calcCovariance(array, variances, **kwargs)
     else:
         raise TypeError('modes must be a Mode, NMA, or ModeSet instance')
 
@@ -4,6 +4,7 @@ models."""
 
 import numpy as np
 from numbers import Integral
+from collections import OrderedDict
 from prody import LOGGER, SETTINGS
 from prody.utilities import openFile
 
@@ -16,7 +17,8 @@ __all__ = ['calcOverlap', 'calcCumulOverlap', 'calcSubspaceOverlap',
            'calcSpectralOverlap', 'calcCovOverlap', 'printOverlapTable', 'writeOverlapTable',
            'pairModes', 'matchModes']
 
-SO_CACHE = {}
+SO_CACHE = OrderedDict()
+SO_CACHE_SIZE = 2**24  # maximum number of elements of arrays in SO_CACHE
 
 def calcOverlap(rows, cols):
     """Returns overlap (or correlation) between two sets of modes (*rows* and
@@ -168,7 +170,12 @@ def calcSpectralOverlap(modes1, modes2, turbo=False):
 
     .. [BH02] Hess B. Convergence of sampling in protein simulations.
         *Phys Rev E* **2002** 65(3):031910.
-    
+
+    :arg turbo: if **True**, squared overlaps between all modes of the two 
+        models are kept in a cache for later calls with other subsets of 
+        their modes. The oldest results are discarded when cached arrays 
+        have more than :data:`SO_CACHE_SIZE` elements. Default is **False**
+    :type turbo: bool
     """
 
     if modes1.is3d() ^ modes2.is3d():
@@ -197,7 +204,7 @@ def calcSpectralOverlap(modes1, modes2, turbo=False):
         if (model1, model2) in SO_CACHE:
             weights = SO_CACHE[(model1, model2)]
         elif (model2, model1) in SO_CACHE:
-            weights = SO_CACHE[(model2, model1)]
+            weights = SO_CACHE[(model2, model1)].T
         else:
             farrayA = model1._getArray()
             farrayB = model2._getArray()
@@ -208,6 +215,11 @@ def calcSpectralOverlap(modes1, modes2, turbo=False):
             dotAB = np.dot(farrayA.T, farrayB)**2
             outerAB = np.outer(fvarA**0.5, fvarB**0.5)
             SO_CACHE[(model1, model2)] = weights = outerAB * dotAB
+
+            # the oldest results are discarded to keep the cache bounded
+            size = sum(value.size for value in SO_CACHE.values())
+            while size > SO_CACHE_SIZE and len(SO_CACHE) > 1:
+                size -= SO_CACHE.popitem(last=False)[1].size
         
         weights = weights[I, :][:, J]
     else:
@@ -270,86 +282,207 @@ def pairModes(modes1, modes2, index=False):
 
     return outmodes1, outmodes2
 
-def _pairModes_wrapper(args):
-    modeset0, modesets, index = args
+_MATCH_POOL = None
+_MATCH_POOL_SIZE = 0
+_MATCH_POOL_ATEXIT = False
 
-    ret = []
-    for modeset in modesets:
-        _, reordered_modeset = pairModes(modeset0, modeset, index=index)
-        ret.append(reordered_modeset)
-    return ret
+def _getMatchPool(n_workers):
+    """Returns a persistent pool of *n_workers* worker processes for solving
+    mode assignments. The pool is created at the first call and reused in
+    later calls as long as the number of workers does not change."""
+
+    global _MATCH_POOL, _MATCH_POOL_SIZE, _MATCH_POOL_ATEXIT
+
+    if _MATCH_POOL is not None and _MATCH_POOL_SIZE != n_workers:
+        _closeMatchPool()
+
+    if _MATCH_POOL is None:
+        from multiprocessing import Pool
+
+        _MATCH_POOL = Pool(n_workers)
+        _MATCH_POOL_SIZE = n_workers
+        if not _MATCH_POOL_ATEXIT:
+            import atexit
+            atexit.register(_closeMatchPool)
+            _MATCH_POOL_ATEXIT = True
+
+    return _MATCH_POOL
+
+def _closeMatchPool():
+    """Terminates the persistent pool used by :func:`matchModes`."""
+
+    global _MATCH_POOL, _MATCH_POOL_SIZE
+
+    if _MATCH_POOL is not None:
+        _MATCH_POOL.terminate()
+        _MATCH_POOL.join()
+        _MATCH_POOL = None
+        _MATCH_POOL_SIZE = 0
+
+def _assignModes(costs):
+    """Returns optimal column permutations for a stack of square cost
+    matrices with shape ``(n_sets, n_modes, n_modes)``."""
+
+    from scipy.optimize import linear_sum_assignment
+
+    perms = np.empty(costs.shape[:2], dtype=int)
+    for i, cost in enumerate(costs):
+        row_ind, col_ind = linear_sum_assignment(cost)
+        perms[i, row_ind] = col_ind
+    return perms
+
+def _matchModeArrays(eigvecs, n_iter=1, turbo=False):
+    """Returns an array with shape ``(n_sets, n_modes)`` whose rows are the
+    permutations that match the modes of each set to the reference.
+
+    :arg eigvecs: eigenvectors of mode sets stacked in an array with shape
+        ``(n_sets, n_dof, n_modes)``
+    :type eigvecs: :class:`~numpy.ndarray`
+
+    :arg n_iter: maximum number of matching rounds. The first mode set is
+        the reference in the first round, and the sign-corrected mean of
+        matched modes is the reference in the following rounds, until
+        permutations stop changing. Default is 1
+    :type n_iter: int
+
+    :arg turbo: if **True** or a number, cost matrices are solved by a
+        persistent pool of as many worker processes as the number of CPUs
+        or the given number
+    :type turbo: bool, int
+    """
+
+    eigvecs = np.asarray(eigvecs, dtype=float)
+    n_sets, _, n_modes = eigvecs.shape
+
+    norms = np.sqrt((eigvecs ** 2).sum(axis=1))
+    norms[norms == 0] = 1.
+    eigvecs = eigvecs / norms[:, np.newaxis, :]
+
+    n_workers = 1
+    if turbo is True:
+        from multiprocessing import cpu_count
+        n_workers = cpu_count()
+    elif turbo:
+        n_workers = int(turbo)
+    n_workers = min(n_workers, n_sets)
+
+    reference = eigvecs[0]
+    first = 1
+    perms = None
+    for i in range(max(int(n_iter), 1)):
+        # a single batched GEMM gives the overlaps of all sets to the reference
+        overlaps = np.matmul(reference.T, eigvecs[first:])
+        costs = 1. - np.abs(overlaps)
+
+        if n_workers > 1:
+            pool = _getMatchPool(n_workers)
+            chunks = np.array_split(costs, n_workers)
+            new_perms = np.concatenate(pool.map(_assignModes, chunks))
+        else:
+            new_perms = _assignModes(costs)
+
+        if first:
+            new_perms = np.vstack([np.arange(n_modes), new_perms])
+            first = 0
+
+        if perms is not None and (perms == new_perms).all():
+            LOGGER.debug('Mode matching converged after {0} rounds.'
+                         .format(i + 1))
+            break
+        perms = new_perms
+
+        if i + 1 < n_iter:
+            # re-reference to the sign-corrected mean of matched modes
+            matched = eigvecs[np.arange(n_sets)[:, np.newaxis, np.newaxis],
+                              np.arange(eigvecs.shape[1])[:, np.newaxis],
+                              perms[:, np.newaxis, :]]
+            signs = np.sign((reference * matched).sum(axis=1))
+            signs[signs == 0] = 1.
+            reference = (matched * signs[:, np.newaxis, :]).mean(axis=0)
+            norms = np.sqrt((reference ** 2).sum(axis=0))
+            norms[norms == 0] = 1.
+            reference = reference / norms
+
+    return perms
 
 def matchModes(*modesets, **kwargs):
     """Returns the matches of modes among *modesets*. Note that the first 
     modeset will be treated as the reference so that only the matching 
-    of each modeset to the first modeset is garanteed to be optimal.
+    of each modeset to the first modeset is garanteed to be optimal, 
+    unless *n_iter* is larger than 1.
+
+    Overlaps of all modesets to the reference are calculated at once using 
+    stacked eigenvectors, and only cost matrices are passed to worker 
+    processes when *turbo* is set.
     
     :arg index: if **True** then indices of modes will be returned instead of 
-                :class:`Mode` instances
+                :class:`Mode` instances. The first element contains indices 
+                of the modes of the first modeset in its model, and the others 
+                contain positions of matched modes in each modeset
     :type index: bool
 
     :arg turbo: if **True** then the computation will be performed in parallel. 
                 The number of threads is set to be the same as the number of 
                 CPUs. Assigning a number to specify the number of threads to be 
-                used. Note that if writing a script, ``if __name__ == '__main__'`` 
+                used. Worker processes are kept alive and reused by later calls. 
+                Note that if writing a script, ``if __name__ == '__main__'`` 
                 is necessary to protect your code when multi-tasking. 
                 See https://docs.python.org/2/library/multiprocessing.html for details.
                 Default is **False**
     :type turbo: bool, int
+
+    :arg n_iter: maximum number of matching rounds. After the first round, 
+                 modes are matched to the mean of the modes matched in the 
+                 previous round, including the modes of the first modeset, 
+                 until the matches do not change. Default is 1
+    :type n_iter: int
     """
 
     index = kwargs.pop('index', False)
     turbo = kwargs.pop('turbo', False)
+    n_iter = kwargs.pop('n_iter', 1)
 
-    n_worker = None
-    if not isinstance(turbo, bool):
-        n_worker = int(turbo)
+    n_sets = len(modesets)
+    if n_sets == 0:
+        raise ValueError('at least one modeset should be given')
 
-    modeset0 = modesets[0]
-    if index:
-        ret = [modeset0.getIndices()]
-    else:
-        ret = [modeset0]
+    for modeset in modesets:
+        if not isinstance(modeset, (ModeSet, NMA)):
+            raise TypeError('modesets should be ModeSet or NMA instances')
 
+    modeset0 = modesets[0]
     n_modes = len(modeset0)
-    n_sets = len(modesets)
+    if isinstance(modeset0, ModeSet):
+        indices0 = modeset0.getIndices()
+    else:
+        indices0 = np.arange(n_modes)
     if n_sets == 1:
-        return ret
-    elif n_sets == 0:
-        raise ValueError('at least one modeset should be given')
+        if index:
+            return [indices0]
+        return [modeset0]
+
+    n_dof = modeset0.numDOF()
+    eigvecs = np.empty((n_sets, n_dof, n_modes))
+    for i, modeset in enumerate(modesets):
+        if len(modeset) != n_modes:
+            raise ValueError('the same number of modes should be provided')
+        eigvecs[i] = modeset._getArray().reshape(n_dof, n_modes)
+
+    LOGGER.timeit('_prody_matchModes')
+    perms = _matchModeArrays(eigvecs, n_iter=n_iter, turbo=turbo)
+    LOGGER.report('{0} modes across {1} modesets were matched in %.2fs.'
+                  .format(n_modes, n_sets), '_prody_matchModes')
 
-    if turbo:
-        from multiprocessing import Pool, cpu_count
-        from math import ceil
-        
-        if not n_worker:
-            n_worker = cpu_count()
-
-        LOGGER.info('Matching {0} modes across {1} modesets with {2} threads...'
-                        .format(n_modes, n_sets, n_worker))
-
-        pool = Pool(n_worker)
-        n_sets_per_worker = ceil((n_sets - 1) / n_worker)
-        args = []
-        for i in range(n_worker):
-            start = i*n_sets_per_worker + 1
-            end = (i+1)*n_sets_per_worker + 1
-            subset = modesets[start:end]
-            args.append((modeset0, subset, index))
-        nested_ret = pool.map(_pairModes_wrapper, args)
-        for entry in nested_ret:
-            ret.extend(entry)
-
-        pool.close()
-        pool.join()
-    else:
-        LOGGER.progress('Matching {0} modes across {1} modesets...'
-                        .format(n_modes, n_sets), n_sets, '_prody_matchModes')
-        for i, modeset in enumerate(modesets):
-            LOGGER.update(i, label='_prody_matchModes')
-            if i > 0:
-                _, reordered_modeset = pairModes(modeset0, modeset, index=index)
-                ret.append(reordered_modeset)
-        LOGGER.finish()
+    if index:
+        return [indices0[perms[0]]] + list(perms[1:])
+
+    ret = []
+    for modeset, perm in zip(modesets, perms):
+        if modeset is modeset0 and (perm == np.arange(n_modes)).all():
+            ret.append(modeset)
+            continue
+        if isinstance(modeset, ModeSet):
+            perm = modeset._indices[perm]
+        ret.append(ModeSet(modeset.getModel(), perm))
     
     return ret
@@ -204,6 +204,51 @@ def sliceModel(model, atoms, select):
     return (nma, sel)
 
 
+def _reduceMatrix(matrix, system):
+    """Returns the Schur complement ``ss - so . inv(oo) . os`` of symmetric
+    *matrix* onto degrees of freedom where boolean array *system* is **True**.
+    The environment block is not inverted, but factorized (Cholesky for dense
+    and LU for sparse matrices) and solved for the coupling block.  Sparse
+    matrices are sliced and factorized in sparse format, and the reduced
+    matrix is returned as a dense array."""
+
+    from scipy import sparse
+
+    inner = np.flatnonzero(system)
+    outer = np.flatnonzero(np.invert(system))
+
+    if sparse.issparse(matrix):
+        matrix = sparse.csr_matrix(matrix)
+        rows = matrix[inner]
+        ss = rows[:, inner].toarray()
+        if not len(outer):
+            return ss
+        so = rows[:, outer]
+        oo = matrix[outer][:, outer]
+        os = so.T.toarray()
+        from scipy.sparse.linalg import splu
+        try:
+            x = splu(oo.tocsc()).solve(os)
+        except RuntimeError:
+            linalg = importLA()
+            x = np.dot(linalg.pinv(oo.toarray()), os)
+        return ss - so.dot(x)
+
+    rows = matrix.take(inner, 0)
+    ss = rows.take(inner, 1)
+    if not len(outer):
+        return ss
+    so = rows.take(outer, 1)
+    oo = matrix.take(outer, 0).take(outer, 1)
+    from scipy.linalg import cho_factor, cho_solve
+    try:
+        x = cho_solve(cho_factor(oo, overwrite_a=True), so.T)
+    except np.linalg.LinAlgError:
+        linalg = importLA()
+        x = np.dot(linalg.pinv(matrix.take(outer, 0).take(outer, 1)), so.T)
+    return ss - np.dot(so, x)
+
+
 def reduceModel(model, atoms, select):
     """Returns reduced NMA model.  Reduces a :class:`.NMA` model to a subset of
     *atoms* matching *select*.  This function behaves differently depending on
@@ -215,6 +260,14 @@ def reduceModel(model, atoms, select):
     energy.  This is based on the formulation in [KH00]_.  For :class:`.PCA`
     models, this function simply takes the sub-covariance matrix for selection.
 
+    The environment block of the force constant matrix is factorized and
+    solved rather than inverted, and sparse Hessian and Kirchhoff matrices
+    are reduced without being converted to dense arrays.  When a list of
+    selections is given, the environment outside all of them is factorized
+    only once, and each selection is reduced from the resulting smaller
+    matrix, which gives the same result as reducing to each selection
+    separately.
+
     .. [KH00] Hinsen K, Petrescu A-J, Dellerue S, Bellissent-Funel M-C, Kneller GR.
        Harmonicity in slow protein dynamics. *Chem Phys* **2000** 261:25-37.
 
@@ -224,12 +277,11 @@ def reduceModel(model, atoms, select):
     :arg atoms: atoms that were used to build the model
     :type atoms: :class:`.Atomic`
 
-    :arg select: an atom selection or a selection string
-    :type select: :class:`.Selection`, str
-
-    :returns: (:class:`.NMA`, :class:`.Selection`)"""
+    :arg select: an atom selection or a selection string, or a list of them
+    :type select: :class:`.Selection`, str, list
 
-    linalg = importLA()
+    :returns: (:class:`.NMA`, :class:`.Selection`), or a list of them when
+        a list of selections is given"""
 
     if not isinstance(model, NMA):
         raise TypeError('model must be an NMA instance, not {0}'
@@ -251,43 +303,43 @@ def reduceModel(model, atoms, select):
         raise ValueError('model matrix (Hessian/Kirchhoff/Covariance) is not '
                          'built')
 
-    which, select = sliceAtoms(atoms, select)
-    system = np.zeros(model.numAtoms(), dtype=bool)
-    system[which] = True
+    multiple = isinstance(select, (list, tuple))
+    if not multiple:
+        select = [select]
+
+    systems = []
+    selections = []
+    for sel in select:
+        which, sel = sliceAtoms(atoms, sel)
+        system = np.zeros(model.numAtoms(), dtype=bool)
+        system[which] = True
+        if model.is3d():
+            system = np.repeat(system, 3)
+        systems.append(system)
+        selections.append(sel)
 
-    other = np.invert(system)
-
-    if model.is3d():
-        system = np.repeat(system, 3)
-        other = np.repeat(other, 3)
-    ss = matrix[system, :][:, system]
     if isinstance(model, PCA):
-        eda = PCA(model.getTitle() + ' reduced')
-        eda.setCovariance(ss)
-        return eda, system
-    so = matrix[system, :][:, other]
-    os = matrix[other, :][:, system]
-    oo = matrix[other, :][:, other]
-
-    if other.any():
-        try:
-            invoo = linalg.inv(oo)
-        except:
-            invoo = linalg.pinv(oo)
-        
-        matrix = ss - np.dot(so, np.dot(invoo, os))
-    else:
-        matrix = ss
-
-    if isinstance(model, GNM):
-        gnm = GNM(model.getTitle() + ' reduced')
-        gnm.setKirchhoff(matrix)
-        return gnm, select
-    elif isinstance(model, ANM):
-        anm = ANM(model.getTitle() + ' reduced')
-        anm.setHessian(matrix)
-        return anm, select
-    elif isinstance(model, PCA):
-        eda = PCA(model.getTitle() + ' reduced')
-        eda.setCovariance(matrix)
-        return eda, select
+        reduced = []
+        for system, sel in zip(systems, selections):
+            indices = np.flatnonzero(system)
+            eda = PCA(model.getTitle() + ' reduced')
+            eda.setCovariance(matrix.take(indices, 0).take(indices, 1))
+            reduced.append((eda, sel))
+        return reduced if multiple else reduced[0]
+
+    union = np.any(systems, 0)
+    matrix = _reduceMatrix(matrix, union)
+
+    reduced = []
+    for system, sel in zip(systems, selections):
+        ss = _reduceMatrix(matrix, system[union])
+
+        if isinstance(model, GNM):
+            enm = GNM(model.getTitle() + ' reduced')
+            enm.setKirchhoff(ss)
+        else:
+            enm = ANM(model.getTitle() + ' reduced')
+            enm.setHessian(ss)
+        reduced.append((enm, sel))
+
+    return reduced if multiple else reduced[0]
@@ -34,6 +34,7 @@ class GNMBase(NMA):
         self._gamma = None
         self._hinges = None
         self._affinity = None
+        self._diagonal = None
         self._hitTime = None
         self._commuteTime = None
 
@@ -56,6 +57,7 @@ class GNMBase(NMA):
         self._is3d = False
         self._hinges = None
         self._affinity = None
+        self._diagonal = None
         self._hitTime = None
         self._commuteTime = None
 
@@ -134,11 +136,17 @@ class GNM(GNMBase):
         self._commuteTime = None
 
     def setKirchhoff(self, kirchhoff):
-        """Set Kirchhoff matrix."""
+        """Set Kirchhoff matrix.  A Scipy sparse matrix is also accepted."""
 
         if not isinstance(kirchhoff, np.ndarray):
-            raise TypeError('kirchhoff must be a Numpy array')
-        elif (not kirchhoff.ndim == 2 or
+            try:
+                from scipy.sparse import issparse
+            except ImportError:
+                issparse = lambda matrix: False
+            if not issparse(kirchhoff):
+                raise TypeError('kirchhoff must be a Numpy array or a Scipy '
+                                'sparse matrix')
+        if (not kirchhoff.ndim == 2 or
               kirchhoff.shape[0] != kirchhoff.shape[1]):
             raise ValueError('kirchhoff must be a square matrix')
         elif kirchhoff.dtype != float:
@@ -249,69 +257,149 @@ class GNM(GNMBase):
         if self._kirchhoff is None:
             raise TypeError('Kirchhoff needs to be built before affinities can be computed')
 
-        if not isinstance(self._kirchhoff, np.ndarray):
-            raise TypeError('kirchhoff must be a Numpy array')
-        elif (not self._kirchhoff.ndim == 2 or
-              self._kirchhoff.shape[0] != self._kirchhoff.shape[1]):
+        K = self._kirchhoff
+        if (not K.ndim == 2 or K.shape[0] != K.shape[1]):
             raise ValueError('kirchhoff must be a square matrix')
-        elif self._kirchhoff.dtype != float:
-            try:
-                self.kirchhoff = self.kirchhoff.astype(float)
-            except:
-                raise ValueError('kirchhoff.dtype must be float')
 
         from scipy import sparse
 
-        self._diagonal = np.diag(self._kirchhoff)
-        
-        self._affinity = sparse.spdiags(self._diagonal, 0, len(self._diagonal), 
-            len(self._diagonal)).toarray() - self._kirchhoff
-
-    def calcHitTime(self, method='Z'):
-
-        if self._affinity is None:
-            self._buildAffinity()
-
-        start = time.time()
-        linalg = importLA()
-        if method == 'Z':
-
-            D = self._diagonal
-            A = self._affinity
-
-            st = D / sum(D)
-
-            P = np.dot(np.diag(D**(-1)), A)
-
-            W = np.ones((len(st),1)) * st.T
+        if sparse.issparse(K):
+            self._diagonal = np.asarray(K.diagonal(), dtype=float)
+            self._affinity = (sparse.diags(self._diagonal) - K).tocsr()
+            self._affinity.eliminate_zeros()
+        else:
+            self._diagonal = np.diag(K).astype(float)
+            self._affinity = -np.asarray(K, dtype=float)
+            np.fill_diagonal(self._affinity, 0.)
 
-            Z = linalg.pinv(np.eye(P.shape[0], P.shape[1]) - P + W)
+    def _groundedSolver(self):
+        """Returns the index of the grounded node and a function that solves
+        linear systems of the Kirchhoff matrix with that node's row and
+        column removed.  The grounded matrix is factorized once, using
+        a Cholesky factorization for dense and an LU factorization for sparse
+        Kirchhoff matrices."""
 
-            H = np.ones((len(st),1)) * np.diag(Z).T - Z
-            H = H / W
-            H = H.T
+        from scipy import sparse
 
-        elif method == 'K':
+        K = self._kirchhoff
+        n_nodes = K.shape[0]
+        ground = int(np.argmax(self._diagonal))
+        keep = np.arange(n_nodes) != ground
 
-            K = self._kirchhoff
-            D = self._diagonal
+        try:
+            if sparse.issparse(K):
+                from scipy.sparse.linalg import splu
+                K_g = sparse.csr_matrix(K, dtype=float)[keep][:, keep]
+                solve = splu(K_g.tocsc()).solve
+            else:
+                from scipy.linalg import cho_factor, cho_solve
+                factor = cho_factor(K[keep][:, keep], lower=True,
+                                    overwrite_a=True)
+                solve = lambda b: cho_solve(factor, b)
+        except (RuntimeError, np.linalg.LinAlgError):
+            raise ValueError('grounded Kirchhoff matrix is singular, '
+                             'network must be connected to calculate '
+                             'hitting times')
+
+        return ground, keep, solve
+
+    def _calcGreen(self, indices, method):
+        """Returns columns of a generalized inverse of the Kirchhoff matrix
+        for nodes at *indices*, and the product of that inverse with node
+        degrees.  Hitting and commute times do not depend on which
+        generalized inverse of the form ``pinv(K) + u 1^T + 1 v^T`` is used,
+        so the inverse of the grounded Kirchhoff matrix serves as well as the
+        pseudo-inverse."""
+
+        D = self._diagonal
+        n_nodes = len(D)
+
+        if method == 'modes':
+            if self._array is None:
+                raise ValueError('modes are not calculated')
+            nonzero = self._eigvals > ZERO
+            V = self._array[:, nonzero]
+            values = self._eigvals[nonzero]
+            if len(values) < n_nodes - 1:
+                LOGGER.warn('Hitting and commute times are approximated '
+                            'using {0} of {1} non-zero modes.'
+                            .format(len(values), n_nodes - 1))
+            green = np.dot(V, (V[indices] / values).T)
+            degree = np.dot(V, np.dot(V.T, D) / values)
+            return green, degree
+
+        ground, keep, solve = self._groundedSolver()
+
+        rhs = np.zeros((n_nodes, len(indices)))
+        rhs[indices, np.arange(len(indices))] = 1.
+        green = np.zeros((n_nodes, len(indices)))
+        green[keep] = solve(rhs[keep])
+        degree = np.zeros(n_nodes)
+        degree[keep] = solve(D[keep])
+        return green, degree
+
+    def calcHitTime(self, method='Z', indices=None):
+        """Calculate hitting and commute times of random walks on the
+        network.  Element ``[i, j]`` of the hitting time matrix is the
+        expected number of steps a walk starting at node *j* takes to reach
+        node *i*, and commute times are ``H + H.T``.
+
+        Dense pseudo-inverses are not calculated.  Instead, the Kirchhoff
+        matrix with one node grounded is factorized and solved for the
+        columns that are needed, so sparse Kirchhoff matrices (e.g. for
+        chromatin) are supported without building dense matrices.
+
+        :arg method: ``'Z'`` or ``'K'`` to use the grounded Kirchhoff
+            factorization (both names are kept for the fundamental matrix and
+            Kirchhoff pseudo-inverse formulations that they replace, and give
+            identical results), or ``'modes'`` to use calculated modes, which
+            is exact only when all non-zero modes are calculated
+        :type method: str
+
+        :arg indices: indices of nodes to calculate hitting times to, and
+            commute times between.  When given, rows of hitting times for
+            these nodes and commute times between all pairs of them are
+            returned and not stored.  Otherwise, complete matrices are
+            calculated and stored.
+        :type indices: list
+        """
 
-            K_inv = linalg.pinv(K)
-            sum_D = sum(D)
+        if self._kirchhoff is None:
+            raise ValueError('Kirchhoff matrix is not built or set')
+        if method not in ('Z', 'K', 'modes'):
+            raise ValueError("method must be 'Z', 'K', or 'modes'")
 
-            T1 = (sum_D * np.ones((len(D),1)) * np.diag(K_inv)).T
+        if self._affinity is None:
+            self._buildAffinity()
 
-            T2 = sum_D * K_inv
-            T3_i = np.dot((np.ones((len(D),1)) * D), K_inv)
+        start = time.time()
+        D = self._diagonal
+        vol = D.sum()
 
-            H = T1 - T2 + T3_i - T3_i.T
+        if indices is None:
+            select = np.arange(len(D))
+        else:
+            select = np.arange(len(D))[indices]
+            if select.ndim == 0:
+                select = select.reshape(1)
 
-        self._hitTime = H
-        self._commuteTime = H + H.T
+        green, degree = self._calcGreen(select, method)
+        diagonal = green[select, np.arange(len(select))]
 
+        H = vol * (diagonal[:, np.newaxis] - green.T)
+        H += degree
+        H -= degree[select, np.newaxis]
 
         LOGGER.debug('Hitting and commute time are calculated in  {0:.2f}s.'
-                     .format(time.time()-start))    
+                     .format(time.time()-start))
+
+        if indices is None:
+            self._hitTime = H
+            self._commuteTime = H + H.T
+        else:
+            C = vol * (diagonal[:, np.newaxis] + diagonal -
+                       2 * green[select])
+            return H, C
 
     def getAffinity(self):
         """Returns a copy of the Kirchhoff matrix."""
@@ -347,7 +435,7 @@ class GNM(GNMBase):
     def _getHitTime(self):
         """Returns the hit time matrix."""
 
-        return self._getHitTime
+        return self._hitTime
 
     def getCommuteTime(self):
         """Returns a copy of the Kirchhoff matrix."""
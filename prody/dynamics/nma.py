@@ -13,6 +13,101 @@ if PY2K:
 
 __all__ = ['NMA']
 
+def _calcCovariance(array, variances, trace=False, norm=False, out=None,
+                    dtype=None, n_cpu=1, block_size=None):
+    """Returns the covariance matrix of modes in *array* with *variances*,
+    which is calculated in blocks of rows.
+
+    :arg array: eigenvectors in columns
+    :type array: :class:`~numpy.ndarray`
+
+    :arg variances: variances of modes
+    :type variances: :class:`~numpy.ndarray`
+
+    :arg trace: if **True**, the trace of each 3x3 submatrix of the covariance
+        matrix, i.e. the cross-correlation of atoms, is returned
+    :type trace: bool
+
+    :arg norm: if **True**, rows and columns are normalized by the square
+        roots of diagonal elements
+    :type norm: bool
+
+    :arg out: an array or a :class:`~numpy.memmap` that the result is written
+        into, block by block
+    :type out: :class:`~numpy.ndarray`
+
+    :arg dtype: data type of the result, e.g. ``np.float32`` for reduced
+        precision and memory, default is the type of *out* or float
+    :type dtype: :class:`~numpy.dtype`
+
+    :arg n_cpu: number of threads for calculating blocks, when 1 blocks are
+        calculated in order using threads of the underlying BLAS library
+    :type n_cpu: int
+
+    :arg block_size: number of rows in a block
+    :type block_size: int
+    """
+
+    if dtype is None:
+        dtype = float if out is None else out.dtype
+    array = np.asarray(array, dtype=dtype)
+    if array.ndim == 1:
+        array = array.reshape((-1, 1))
+    arvar = array * np.asarray(variances, dtype=dtype)
+
+    if trace:
+        if array.shape[0] % 3:
+            raise ValueError('array must have 3 rows per atom')
+        # coordinates of atoms are separated, so that the trace of each
+        # 3x3 submatrix is the sum of 3 matrix products
+        array = array.reshape((-1, 3, array.shape[1])).transpose(1, 0, 2)
+        arvar = arvar.reshape((-1, 3, arvar.shape[1])).transpose(1, 0, 2)
+    else:
+        array = array[np.newaxis]
+        arvar = arvar[np.newaxis]
+
+    n = array.shape[1]
+    if out is None:
+        out = np.empty((n, n), dtype=dtype)
+    elif out.shape != (n, n):
+        raise ValueError('out must be an array with shape ({0}, {0})'
+                         .format(n))
+
+    if norm:
+        diag = np.sqrt((array * arvar).sum(axis=(0, 2)))
+        diag[diag == 0] = 1.
+
+    n_cpu = max(int(n_cpu), 1)
+    if block_size is None:
+        # blocks are limited to 2**22 elements (32 MB in double precision)
+        block_size = -(-n // n_cpu)
+        block_size = max(min(block_size, 2**22 // n), 1)
+    blocks = [(i, min(i + block_size, n)) for i in range(0, n, block_size)]
+
+    def calcBlock(block):
+        start, stop = block
+        tile = np.dot(array[0, start:stop], arvar[0].T)
+        for i in range(1, array.shape[0]):
+            tile += np.dot(array[i, start:stop], arvar[i].T)
+        if norm:
+            tile /= diag[start:stop, np.newaxis]
+            tile /= diag
+        out[start:stop] = tile
+
+    if n_cpu == 1 or len(blocks) == 1:
+        for block in blocks:
+            calcBlock(block)
+    else:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(n_cpu, len(blocks)))
+        try:
+            pool.map(calcBlock, blocks)
+        finally:
+            pool.close()
+            pool.join()
+
+    return out
+
 class NMA(object):
 
     """A class for handling Normal Mode Analysis (NMA) data."""
@@ -202,7 +297,7 @@ class NMA(object):
         if self._cov is None:
             if array is None:
                 return None
-            self._cov = np.dot(array, np.dot(np.diag(self._vars), array.T))
+            self._cov = _calcCovariance(array, self._vars)
         return self._cov
 
     def calcModes(self):
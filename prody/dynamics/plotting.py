@@ -234,7 +234,10 @@ def showProjection(ensemble, modes, *args, **kwargs):
     if SETTINGS['auto_show']:
         fig = plt.figure()
  
-    projection = calcProjection(ensemble, modes, kwargs.pop('rmsd', True), kwargs.pop('norm', False))
+    projection = calcProjection(ensemble, modes, kwargs.pop('rmsd', True),
+                                kwargs.pop('norm', False),
+                                chunk_size=kwargs.pop('chunk_size', 1000),
+                                superpose=kwargs.pop('superpose', False))
 
     if projection.ndim == 1 or projection.shape[1] == 1:
         show = plt.hist(projection.flatten(), *args, **kwargs)
@@ -9,7 +9,6 @@ from prody.atomic import Atomic, AtomGroup
 from prody.proteins import parsePDB
 from prody.utilities import importLA, checkCoords, sqrtm
 from numpy import sqrt, zeros, linalg, min, max, unique, mean, eye, outer, dot
-from scipy import sparse
 from subprocess import call
 
 from .anm import ANMBase, calcANM, ANM
@@ -12,10 +12,10 @@ from .nma import NMA
 from .mode import Mode, VectorBase
 from .modeset import ModeSet
 
-__all__ = ['deformAtoms', 'sampleModes', 'traverseMode']
+__all__ = ['deformAtoms', 'sampleModes', 'iterSampleModes', 'traverseMode']
 
 
-def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
+def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0, **kwargs):
     """Returns an ensemble of randomly sampled conformations along given
     *modes*.  If *atoms* are provided, sampling will be around its active
     coordinate set.  Otherwise, sampling is around the 0 coordinate set.
@@ -47,7 +47,8 @@ def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
 
     :math:`R_0` is the active coordinate set of *atoms*.
     :math:`[r_1^k r_2^k ... r_m^k]` are normally distributed random numbers
-    generated for conformation :math:`k` using :func:`numpy.random.randn`.
+    generated for conformation :math:`k` using
+    :meth:`numpy.random.RandomState.standard_normal`.
 
     RMSD of the new conformation from :math:`R_0` can be calculated as
 
@@ -78,8 +79,67 @@ def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
     Note that if modes are from a :class:`.PCA`, variances are used instead of
     inverse eigenvalues, i.e. :math:`\\sigma_i \\sim \\lambda^{-1}_i`.
 
+    Conformations are generated in blocks of *chunk_size* using
+    :func:`iterSampleModes`, so that they can be written to a file without
+    holding all of them in memory:
+
+    :arg seed: seed of the random number generator, when **None** a seed is
+        drawn using :func:`numpy.random.randint`
+    :type seed: int
+
+    :arg chunk_size: number of conformations generated at once, default is
+        10000
+    :type chunk_size: int
+
+    :arg dcd: name of a DCD file that conformations are written to, in which
+        case the filename is returned instead of an ensemble
+    :type dcd: str
+
+    :arg memmap: name of a file that coordinate sets of the returned ensemble
+        are memory-mapped to, see :meth:`.Ensemble.setMemmap`
+    :type memmap: str
+
     See also :func:`.showEllipsoid`."""
 
+    dcd = kwargs.pop('dcd', None)
+    memmap = kwargs.pop('memmap', None)
+
+    if atoms is not None:
+        if not isinstance(atoms, (Atomic)):
+            raise TypeError('{0} is not correct type for atoms'
+                            .format(type(atoms)))
+        initial = atoms.getCoords()
+    else:
+        initial = None
+
+    blocks = iterSampleModes(modes, initial, n_confs, rmsd, **kwargs)
+    return _storeConformations(blocks, 'Conformations along {0}'.format(modes),
+                               modes.numAtoms(), int(n_confs), initial,
+                               dcd=dcd, memmap=memmap)
+
+
+def iterSampleModes(modes, coords=None, n_confs=1000, rmsd=1.0, **kwargs):
+    """Yields randomly sampled conformations along given *modes* in blocks,
+    i.e. arrays with shape ``(n, n_atoms, 3)`` holding at most *chunk_size*
+    conformations.  Conformations are deviations from the origin, when
+    *coords* is **None**, and from *coords* otherwise.  Sampling is described
+    in :func:`sampleModes`, and each block is generated by multiplying random
+    coefficients with scaled modes at once.
+
+    :arg seed: seed of the random number generator, when **None** a seed is
+        drawn using :func:`numpy.random.randint`
+    :type seed: int
+
+    :arg chunk_size: number of conformations generated at once, default is
+        10000
+    :type chunk_size: int
+
+    Arguments are checked when this function is called, and conformations are
+    generated as the returned generator is iterated."""
+
+    seed = kwargs.pop('seed', None)
+    chunk_size = max(int(kwargs.pop('chunk_size', 10000)), 1)
+
     if not isinstance(modes, (Mode, NMA, ModeSet)):
         raise TypeError('modes must be a NMA or ModeSet instance, '
                         'not {0}'.format(type(modes)))
@@ -87,18 +147,13 @@ def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
         raise ValueError('modes must be from a 3-dimensional model')
     n_confs = int(n_confs)
     n_atoms = modes.numAtoms()
-    initial = None
-    if atoms is not None:
-        if not isinstance(atoms, (Atomic)):
-            raise TypeError('{0} is not correct type for atoms'
-                            .format(type(atoms)))
-        if atoms.numAtoms() != n_atoms:
+    if coords is not None:
+        coords = np.asarray(coords)
+        if coords.shape != (n_atoms, 3):
             raise ValueError('number of atoms do not match')
-        initial = atoms.getCoords()
 
     rmsd = float(rmsd)
     LOGGER.info('Parameter: rmsd = {0:.2f} A'.format(rmsd))
-    n_confs = int(n_confs)
     LOGGER.info('Parameter: n_confs = {0}'.format(n_confs))
 
     if isinstance(modes, Mode):
@@ -112,35 +167,92 @@ def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
 
     if np.any(variances == 0):
         raise ValueError('one or more modes has zero variance')
-    randn = np.random.standard_normal((n_confs, n_modes))
-    coef = ((randn ** 2 * variances).sum(1) ** 0.5).mean()
+
+    if seed is None:
+        seed = np.random.randint(0, 2**31 - 1)
+
+    return _iterSampleModes(modes, coords, n_confs, rmsd, n_modes, variances,
+                            magnitudes, seed, chunk_size)
+
+
+def _iterSampleModes(modes, coords, n_confs, rmsd, n_modes, variances,
+                     magnitudes, seed, chunk_size):
+    """Yields conformations for :func:`iterSampleModes`."""
+
+    n_atoms = modes.numAtoms()
+
+    # random numbers are generated twice, first to find the scaling factor,
+    # and then to generate conformations, unless they fit in one block
+    random = np.random.RandomState(seed)
+    if n_confs <= chunk_size:
+        randn = random.standard_normal((n_confs, n_modes))
+        coef = ((randn ** 2 * variances).sum(1) ** 0.5).mean()
+    else:
+        randn = None
+        coef = 0.
+        for start in range(0, n_confs, chunk_size):
+            block = random.standard_normal((min(chunk_size, n_confs - start),
+                                            n_modes))
+            coef += ((block ** 2 * variances).sum(1) ** 0.5).sum()
+        coef /= n_confs
+        random = np.random.RandomState(seed)
     scale = n_atoms**0.5 * rmsd / coef
 
     LOGGER.info('Modes are scaled by {0}.'.format(scale))
 
-    confs = []
-    append = confs.append
     scale = scale / magnitudes * variances ** 0.5
+    array = modes._getArray().reshape((n_atoms * 3, n_modes)) * scale
 
-    array = modes._getArray()
-    if array.ndim > 1:
-        for i in range(n_confs):
-            append((array * scale * randn[i]).sum(1).reshape((n_atoms, 3)))
-    else:
-        for i in range(n_confs):
-            append((array * scale * randn[i]).reshape((n_atoms, 3)))
+    for start in range(0, n_confs, chunk_size):
+        if randn is None:
+            block = random.standard_normal((min(chunk_size, n_confs - start),
+                                            n_modes))
+        else:
+            block = randn
+        confs = np.dot(block, array.T).reshape((len(block), n_atoms, 3))
+        if coords is not None:
+            confs += coords
+        yield confs
+
+
+def _storeConformations(blocks, title, n_atoms, n_confs, initial, atoms=None,
+                        dcd=None, memmap=None):
+    """Returns an :class:`.Ensemble` of *n_confs* conformations yielded in
+    *blocks*, or writes them to *dcd* file and returns its name."""
 
-    ensemble = Ensemble('Conformations along {0}'.format(modes))
     if initial is None:
-        ensemble.setCoords(np.zeros((n_atoms, 3)))
-        ensemble.addCoordset(np.array(confs))
+        initial = np.zeros((n_atoms, 3))
+
+    if dcd is not None:
+        from prody.trajectory import DCDFile
+
+        out = DCDFile(dcd, 'w')
+        try:
+            for block in blocks:
+                out.write(block)
+        finally:
+            out.close()
+        return dcd
+
+    ensemble = Ensemble(title)
+    if atoms is not None:
+        ensemble.setAtoms(atoms)
+    ensemble.setCoords(initial)
+    if memmap is not None:
+        ensemble.setMemmap(memmap)
+        for block in blocks:
+            ensemble.addCoordset(block)
     else:
-        ensemble.setCoords(initial)
-        ensemble.addCoordset(np.array(confs) + initial)
+        confs = np.empty((n_confs, n_atoms, 3))
+        start = 0
+        for block in blocks:
+            confs[start:start + len(block)] = block
+            start += len(block)
+        ensemble.addCoordset(confs)
     return ensemble
 
 
-def traverseMode(mode, atoms, n_steps=10, rmsd=1.5):
+def traverseMode(mode, atoms, n_steps=10, rmsd=1.5, **kwargs):
     """Generates a trajectory along a given *mode*, which can be used to
     animate fluctuations in an external program.
 
@@ -170,7 +282,10 @@ def traverseMode(mode, atoms, n_steps=10, rmsd=1.5):
     :math:`R_0` is the active coordinate set of *atoms*.
     :math:`R_k = R_0 + sk\\lambda_iu_i`, where :math:`s` is found using
     :math:`s = ((N (\\frac{RMSD}{n})^2) / \\lambda_i^{-1}) ^{0.5}`, where
-    :math:`N` is the number of atoms."""
+    :math:`N` is the number of atoms.
+
+    Like :func:`sampleModes`, conformations can be written to a *dcd* file or
+    memory-mapped to a *memmap* file."""
 
     if not isinstance(mode, VectorBase):
         raise TypeError('mode must be a Mode or Vector instance, '
@@ -201,18 +316,15 @@ def traverseMode(mode, atoms, n_steps=10, rmsd=1.5):
     LOGGER.info('Mode is scaled by {0}.'.format(scale))
 
     array = arr * var**0.5 * scale / abs(mode)
-    confs_add = [initial + array]
-    for s in range(1, n_steps):
-        confs_add.append(confs_add[-1] + array)
-    confs_sub = [initial - array]
-    for s in range(1, n_steps):
-        confs_sub.append(confs_sub[-1] - array)
-    confs_sub.reverse()
-    ensemble = Ensemble('Conformations along {0}'.format(name))
-    ensemble.setAtoms(atoms)
-    ensemble.setCoords(initial)
-    ensemble.addCoordset(np.array(confs_sub + [initial] + confs_add))
-    return ensemble
+
+    # conformations are R_0 + k * array for k = -n_steps, ..., n_steps
+    steps = np.arange(-n_steps, n_steps + 1, dtype=float)
+    confs = steps[:, np.newaxis, np.newaxis] * array
+    if initial is not None:
+        confs += initial
+    return _storeConformations([confs], 'Conformations along {0}'.format(name),
+                               n_atoms, len(confs), initial, atoms=atoms,
+                               **kwargs)
 
 
 def deformAtoms(atoms, mode, rmsd=None, replace=False, scale=None):
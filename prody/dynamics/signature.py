@@ -15,12 +15,11 @@ from .nma import NMA
 from .modeset import ModeSet
 from .mode import Mode, Vector
 from .functions import calcENM
-from .compare import calcSpectralOverlap, matchModes, calcOverlap
+from .compare import _matchModeArrays
 
-from .analysis import calcSqFlucts, calcCrossCorr, calcFractVariance, calcCollectivity
 from .plotting import showAtomicLines, showAtomicMatrix
 from .anm import ANM
-from .gnm import GNM
+from .gnm import GNM, ZERO
 
 __all__ = ['ModeEnsemble', 'sdarray', 'calcEnsembleENMs', 'showSignature1D', 'showSignatureAtomicLines', 
            'showSignatureMode', 'showSignatureDistribution', 'showSignatureCollectivity',
@@ -30,13 +29,23 @@ __all__ = ['ModeEnsemble', 'sdarray', 'calcEnsembleENMs', 'showSignature1D', 'sh
            'showSignatureVariances', 'calcSignatureOverlaps', 'showSignatureOverlaps',
            'saveModeEnsemble', 'loadModeEnsemble']
 
+def _iterChunks(n_items, item_size, max_size=2**25):
+    """Yields slices of *n_items* items in chunks, so that arrays with
+    *item_size* elements per item have at most *max_size* elements for a
+    chunk."""
+
+    step = max(1, max_size // max(item_size, 1))
+    for start in range(0, n_items, step):
+        yield slice(start, min(start + step, n_items))
+
 class ModeEnsemble(object):
     """
     A collection of ENMs calculated for conformations in an :class:`Ensemble`. 
     or :class:`PDBEnsemble`. 
     """
 
-    __slots__ = ['_modesets', '_title', '_labels', '_atoms', '_weights', '_matched']
+    __slots__ = ['_modesets', '_title', '_labels', '_atoms', '_weights', '_matched',
+                 '_eigvecs', '_eigvals', '_vars']
 
     def __init__(self, title=None):
         self._modesets = []
@@ -45,6 +54,7 @@ class ModeEnsemble(object):
         self._atoms = None
         self._weights = None
         self._matched = False
+        self._clearArrays()
 
     def __len__(self):
         """Returns the number of modesets."""
@@ -162,6 +172,39 @@ class ModeEnsemble(object):
         ensemble._matched = self._matched and other._matched
         return ensemble
 
+    def _clearArrays(self):
+        """Clears arrays built from modesets, which needs to be called
+        whenever modesets are changed."""
+
+        self._eigvecs = None
+        self._eigvals = None
+        self._vars = None
+
+    def _getArrays(self):
+        """Returns eigenvectors of modesets as an array with shape
+        ``(n_modesets, n_dof, n_modes)``, and their eigenvalues and variances
+        as arrays with shape ``(n_modesets, n_modes)``. The arrays are built
+        once and kept until modesets are changed."""
+
+        if self._eigvecs is None and self._modesets:
+            n_sets = self.numModeSets()
+            n_modes = self.numModes()
+            n_dof = self._modesets[0].numDOF()
+
+            eigvecs = np.empty((n_sets, n_dof, n_modes))
+            eigvals = np.empty((n_sets, n_modes))
+            variances = np.empty((n_sets, n_modes))
+            for i, modeset in enumerate(self._modesets):
+                eigvecs[i] = modeset._getArray().reshape(n_dof, n_modes)
+                eigvals[i] = modeset.getEigvals()
+                variances[i] = modeset.getVariances()
+
+            self._eigvecs = eigvecs
+            self._eigvals = eigvals
+            self._vars = variances
+
+        return self._eigvecs, self._eigvals, self._vars
+
     def is3d(self):
         """Returns **True** is model is 3-dimensional."""
         
@@ -230,22 +273,23 @@ class ModeEnsemble(object):
     
     def _getModeData(self, name, mode_index=0, weights=None, sign_correction=False):
         modesets = self._modesets
+        eigvecs, eigvals, variances = self._getArrays()
 
-        V = []
-        for i, modeset in enumerate(modesets):
-            mode = modeset[mode_index]
-            func = getattr(mode, name)
-            v = func()
+        if name == 'getEigvec':
+            V = eigvecs[:, :, mode_index].copy()
             if sign_correction:
-                if i == 0:
-                    v0 = v
-                else:
-                    c = np.dot(v, v0)
-                    if c < 0:
-                        v *= -1
-            V.append(v)
-        is3d = mode.is3d()
-        V = np.vstack(V)
+                V[np.dot(V, V[0]) < 0] *= -1
+        elif name == 'getEigval':
+            V = eigvals[:, [mode_index]]
+        elif name == 'getVariance':
+            V = variances[:, [mode_index]]
+        else:
+            V = []
+            for modeset in modesets:
+                func = getattr(modeset[mode_index], name)
+                V.append(func())
+            V = np.vstack(V)
+        is3d = self.is3d()
 
         mode_num = modesets[0][mode_index].getIndex()
         title = 'mode %d'%(mode_num+1)
@@ -254,21 +298,26 @@ class ModeEnsemble(object):
 
     def _getData(self, name, mode_indices=None, weights=None, sign_correction=False):
         modesets = self._modesets
-        V = []
-        for i, modeset in enumerate(modesets):
-            modes = modeset if mode_indices is None else modeset[mode_indices]
-            func = getattr(modes, name)
-            vecs = func()
+        eigvecs, eigvals, variances = self._getArrays()
+        index = slice(None) if mode_indices is None else mode_indices
+
+        if name == 'getEigvecs':
+            V = eigvecs[:, :, index].copy()
             if sign_correction:
-                if i == 0:
-                    vecs0 = vecs
-                else:
-                    c = np.sign(np.dot(vecs.T, vecs0))
-                    c = np.diag(np.diag(c))
-                    vecs = np.dot(vecs, c)
-            V.append(vecs)
-        is3d = modeset.is3d()
-        V = np.array(V)
+                c = (V * V[:1]).sum(1)
+                V *= np.where(c < 0, -1, 1)[:, np.newaxis, :]
+        elif name == 'getEigvals':
+            V = eigvals[:, index].copy()
+        elif name == 'getVariances':
+            V = variances[:, index].copy()
+        else:
+            V = []
+            for modeset in modesets:
+                modes = modeset if mode_indices is None else modeset[mode_indices]
+                func = getattr(modes, name)
+                V.append(func())
+            V = np.array(V)
+        is3d = self.is3d()
 
         title = '%d modes'%len(V)
         sig = sdarray(V, title=title, weights=weights, labels=self.getLabels(), is3d=is3d)
@@ -349,7 +398,7 @@ class ModeEnsemble(object):
 
         return self._labels
 
-    def match(self, turbo=False):
+    def match(self, turbo=False, n_iter=1):
         """Matches the modes across mode sets according the mode overlaps.
 
         :arg turbo: if **True** then the computation will be performed in parallel. 
@@ -357,13 +406,29 @@ class ModeEnsemble(object):
                 CPUs. Assigning a number to specify the number of threads to be 
                 used. Default is **False**
         :type turbo: bool, int
+
+        :arg n_iter: maximum number of matching rounds. After the first round, 
+                modes are matched to the mean of the modes matched in the 
+                previous round. See :func:`.matchModes`. Default is 1
+        :type n_iter: int
         """
 
         if self._modesets:
             #LOGGER.debug('Matching {0} modes across {1} modesets...'
             #                .format(self.numModes(), self.numModeSets()))
             start = time.time()
-            self._modesets = matchModes(*self._modesets, turbo=turbo)
+            eigvecs, _, _ = self._getArrays()
+            perms = _matchModeArrays(eigvecs, n_iter=n_iter, turbo=turbo)
+
+            n_modes = self.numModes()
+            for i, perm in enumerate(perms):
+                if (perm == np.arange(n_modes)).all():
+                    continue
+                modeset = self._modesets[i]
+                if isinstance(modeset, ModeSet):
+                    perm = modeset._indices[perm]
+                self._modesets[i] = ModeSet(modeset.getModel(), perm)
+            self._clearArrays()
             LOGGER.debug('{0} modes across {1} modesets were matched in {2:.2f}s.'
                             .format(self.numModes(), self.numModeSets(), time.time()-start))
         else:
@@ -386,6 +451,7 @@ class ModeEnsemble(object):
                 ret.append(ModeSet(modeset.getModel(), order))
 
             self._modesets = ret
+            self._clearArrays()
 
     def addModeSet(self, modeset, weights=None, label=None):
         """Adds a modeset or modesets to the mode ensemble."""
@@ -428,6 +494,7 @@ class ModeEnsemble(object):
                 self._modesets.append(modeset)
             else:
                 self._modesets = [modeset]
+        self._clearArrays()
 
         if weights is None:
             weights = np.ones((len(modesets), self.numAtoms(), 1))
@@ -455,6 +522,7 @@ class ModeEnsemble(object):
             self._modesets.pop(i)
             if self._labels:
                 self._labels.pop(i)
+        self._clearArrays()
 
         if self._weights is not None:
             torf = np.ones(n_modesets, dtype=bool)
@@ -814,7 +882,9 @@ def _getEnsembleENMs(ensemble, **kwargs):
 
 def calcEnsembleSpectralOverlaps(ensemble, distance=False, turbo=False, **kwargs):
     """Calculate the spectral overlaps between each pair of conformations in the 
-    *ensemble*.
+    *ensemble*. Squared overlaps between modes of all pairs of modesets are 
+    calculated with one matrix product per block of modeset pairs, and are 
+    reduced to spectral overlaps right away.
     
     :arg ensemble: an ensemble of structures or ENMs 
     :type ensemble: :class: `Ensemble`, :class: `ModeEnsemble`
@@ -823,28 +893,78 @@ def calcEnsembleSpectralOverlaps(ensemble, distance=False, turbo=False, **kwargs
                    distance via arccos.
     :type distance: bool
 
-    :arg turbo: if **True**, extra memory will be used to remember previous calculation 
-                results to accelerate the next calculation, so this option is particularly 
-                useful if spectral overlaps of the same ensemble are calculated repeatedly, 
-                e.g. using different number of modes. Note that for single calculation, 
-                *turbo* will compromise the speed.
-                Default is **False**
-    :type turbo: bool
+    :arg turbo: if **True** then blocks of modeset pairs will be processed in 
+                parallel. The number of threads is set to be the same as the 
+                number of CPUs. Assigning a number to specify the number of 
+                threads to be used. Default is **False**
+    :type turbo: bool, int
+
+    :arg block_size: number of modesets in a block, by default it is chosen 
+                     so that a block pair has at most about 4 million mode pairs
+    :type block_size: int
     """
 
+    block_size = kwargs.pop('block_size', None)
     enms = _getEnsembleENMs(ensemble, **kwargs)
-    
-    overlaps = np.ones((len(enms), len(enms)))
-    for i in range(enms.numModeSets()):
-        for j in range(i+1, enms.numModeSets()):
-            covlap = calcSpectralOverlap(enms[i, :], enms[j, :], turbo=turbo)
-            overlaps[i, j] = overlaps[j, i] = covlap
+
+    eigvecs, _, variances = enms._getArrays()
+    n_sets, n_dof, n_modes = eigvecs.shape
+    if block_size is None:
+        block_size = max(1, 2048 // n_modes)
+
+    # modes are arranged as rows, modeset by modeset
+    U = eigvecs.transpose(0, 2, 1).reshape(n_sets * n_modes, n_dof)
+    sqrtvars = np.sqrt(variances)
+    traces = variances.sum(1)
+
+    blocks = [(start, min(start + block_size, n_sets)) 
+              for start in range(0, n_sets, block_size)]
+    pairs = [(I, J) for i, I in enumerate(blocks) for J in blocks[i:]]
+
+    cross = np.empty((n_sets, n_sets))
+    def calcBlockPair(pair):
+        (i0, i1), (j0, j1) = pair
+        weights = np.dot(U[i0*n_modes:i1*n_modes], U[j0*n_modes:j1*n_modes].T) ** 2
+        weights *= sqrtvars[i0:i1].reshape(-1, 1) * sqrtvars[j0:j1].reshape(1, -1)
+        W = weights.reshape(i1 - i0, n_modes, j1 - j0, n_modes).sum(3).sum(1)
+        cross[i0:i1, j0:j1] = W
+        cross[j0:j1, i0:i1] = W.T
+
+    n_threads = _getNumThreads(turbo)
+    if n_threads == 1 or len(pairs) == 1:
+        for pair in pairs:
+            calcBlockPair(pair)
+    else:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(n_threads, len(pairs)))
+        try:
+            pool.map(calcBlockPair, pairs)
+        finally:
+            pool.close()
+            pool.join()
+
+    total = traces[:, np.newaxis] + traces[np.newaxis, :]
+    diff = total - 2 * cross
+    diff = np.where(diff < ZERO, 0, np.sqrt(np.abs(diff)))
+    overlaps = 1 - diff / np.sqrt(total)
+    overlaps[np.diag_indices(n_sets)] = 1.
 
     if distance:
         overlaps = np.arccos(overlaps)
 
     return overlaps
 
+def _getNumThreads(turbo):
+    """Returns the number of threads for *turbo*, which may be a boolean or
+    the number of threads."""
+
+    if turbo is True:
+        from multiprocessing import cpu_count
+        return cpu_count()
+    if not turbo:
+        return 1
+    return int(turbo)
+
 def calcSignatureSqFlucts(mode_ensemble, **kwargs):
     """
     Get the signature square fluctuations of *mode_ensemble*. 
@@ -860,12 +980,14 @@ def calcSignatureSqFlucts(mode_ensemble, **kwargs):
         LOGGER.warn('modes in mode_ensemble did not match cross modesets. '
                     'Consider running mode_ensemble.match() prior to using this function')
 
-    modesets = mode_ensemble
-    V = []
-    for modes in modesets:
-        sqfs = calcSqFlucts(modes)
-        V.append(sqfs)
-    V = np.vstack(V)
+    eigvecs, _, variances = mode_ensemble._getArrays()
+    n_sets, n_dof, n_modes = eigvecs.shape
+    n_atoms = mode_ensemble.numAtoms()
+
+    V = np.empty((n_sets, n_atoms))
+    for chunk in _iterChunks(n_sets, n_dof * n_modes):
+        sqfs = np.einsum('ijk,ik->ij', eigvecs[chunk] ** 2, variances[chunk])
+        V[chunk] = sqfs.reshape(-1, n_atoms, n_dof // n_atoms).sum(2)
 
     title_str = '%d modes'%mode_ensemble.numModes()
     weights = mode_ensemble.getWeights()
@@ -1024,25 +1146,28 @@ def calcSignatureCrossCorr(mode_ensemble, norm=True):
     if not mode_ensemble.isMatched():
         LOGGER.warn('modes in mode_ensemble did not match cross modesets. '
                     'Consider running mode_ensemble.match() prior to using this function')
-    matches = mode_ensemble
-    n_atoms = matches.numAtoms()
-    n_sets = len(matches)
-
-    C = np.zeros((n_sets, n_atoms, n_atoms))
-    for i in range(n_sets):
-        m = matches[i]
-        c = calcCrossCorr(m, norm=norm)
-        C[i, :, :] = c
+    eigvecs, _, variances = mode_ensemble._getArrays()
+    n_sets, n_dof, n_modes = eigvecs.shape
+    n_atoms = mode_ensemble.numAtoms()
+    n_dim = n_dof // n_atoms
+
+    # rows of each atom hold its x, y, and z components for all modes
+    C = np.empty((n_sets, n_atoms, n_atoms))
+    for chunk in _iterChunks(n_sets, n_dof * n_modes + n_atoms * n_atoms):
+        V = eigvecs[chunk].reshape(-1, n_atoms, n_dim * n_modes)
+        VD = V * np.tile(variances[chunk], n_dim)[:, np.newaxis, :]
+        C[chunk] = np.matmul(VD, V.transpose(0, 2, 1))
+    if norm:
+        d = np.sqrt(np.einsum('ijj->ij', C))
+        C /= d[:, :, np.newaxis] * d[:, np.newaxis, :]
 
     title_str = '%d modes'%mode_ensemble.numModes()
     weights = mode_ensemble.getWeights()
     if weights is not None:
-        W = np.zeros((mode_ensemble.numModeSets(), 
-                      mode_ensemble.numAtoms(), 
-                      mode_ensemble.numAtoms()))
-        for i, w in enumerate(weights):
-            w2 = np.outer(w, w)
-            W[i, :, :] = w2
+        W = weights[:, :, 0]
+        W = W[:, :, np.newaxis] * W[:, np.newaxis, :]
+    else:
+        W = None
     labels = mode_ensemble.getLabels()
 
     # even the original model is 3d, cross-correlations are still 1d
@@ -1060,14 +1185,21 @@ def calcSignatureCollectivity(mode_ensemble, masses=None):
         LOGGER.warn('modes in mode_ensemble did not match cross modesets. '
                     'Consider running mode_ensemble.match() prior to using this function')
     
-    n_modes = mode_ensemble.numModes()
-    n_sets = len(mode_ensemble)
-
-    C = np.zeros((n_sets, n_modes))
-    for i in range(n_sets):
-        m = mode_ensemble[i]
-        c = calcCollectivity(m, masses=masses)
-        C[i, :] = c
+    eigvecs, _, _ = mode_ensemble._getArrays()
+    n_sets, n_dof, n_modes = eigvecs.shape
+    n_atoms = mode_ensemble.numAtoms()
+    if masses is not None and len(masses) != n_atoms:
+        raise ValueError('length of masses must be equal to number of atoms')
+
+    C = np.empty((n_sets, n_modes))
+    for chunk in _iterChunks(n_sets, n_dof * n_modes):
+        u2in = (eigvecs[chunk] ** 2).reshape(-1, n_atoms, n_dof // n_atoms,
+                                             n_modes).sum(2)
+        if masses is not None:
+            u2in /= np.asarray(masses, dtype=float)[:, np.newaxis]
+        u2in *= 1 / u2in.sum(1)[:, np.newaxis, :] ** 0.5
+        C[chunk] = np.exp(-(u2in * np.log(u2in + np.finfo(float).eps)).sum(1))
+    C /= n_atoms
 
     title_str = 'collectivities of %d modes'%mode_ensemble.numModes()
     labels = mode_ensemble.getLabels()
@@ -1087,26 +1219,20 @@ def calcSignatureOverlaps(mode_ensemble, diag=True):
         LOGGER.warn('modes in mode_ensemble did not match cross modesets. '
                     'Consider running mode_ensemble.match() prior to using this function')
 
-    n_sets = mode_ensemble.numModeSets()
-    n_modes = mode_ensemble.numModes()
+    eigvecs, _, _ = mode_ensemble._getArrays()
+    n_sets, n_dof, n_modes = eigvecs.shape
+
+    # modes are normalized and arranged as (n_modes, n_sets, n_dof)
+    U = eigvecs.transpose(2, 0, 1) / np.sqrt((eigvecs ** 2).sum(1)).T[:, :, np.newaxis]
 
     if diag:
-        overlaps = np.zeros((n_modes, n_sets, n_sets))
-        for m in range(mode_ensemble.numModes()):
-            for i, modeset_i in enumerate(mode_ensemble):
-                mode_i = modeset_i[m]
-                for j, modeset_j in enumerate(mode_ensemble):
-                    mode_j = modeset_j[m]
-                    if j >= i:
-                        overlaps[m, i, j] = overlaps[m, j, i] = abs(calcOverlap(mode_i, mode_j))
-                    
+        overlaps = np.empty((n_modes, n_sets, n_sets))
+        for chunk in _iterChunks(n_modes, n_sets * (n_dof + n_sets)):
+            overlaps[chunk] = np.abs(np.matmul(U[chunk], U[chunk].transpose(0, 2, 1)))
     else:
-        overlaps = np.zeros((n_modes, n_modes, n_sets, n_sets))
-
-        for i, modeset_i in enumerate(mode_ensemble):
-            for j, modeset_j in enumerate(mode_ensemble):
-                if j >= i:                
-                    overlaps[:,:,i,j] = overlaps[:,:,j,i] = abs(calcOverlap(modeset_i, modeset_j))
+        U = U.transpose(1, 0, 2).reshape(n_sets * n_modes, n_dof)
+        overlaps = np.abs(np.dot(U, U.T)).reshape(n_sets, n_modes, n_sets, n_modes)
+        overlaps = overlaps.transpose(1, 3, 0, 2)
 
     return overlaps
 
@@ -1144,16 +1270,10 @@ def calcSignatureFractVariance(mode_ensemble):
         LOGGER.warn('modes in mode_ensemble did not match cross modesets. '
                     'Consider running mode_ensemble.match() prior to using this function')
 
-    matches = mode_ensemble
-    n_sets = len(matches)
-
-    W = []; is3d = None
-    for i in range(n_sets):
-        m = matches[i]
-        var = calcFractVariance(m)
-        W.append(var)
-        if is3d is None:
-            is3d = m.is3d()
+    _, _, variances = mode_ensemble._getArrays()
+    traces = np.array([modeset.getModel()._getTrace() for modeset in mode_ensemble])
+    W = variances / traces[:, np.newaxis]
+    is3d = mode_ensemble.is3d()
 
     title_str = '%d modes'%mode_ensemble.numModes()
     labels = mode_ensemble.getLabels()
@@ -1442,7 +1562,15 @@ def saveModeEnsemble(mode_ensemble, filename=None, atoms=False, **kwargs):
     filename, after ``" "`` (white spaces) in the title are replaced with 
     ``"_"`` (underscores).  Upon successful completion of saving, filename 
     is returned. This function makes use of :func:`~numpy.savez_compressed` 
-    function."""
+    function.
+
+    :arg tensor: if **True**, eigenvectors, eigenvalues, and variances of all
+        modesets are saved as arrays with shapes ``(n_modesets, n_dof,
+        n_modes)`` and ``(n_modesets, n_modes)`` instead of modeset objects,
+        and modesets are restored as :class:`.NMA` models when loaded,
+        default is **False**
+    :type tensor: bool
+    """
 
     if not isinstance(mode_ensemble, ModeEnsemble):
         raise TypeError('invalid type for mode_ensemble, {0}'
@@ -1450,9 +1578,21 @@ def saveModeEnsemble(mode_ensemble, filename=None, atoms=False, **kwargs):
     if len(mode_ensemble) == 0:
         raise ValueError('mode_ensemble instance does not contain data')
 
+    tensor = kwargs.pop('tensor', False)
+
     attr_list = ['_modesets', '_title', '_labels', '_weights', '_matched']
     attr_dict = {}
 
+    if tensor:
+        attr_list.remove('_modesets')
+        eigvecs, eigvals, variances = mode_ensemble._getArrays()
+        attr_dict['_eigvecs'] = eigvecs
+        attr_dict['_eigvals'] = eigvals
+        attr_dict['_vars'] = variances
+        attr_dict['_traces'] = np.array([modeset.getModel()._getTrace()
+                                         for modeset in mode_ensemble])
+        attr_dict['_is3d'] = mode_ensemble.is3d()
+
     if atoms:
         attr_list.append('_atoms')
     
@@ -1510,11 +1650,29 @@ def loadModeEnsemble(filename, **kwargs):
     if labels is not None:
         labels = labels.tolist()
 
+    eigvecs = getValue(data, '_eigvecs', None)
+    if eigvecs is not None:
+        eigvals = data['_eigvals']
+        variances = data['_vars']
+        traces = data['_traces']
+        is3d = bool(data['_is3d'])
+        for i in range(len(eigvecs)):
+            model = NMA(labels[i] if labels else title)
+            model._is3d = is3d
+            model.setEigens(eigvecs[i], eigvals[i])
+            model._vars = variances[i]
+            model._trace = traces[i]
+            modesets.append(model[:])
+
     modeens = ModeEnsemble(title=title)
     modeens._weights = weights
     modeens._labels = labels
     modeens._matched = matched
     modeens._modesets = modesets
     modeens._atoms = atoms
+    if eigvecs is not None:
+        modeens._eigvecs = eigvecs
+        modeens._eigvals = eigvals
+        modeens._vars = variances
 
     return modeens
@@ -3,14 +3,15 @@
 
 from numbers import Integral
 
-from numpy import dot, add, subtract, array, ndarray, sign, concatenate
+from numpy import dot, add, subtract, array, ndarray, sign
 from numpy import zeros, ones, arange, isscalar, max
-from numpy import newaxis, unique, repeat
+from numpy import newaxis, unique, repeat, memmap, errstate, where, asarray
 
 from prody import LOGGER
 from prody.atomic import Atomic, sliceAtoms
-from prody.measure import getRMSD
+from prody.measure import getRMSD, calcRMSDMatrix
 from prody.utilities import importLA, checkCoords, checkWeights, copy
+from prody.utilities import extendArray
 
 from .conformation import *
 
@@ -39,6 +40,7 @@ class Ensemble(object):
         self._indices = None  # indices of selected atoms
 
         self._confs = None       # coordinate sets
+        self._buffer = None      # storage that coordinate sets are a view of
 
         if isinstance(title, Ensemble):
             self._atoms = title.getAtoms()
@@ -67,6 +69,15 @@ class Ensemble(object):
 
         return self._n_csets
 
+    def __getstate__(self):
+
+        # coordinate sets are pickled without spare rows of their buffer
+        state = self.__dict__.copy()
+        state['_buffer'] = None
+        if self._confs is not None:
+            state['_confs'] = asarray(self._confs)
+        return state
+
     def __getitem__(self, index):
         """Returns a conformation at given index."""
 
@@ -388,12 +399,32 @@ class Ensemble(object):
             full_coords[:, self._indices, :] = coords
             coords = full_coords
 
-        if self._confs is None:
-            self._confs = coords
-        else:
-            self._confs = concatenate((self._confs, coords), axis=0)
+        self._confs, self._buffer = extendArray(self._confs, coords,
+                                                self._buffer)
         self._n_csets += n_confs
 
+    def setMemmap(self, filename=None):
+        """Store coordinate sets in a memory-mapped file at *filename*, which
+        is overwritten. Coordinate sets that are already in the ensemble are
+        copied to the file, and the file grows as new ones are added. If
+        *filename* is **None**, coordinate sets are loaded into memory."""
+
+        confs = self._confs
+        if filename is None:
+            self._buffer = None
+            if confs is not None:
+                self._confs = array(confs)
+            return
+
+        n_atoms = self._n_atoms if confs is None else confs.shape[1]
+        shape = (len(self) or 1, n_atoms or 1, 3)
+        dtype = float if confs is None else confs.dtype
+        buffer = memmap(filename, dtype=dtype, mode='w+', shape=shape)
+        if confs is None:
+            self._buffer = buffer
+        else:
+            self._confs, self._buffer = extendArray(None, confs, buffer)
+
     def getCoordsets(self, indices=None, selected=True):
         """Returns a copy of coordinate set(s) at given *indices*, which may be
         an integer, a list of integers or **None**. **None** returns all
@@ -593,16 +624,9 @@ class Ensemble(object):
         LOGGER.timeit('_prody_ensemble')
         rmsdif = 1
         step = 0
-        weights = self._weights
-        if weights is not None and weights.ndim == 3:
-            weightsum = weights.sum(axis=0)
-        length = len(self)
         while rmsdif > rmsd:
             self._superpose()
-            if weights is None:
-                newxyz = self._confs.sum(0) / length
-            else:
-                newxyz = (self._confs * weights).sum(0) / weightsum
+            newxyz = self._getStats(selected=False, binary=False)[0]
             rmsdif = getRMSD(self._coords, newxyz)
             self._coords = newxyz
             step += 1
@@ -611,6 +635,89 @@ class Ensemble(object):
         LOGGER.report('Iterative superposition completed in %.2fs.',
                       '_prody_ensemble')
 
+    def _getStats(self, selected=True, binary=True, moments=True,
+                  chunk_size=1000):
+        """Returns weighted mean coordinates, sums of weighted squared
+        deviations from them, and sums of weights for atoms in a single pass
+        over coordinate sets, which are read in chunks of *chunk_size*, so
+        that memory-mapped coordinate sets are not loaded at once. Chunk
+        statistics are merged using the pairwise update formulas of Chan et
+        al. If *binary* is **True**, any non-zero weight is considered equal
+        to one. If *moments* is **False**, only sums of weights are
+        calculated and **None** is returned for the others."""
+
+        confs = self._confs
+        indices = self._indices if selected else None
+        n_atoms = confs.shape[1] if indices is None else len(indices)
+        n_csets = self._n_csets
+
+        weights = self._weights
+        if weights is None or weights.ndim != 3:
+            # weights shared by all coordinate sets do not change statistics
+            # of atoms over coordinate sets
+            weights = None
+            if not moments:
+                return None, None, ones((n_atoms, 1)) * n_csets
+
+        mean = zeros((n_atoms, 3)) if moments else None
+        ssqd = zeros((n_atoms, 3)) if moments else None
+        wsum = zeros((n_atoms, 1))
+        for start in range(0, n_csets, chunk_size):
+            if weights is None:
+                w = None
+                wsum_c = float(min(chunk_size, n_csets - start))
+            else:
+                w = weights[start:start+chunk_size]
+                if indices is not None:
+                    w = w[:, indices]
+                if binary:
+                    w = w > 0
+                wsum_c = w.sum(0)
+            if moments:
+                block = confs[start:start+chunk_size]
+                if indices is not None:
+                    block = block[:, indices]
+                if w is None:
+                    mean_c = block.mean(0)
+                    ssqd_c = ((block - mean_c) ** 2).sum(0)
+                else:
+                    with errstate(invalid='ignore', divide='ignore'):
+                        mean_c = (block * w).sum(0) / wsum_c
+                    mean_c[wsum_c[:, 0] == 0] = 0
+                    ssqd_c = (((block - mean_c) ** 2) * w).sum(0)
+
+                total = wsum + wsum_c
+                with errstate(invalid='ignore', divide='ignore'):
+                    frac = where(total > 0, wsum_c / total, 0)
+                delta = mean_c - mean
+                mean += delta * frac
+                ssqd += ssqd_c + delta ** 2 * wsum * frac
+                wsum = total
+            else:
+                wsum = wsum + wsum_c
+        return mean, ssqd, wsum
+
+    def getStatistics(self, chunk_size=1000):
+        """Returns mean coordinates, mean square fluctuations (MSFs), root
+        mean square fluctuations (RMSFs), and occupancies for selected atoms,
+        which are calculated together in a single pass over conformations.
+        For a :class:`.PDBEnsemble`, only conformations in which an atom has
+        a non-zero weight are considered for that atom, and occupancy is the
+        fraction of such conformations.
+
+        :arg chunk_size: number of conformations read at a time, default is
+            1000
+        :type chunk_size: int
+        """
+
+        if self._confs is None:
+            return
+        mean, ssqd, wsum = self._getStats(chunk_size=chunk_size)
+        wsum = wsum.flatten()
+        with errstate(invalid='ignore', divide='ignore'):
+            msfs = ssqd.sum(1) / wsum
+        return mean, msfs, msfs ** 0.5, wsum / self._n_csets
+
     def getMSFs(self):
         """Returns mean square fluctuations (MSFs) for selected atoms.
         Conformations can be aligned using one of :meth:`superpose` or
@@ -618,18 +725,7 @@ class Ensemble(object):
 
         if self._confs is None:
             return
-        indices = self._indices
-        if indices is None:
-            mean = self._confs.mean(0)
-            ssqf = zeros(mean.shape)
-            for conf in self._confs:
-                ssqf += (conf - mean) ** 2
-        else:
-            mean = self._confs[:, indices].mean(0)
-            ssqf = zeros(mean.shape)
-            for conf in self._confs[:, indices]:
-                ssqf += (conf - mean) ** 2
-        return ssqf.sum(1) / self._n_csets
+        return self.getStatistics()[1]
 
     def getRMSFs(self):
         """Returns root mean square fluctuations (RMSFs) for selected atoms.
@@ -652,7 +748,7 @@ class Ensemble(object):
 
         return self._getCoordsets() - self._getCoords()
 
-    def getRMSDs(self, pairwise=False):
+    def getRMSDs(self, pairwise=False, **kwargs):
         """Returns root mean square deviations (RMSDs) for selected atoms.
         Conformations can be aligned using one of :meth:`superpose` or
         :meth:`iterpose` methods prior to RMSD calculation.
@@ -660,6 +756,10 @@ class Ensemble(object):
         :arg pairwise: if **True** then it will return pairwise RMSDs 
             as an n-by-n matrix. n is the number of conformations.
         :type pairwise: bool
+
+        Pairwise RMSDs are calculated using :func:`.calcRMSDMatrix`, and
+        keyword arguments *superpose*, *condensed*, *block_size*, and *n_cpu*
+        are passed to it. By default, conformations are not superposed.
         """
 
         if self._confs is None or self._coords is None:
@@ -672,11 +772,8 @@ class Ensemble(object):
         weights = self._weights[indices] if self._weights is not None else None
 
         if pairwise:
-            n_confs = self.numConfs()
-            RMSDs = zeros((n_confs, n_confs))
-            for i in range(n_confs):
-                for j in range(i+1, n_confs):
-                    RMSDs[i, j] = RMSDs[j, i] = getRMSD(self._confs[i, indices], self._confs[j, indices], weights)
+            kwargs.setdefault('superpose', False)
+            RMSDs = calcRMSDMatrix(self._confs[:, indices], weights, **kwargs)
         else:
             RMSDs = getRMSD(self._coords[indices], self._confs[:, indices], weights)
 
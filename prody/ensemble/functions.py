@@ -233,11 +233,10 @@ def calcOccupancies(pdb_ensemble, normed=False):
     if len(pdb_ensemble) == 0:
         raise ValueError('pdb_ensemble does not contain any conformations')
     assert isinstance(normed, bool), 'normed must be a boolean'
-    weights = pdb_ensemble.getWeights()
-    if weights is None:
+    if pdb_ensemble._weights is None:
         raise ValueError('pdb_ensemble weights are not set')
 
-    occupancies = weights.astype(bool).sum(0).astype(float).flatten()
+    occupancies = pdb_ensemble._getStats(moments=False)[2].flatten()
     if normed:
         return occupancies / len(pdb_ensemble)
     else:
@@ -5,8 +5,8 @@ import numpy as np
 
 from prody.sequence import MSA, Sequence
 from prody.atomic import Atomic, AtomGroup
-from prody.measure import getRMSD, getTransformation
-from prody.utilities import checkCoords, checkWeights, copy
+from prody.measure import getRMSD, getTransformation, calcRMSDMatrix
+from prody.utilities import checkCoords, checkWeights, copy, extendArray
 from prody import LOGGER
 
 from .ensemble import Ensemble
@@ -32,6 +32,7 @@ class PDBEnsemble(Ensemble):
         self._labels = []
         self._trans = None
         self._msa = None
+        self._weights_buffer = None
         Ensemble.__init__(self, title)
 
     def __repr__(self):
@@ -42,6 +43,14 @@ class PDBEnsemble(Ensemble):
 
         return 'PDB' + Ensemble.__str__(self)
 
+    def __getstate__(self):
+
+        state = Ensemble.__getstate__(self)
+        state['_weights_buffer'] = None
+        if self._weights is not None:
+            state['_weights'] = np.asarray(self._weights)
+        return state
+
     def __add__(self, other):
         """Concatenate two ensembles. The reference coordinates of *self* is
         used in the result."""
@@ -169,7 +178,7 @@ class PDBEnsemble(Ensemble):
 
         confs = self._confs.copy()
         Ensemble.iterpose(self, rmsd)
-        self._confs = confs
+        self._confs[:] = confs
         LOGGER.info('Final superposition to calculate transformations.')
         self.superpose()
 
@@ -332,14 +341,11 @@ class PDBEnsemble(Ensemble):
                 self._msa.extend(msa)
 
         # update coordinates
-        if self._confs is None and self._weights is None:
-            self._confs = coords
-            self._weights = weights
-            self._n_csets = n_repeats
-            
-        elif self._confs is not None and self._weights is not None:
-            self._confs = np.concatenate((self._confs, coords), axis=0)
-            self._weights = np.concatenate((self._weights, weights), axis=0)
+        if (self._confs is None) == (self._weights is None):
+            self._confs, self._buffer = extendArray(self._confs, coords,
+                                                    self._buffer)
+            self._weights, self._weights_buffer = extendArray(
+                self._weights, weights, self._weights_buffer)
             self._n_csets += n_repeats
         else:
             raise RuntimeError('_confs and _weights must be set or None at '
@@ -438,33 +444,7 @@ class PDBEnsemble(Ensemble):
         else:
             raise IndexError('conformation index out of range')
 
-    def getMSFs(self):
-        """Calculate and return mean square fluctuations (MSFs).
-        Note that you might need to align the conformations using
-        :meth:`superpose` or :meth:`iterpose` before calculating MSFs."""
-
-        if self._confs is None:
-            return
-        indices = self._indices
-        if indices is None:
-            coords = self._coords
-            confs = self._confs
-            weights = self._weights > 0
-        else:
-            coords = self._coords[indices]
-            confs = self._confs[:, indices]
-            weights = self._weights[:, indices] > 0
-        weightsum = weights.sum(0)
-        mean = np.zeros(coords.shape)
-        for i, conf in enumerate(confs):
-            mean += conf * weights[i]
-        mean /= weightsum
-        ssqf = np.zeros(mean.shape)
-        for i, conf in enumerate(confs):
-            ssqf += ((conf - mean) * weights[i]) ** 2
-        return ssqf.sum(1) / weightsum.flatten()
-
-    def getRMSDs(self, pairwise=False):
+    def getRMSDs(self, pairwise=False, **kwargs):
         """Calculate and return root mean square deviations (RMSDs). Note that
         you might need to align the conformations using :meth:`superpose` or
         :meth:`iterpose` before calculating RMSDs.
@@ -472,6 +452,10 @@ class PDBEnsemble(Ensemble):
         :arg pairwise: if **True** then it will return pairwise RMSDs 
             as an n-by-n matrix. n is the number of conformations.
         :type pairwise: bool
+
+        Pairwise RMSDs are calculated using :func:`.calcRMSDMatrix`, and
+        keyword arguments *superpose*, *condensed*, *block_size*, and *n_cpu*
+        are passed to it. By default, conformations are not superposed.
         """
 
         if self._confs is None or self._coords is None:
@@ -483,16 +467,8 @@ class PDBEnsemble(Ensemble):
 
         weights = self._weights[:, indices] if self._weights is not None else None
         if pairwise:
-            n_confs = self.numConfs()
-            RMSDs = np.zeros((n_confs, n_confs))
-            for i in range(n_confs):
-                for j in range(i+1, n_confs):
-                    if weights is None:
-                        w = None
-                    else:
-                        wi = weights[i]; wj = weights[j]
-                        w = wi * wj
-                    RMSDs[i, j] = RMSDs[j, i] = getRMSD(self._confs[i, indices], self._confs[j, indices], w)
+            kwargs.setdefault('superpose', False)
+            RMSDs = calcRMSDMatrix(self._confs[:, indices], weights, **kwargs)
         else:
             RMSDs = getRMSD(self._coords[indices], self._confs[:, indices], weights)
 
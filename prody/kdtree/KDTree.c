@@ -22,6 +22,7 @@ struct KDTree
     struct Region *_query_region;
     long int _count;
     long int _neighbor_count;
+    long int _neighbor_list_size;
     float _radius;
     float _radius_sq;
     float _neighbor_radius;
@@ -293,6 +294,7 @@ struct KDTree* KDTree_init(int dim, int bucket_size)
     tree->_count=0;
     tree->_neighbor_count=0;
     tree->_neighbor_list = NULL;
+    tree->_neighbor_list_size = 0;
     tree->_bucket_size=bucket_size;
     tree->_data_point_list = NULL;
     tree->_data_point_list_size = 0;
@@ -474,6 +476,27 @@ long int KDTree_neighbor_get_count(struct KDTree* tree)
     return tree->_neighbor_count;
 }
 
+void KDTree_neighbor_copy_indices(struct KDTree* tree, long *indices)
+{
+    long int i;
+
+    for(i=0; i<tree->_neighbor_count; i++)
+    {
+        indices[2*i]=tree->_neighbor_list[i].index1;
+        indices[2*i+1]=tree->_neighbor_list[i].index2;
+    }
+}
+
+void KDTree_neighbor_copy_radii(struct KDTree* tree, float *radii)
+{
+    long int i;
+
+    for(i=0; i<tree->_neighbor_count; i++)
+    {
+        radii[i]=tree->_neighbor_list[i].radius;
+    }
+}
+
 static int KDTree_search(struct KDTree* tree, struct Region *region, struct Node *node, int depth);
 
 static int KDTree_test_region(struct KDTree* tree, struct Node *node, struct Region *region, int depth)
@@ -726,10 +749,17 @@ static int KDTree_test_neighbors(struct KDTree* tree, struct DataPoint* p1, stru
     {
         /* we found a neighbor pair! */
         struct Neighbor* p;
-        int n;
+        long int n;
         n = tree->_neighbor_count;
-        p = realloc(tree->_neighbor_list, (n+1)*sizeof(struct Neighbor));
-        if (p==NULL) return 0;
+        p = tree->_neighbor_list;
+        if (n == tree->_neighbor_list_size)
+        {
+            /* grow geometrically, so that adding a pair is amortized O(1) */
+            long int size = n ? 2*n : 1024;
+            p = realloc(p, size*sizeof(struct Neighbor));
+            if (p==NULL) return 0;
+            tree->_neighbor_list_size = size;
+        }
 
         p[n].index1 = p1->_index;
         p[n].index2 = p2->_index;
@@ -1049,10 +1079,8 @@ static int KDTree__neighbor_search(struct KDTree* tree, struct Node *node, struc
 }
 
 int
-KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
-                       struct Neighbor** neighbors)
+KDTree_neighbor_find(struct KDTree* tree, float neighbor_radius)
 {
-    long int i;
     int ok;
     Region_dim=tree->dim;
 
@@ -1062,6 +1090,7 @@ KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
         tree->_neighbor_list = NULL;
     }
     tree->_neighbor_count=0;
+    tree->_neighbor_list_size=0;
     /* note the use of r^2 to avoid use of sqrt */
     tree->_neighbor_radius=neighbor_radius;
     tree->_neighbor_radius_sq=neighbor_radius*neighbor_radius;
@@ -1082,7 +1111,16 @@ KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
         ok = KDTree__neighbor_search(tree, tree->_root, region, 0);
         Region_destroy(region);
     }
-    if (!ok) return 0;
+    return ok;
+}
+
+int
+KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
+                       struct Neighbor** neighbors)
+{
+    long int i;
+
+    if (!KDTree_neighbor_find(tree, neighbor_radius)) return 0;
 
     *neighbors = NULL;
     for (i = 0; i < tree->_neighbor_count; i++)
@@ -1119,6 +1157,7 @@ KDTree_neighbor_simple_search(struct KDTree* tree, float radius,
     tree->_neighbor_radius_sq=radius*radius;
 
     tree->_neighbor_count=0;
+    tree->_neighbor_list_size=0;
     if (tree->_neighbor_list)
     {
         free(tree->_neighbor_list);
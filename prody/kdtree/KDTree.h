@@ -10,5 +10,8 @@ long int KDTree_neighbor_get_count(struct KDTree* tree);
 int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius);
 void KDTree_copy_indices(struct KDTree* tree, long *indices);
 void KDTree_copy_radii(struct KDTree* tree, float *radii);
+int KDTree_neighbor_find(struct KDTree* tree, float neighbor_radius);
+void KDTree_neighbor_copy_indices(struct KDTree* tree, long *indices);
+void KDTree_neighbor_copy_radii(struct KDTree* tree, float *radii);
 int KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius, struct Neighbor** neighbors);
 int KDTree_neighbor_simple_search(struct KDTree* tree, float radius, struct Neighbor** neighbors);
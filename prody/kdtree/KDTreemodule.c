@@ -514,6 +514,106 @@ PyTree_neighbor_simple_search(PyTree* self, PyObject* args)
     return list;
 }
 
+static PyObject*
+PyTree_neighbor_find(PyTree* self, PyObject* args)
+{
+    double radius;
+
+    if(!PyArg_ParseTuple(args, "d:KDTree_neighbor_find", &radius))
+        return NULL;
+
+    if(radius <= 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "Radius must be positive.");
+        return NULL;
+    }
+
+    if (!KDTree_neighbor_find(self->tree, radius))
+    {
+        PyErr_SetString(PyExc_MemoryError,
+            "calculation failed due to lack of memory");
+        return NULL;
+    }
+    return PyTree_neighbor_get_count(self);
+}
+
+static int
+PyTree_check_buffer(PyObject* object, Py_buffer* view, char expected,
+                    Py_ssize_t length)
+{
+    const int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | PyBUF_WRITABLE;
+    char datatype;
+
+    if (PyObject_GetBuffer(object, view, flags) == -1)
+        return 0;
+    datatype = view->format[0];
+    switch (datatype) {
+        case '@':
+        case '=':
+        case '<':
+        case '>':
+        case '!': datatype = view->format[1]; break;
+        default: break;
+    }
+    if (datatype != expected) {
+        PyErr_Format(PyExc_RuntimeError,
+            "array has incorrect data format ('%c', expected '%c')",
+            datatype, expected);
+        PyBuffer_Release(view);
+        return 0;
+    }
+    if (view->len / view->itemsize != length) {
+        PyErr_Format(PyExc_ValueError,
+            "array has incorrect size (%zd, expected %zd)",
+            view->len / view->itemsize, length);
+        PyBuffer_Release(view);
+        return 0;
+    }
+    return 1;
+}
+
+static char PyTree_neighbor_get_indices__doc__[] =
+"copies index pairs found by neighbor_find into a Numpy array\n"
+"with 2 * neighbor_get_count() items\n";
+
+static PyObject *PyTree_neighbor_get_indices(PyTree *self, PyObject* args)
+{
+    struct KDTree* tree = self->tree;
+    Py_buffer view;
+    PyObject* object;
+
+    if (!PyArg_ParseTuple(args, "O:KDTree_neighbor_get_indices", &object))
+        return NULL;
+    if (!PyTree_check_buffer(object, &view, 'l',
+                             2 * KDTree_neighbor_get_count(tree)))
+        return NULL;
+    KDTree_neighbor_copy_indices(tree, (long int *) view.buf);
+    PyBuffer_Release(&view);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static char PyTree_neighbor_get_radii__doc__[] =
+"copies distances of pairs found by neighbor_find into a Numpy array\n"
+"with neighbor_get_count() items\n";
+
+static PyObject *PyTree_neighbor_get_radii(PyTree *self, PyObject* args)
+{
+    struct KDTree* tree = self->tree;
+    Py_buffer view;
+    PyObject* object;
+
+    if (!PyArg_ParseTuple(args, "O:KDTree_neighbor_get_radii", &object))
+        return NULL;
+    if (!PyTree_check_buffer(object, &view, 'f',
+                             KDTree_neighbor_get_count(tree)))
+        return NULL;
+    KDTree_neighbor_copy_radii(tree, (float *) view.buf);
+    PyBuffer_Release(&view);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
 static char PyTree_get_indices__doc__[] =
 "returns indices of coordinates within radius as a Numpy array\n";
 
@@ -607,6 +707,9 @@ static PyMethodDef PyTree_methods[] = {
     {"neighbor_get_count", (PyCFunction)PyTree_neighbor_get_count, METH_NOARGS, NULL},
     {"neighbor_search", (PyCFunction)PyTree_neighbor_search, METH_VARARGS, NULL},
     {"neighbor_simple_search", (PyCFunction)PyTree_neighbor_simple_search, METH_VARARGS, NULL},
+    {"neighbor_find", (PyCFunction)PyTree_neighbor_find, METH_VARARGS, NULL},
+    {"neighbor_get_indices", (PyCFunction)PyTree_neighbor_get_indices, METH_VARARGS, PyTree_neighbor_get_indices__doc__},
+    {"neighbor_get_radii", (PyCFunction)PyTree_neighbor_get_radii, METH_VARARGS, PyTree_neighbor_get_radii__doc__},
     {"get_indices", (PyCFunction)PyTree_get_indices, METH_VARARGS, PyTree_get_indices__doc__},
     {"get_radii", (PyCFunction)PyTree_get_radii, METH_VARARGS, PyTree_get_radii__doc__},
     {NULL}  /* Sentinel */
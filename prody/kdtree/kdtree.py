@@ -2,7 +2,7 @@
 """This module defines :class:`KDTree` class for dealing with atomic coordinate
 sets and handling periodic boundary conditions."""
 
-from numpy import array, ndarray, concatenate, empty
+from numpy import array, ndarray, concatenate, empty, lexsort
 
 from prody import LOGGER
 
@@ -212,7 +212,7 @@ class KDTree(object):
 
         else:
             if self._unitcell is None:
-                self._neighbors = self._kdtree.neighbor_search(radius)
+                self._neighbors = get_KDTree_neighbors(self._kdtree, radius)
             else:
                 kdtree = self._kdtree2
                 if kdtree is None:
@@ -223,21 +223,21 @@ class KDTree(object):
                     kdtree.set_data(coords)
                     self._kdtree2 = kdtree
                 n_atoms = len(self._coords)
-                _dict = {}
-                neighbors = kdtree.neighbor_search(radius)
-                if kdtree.neighbor_get_count():
-                    _get = _dict.get
-                    _set = _dict.__setitem__
-
-                    for nb in neighbors:
-                        i = nb.index1 % n_atoms
-                        j = nb.index2 % n_atoms
-                        if i < j:
-                            _set((i, j), min(nb.radius, _get((i, j), 1e6)))
-                        elif j < i:
-                            _set((j, i), min(nb.radius, _get((j, i), 1e6)))
-                self._pbcdict = _dict
-                self._pdbkeys = list(_dict)
+                pairs, radii = get_KDTree_neighbors(kdtree, radius)
+                # map image pairs onto original atoms, and keep the shortest
+                # distance for each pair of distinct atoms
+                pairs %= n_atoms
+                pairs.sort(1)
+                which = pairs[:, 0] != pairs[:, 1]
+                pairs, radii = pairs[which], radii[which]
+                order = lexsort((radii, pairs[:, 1], pairs[:, 0]))
+                pairs, radii = pairs[order], radii[order]
+                first = empty(len(pairs), bool)
+                first[:1] = True
+                first[1:] = (pairs[1:] != pairs[:-1]).any(1)
+                self._pbcdict = dict(zip(map(tuple, pairs[first]),
+                                         radii[first]))
+                self._pdbkeys = list(self._pbcdict)
 
 
     def getIndices(self):
@@ -249,8 +249,7 @@ class KDTree(object):
                 if self._neighbors is None:
                     return get_KDTree_indices(self._kdtree)
                 else:
-                    return array([(n.index1, n.index2)
-                                  for n in self._neighbors], int)
+                    return self._neighbors[0]
             else:
                 return array(self._pdbkeys)
         return self._none()
@@ -263,7 +262,7 @@ class KDTree(object):
                 if self._neighbors is None:
                     return get_KDTree_radii(self._kdtree)
                 else:
-                    return array([n.radius for n in self._neighbors])
+                    return self._neighbors[1]
             else:
                 _dict = self._pbcdict
                 return array([_dict[i] for i in self._pdbkeys])
@@ -276,7 +275,7 @@ class KDTree(object):
             if self._neighbors is None:
                 return self._kdtree.get_count()
             else:
-                return self._kdtree.neighbor_get_count()
+                return len(self._neighbors[1])
         else:
             return len(self._pbcdict)
 
@@ -301,3 +300,22 @@ def get_KDTree_radii(kdtree):
             radii = empty(n, 'f')
             kdtree.get_radii(radii)
     return radii
+
+def get_KDTree_neighbors(kdtree, radius):
+    """Returns index pairs with shape ``(n_pairs, 2)`` and distances of points
+    within *radius* of each other.  Results are copied into arrays, when C
+    KDTree module supports it, so that an object is not made for each pair."""
+
+    try:
+        n = kdtree.neighbor_find(radius)
+    except AttributeError:
+        neighbors = kdtree.neighbor_search(radius)
+        pairs = array([(n.index1, n.index2) for n in neighbors], int)
+        return (pairs.reshape((len(neighbors), 2)),
+                array([n.radius for n in neighbors], float))
+    pairs = empty((n, 2), int)
+    radii = empty(n, 'f')
+    if n:
+        kdtree.neighbor_get_indices(pairs)
+        kdtree.neighbor_get_radii(radii)
+    return pairs, radii.astype(float)
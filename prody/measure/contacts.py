@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 """ This module defines a class and function for identifying contacts."""
 
+import numpy as np
 from numpy import array, ndarray
 
 from prody.atomic import Atomic, Atom, AtomGroup, AtomSubset, Selection
 from prody.kdtree import KDTree
 from prody.utilities import rangeString
 
-__all__ = ['Contacts', 'iterNeighbors', 'findNeighbors']
+__all__ = ['Contacts', 'iterNeighbors', 'findNeighbors',
+           'findNeighborArrays', 'buildContactMap']
 
 class Contacts(object):
 
@@ -279,3 +281,186 @@ def findNeighbors(atoms, radius, atoms2=None, unitcell=None):
     distance between them.  See :func:`iterNeighbors` for more details."""
 
     return list(iterNeighbors(atoms, radius, atoms2, unitcell))
+
+
+def _getNeighborCoords(atoms, unitcell, name='atoms'):
+    """Returns coordinates, unitcell, and atoms that have residue and chain
+    data for *atoms*, which may be an :class:`.Atomic` or :class:`.Frame`
+    instance or a coordinate array.  Unitcell of a frame is used if
+    *unitcell* is not given."""
+
+    try:
+        coords = atoms._getCoords()
+    except AttributeError:
+        try:
+            ndim = atoms.ndim
+        except AttributeError:
+            raise TypeError('{0} must be an Atomic or Frame instance or a '
+                            'coordinate array'.format(name))
+        if ndim > 2 or atoms.shape[-1] != 3:
+            raise ValueError('{0} must be a coordinate array with shape '
+                             '(n_atoms, 3) or (3,)'.format(name))
+        return atoms.reshape((-1, 3)), unitcell, None
+
+    if coords is None:
+        raise ValueError('{0} does not have coordinate data'.format(name))
+    if isinstance(atoms, Atomic):
+        return coords.reshape((-1, 3)), unitcell, atoms
+    if unitcell is None:
+        unitcell = atoms.getUnitcell()
+        if unitcell is not None:
+            unitcell = unitcell[:3]
+    return coords, unitcell, atoms.getAtoms()
+
+
+def _searchPairs(coords, radius, unitcell):
+    """Returns index pairs and distances of *coords* within *radius*."""
+
+    kdtree = KDTree(coords, unitcell=unitcell)
+    kdtree.search(radius)
+    if not kdtree.getCount():
+        return np.zeros((0, 2), int), np.zeros(0)
+    return kdtree.getIndices(), np.asarray(kdtree.getDistances(), float)
+
+
+def _searchPoints(coords, radius, centers, unitcell):
+    """Returns index pairs and distances of *coords* within *radius* of
+    each point in *centers*, with indices of *centers* in the first
+    column."""
+
+    kdtree = KDTree(coords, unitcell=unitcell)
+    found, distances, counts = [], [], []
+    for center in centers:
+        kdtree.search(radius, center)
+        count = kdtree.getCount()
+        counts.append(count)
+        if count:
+            found.append(np.asarray(kdtree.getIndices()).reshape(-1))
+            distances.append(np.asarray(kdtree.getDistances(), float))
+    if not found:
+        return np.zeros((0, 2), int), np.zeros(0)
+    pairs = np.empty((sum(counts), 2), int)
+    pairs[:, 0] = np.repeat(np.arange(len(centers)), counts)
+    pairs[:, 1] = np.concatenate(found)
+    return pairs, np.concatenate(distances)
+
+
+def findNeighborArrays(atoms, radius, atoms2=None, unitcell=None):
+    """Returns indices and distances of pairs of *atoms* that are within
+    *radius* of each other as three arrays ``(i, j, d)``.  Unlike
+    :func:`findNeighbors`, an object is not made for each pair, so it can
+    be used for systems with millions of contacts.
+
+    Indices refer to positions in *atoms* and *atoms2*, which may be
+    :class:`.Atomic` or :class:`.Frame` instances or coordinate arrays.
+    For a :class:`.Selection`, ``atoms.getIndices()[i]`` are indices of
+    atoms in the :class:`.AtomGroup`.  When only *atoms* is given, each
+    pair is returned once with ``i < j``.  When *atoms2* is also given, *i*
+    is an index in *atoms* and *j* is an index in *atoms2*.  Pairs are not
+    sorted.
+
+    When orthorhombic *unitcell* dimensions are given, periodic boundary
+    conditions are taken into account, see :class:`.KDTree`.  If *atoms* is
+    a :class:`.Frame` instance and *unitcell* is not given, unitcell of the
+    frame is used if available.
+
+    :arg radius: distance cutoff (Å)
+    :type radius: float
+
+    :arg unitcell: orthorhombic unitcell dimensions with shape ``(3,)``
+    :type unitcell: :class:`numpy.ndarray`"""
+
+    radius = float(radius)
+    if radius <= 0:
+        raise ValueError('radius must be a positive number')
+
+    coords, unitcell, _ = _getNeighborCoords(atoms, unitcell)
+    if unitcell is not None:
+        unitcell = np.asarray(unitcell, float)
+
+    if atoms2 is None:
+        if len(coords) <= 1:
+            raise ValueError('atoms must be more than 1')
+        pairs, distances = _searchPairs(coords, radius, unitcell)
+        return pairs.min(1), pairs.max(1), distances
+
+    coords2 = _getNeighborCoords(atoms2, None, 'atoms2')[0]
+    n_atoms = len(coords)
+    small, large = sorted([n_atoms, len(coords2)])
+    if small <= max(100, large // 100):
+        # searching around each atom of the smaller set visits only its
+        # neighbors, instead of all pairs within the larger set
+        if n_atoms == small:
+            pairs, distances = _searchPoints(coords2, radius, coords,
+                                             unitcell)
+            return pairs[:, 0], pairs[:, 1], distances
+        pairs, distances = _searchPoints(coords, radius, coords2, unitcell)
+        return pairs[:, 1], pairs[:, 0], distances
+
+    pairs, distances = _searchPairs(np.concatenate([coords, coords2]),
+                                    radius, unitcell)
+    first = pairs < n_atoms
+    which = first[:, 0] != first[:, 1]
+    pairs, distances = pairs[which], distances[which]
+    pairs.sort(1)
+    return pairs[:, 0], pairs[:, 1] - n_atoms, distances
+
+
+def _getGroups(atoms, level, name='atoms'):
+    """Returns number of groups at *level* and group index of each atom."""
+
+    if level == 'atom':
+        return len(atoms), np.arange(len(atoms))
+    if atoms is None:
+        raise ValueError('{0} must have residue and chain data for {1} '
+                         'level contact map'.format(name, level))
+    if level == 'residue':
+        indices = atoms.getResindices()
+    elif level == 'chain':
+        indices = atoms.getChindices()
+    else:
+        raise ValueError("level must be 'atom', 'residue', or 'chain'")
+    unique, groups = np.unique(indices, return_inverse=True)
+    return len(unique), groups
+
+
+def buildContactMap(atoms, radius, atoms2=None, unitcell=None, **kwargs):
+    """Returns a contact map, whose elements are numbers of atom pairs within
+    *radius* of each other, between residues or chains of *atoms*, or
+    between those of *atoms* and *atoms2*.  Pairs are found by
+    :func:`findNeighborArrays`, see it for description of arguments.  Rows
+    and columns are in the order residues (or chains) appear in *atoms* and
+    *atoms2*.  When only *atoms* is given, the map is symmetric, and
+    diagonal elements are numbers of pairs within the same residue.
+
+    :arg level: ``'residue'`` (default), ``'chain'``, or ``'atom'``, which
+        is the only level for coordinate arrays
+    :type level: str
+
+    :arg sparse: return a :class:`scipy.sparse.csr_matrix`, which is
+        recommended for large systems, default is **False**
+    :type sparse: bool"""
+
+    level = str(kwargs.pop('level', 'residue')).lower()
+    sparse = kwargs.pop('sparse', False)
+
+    coords, _, atomic = _getNeighborCoords(atoms, None)
+    n_rows, rows = _getGroups(coords if level == 'atom' else atomic, level)
+    i, j, _ = findNeighborArrays(atoms, radius, atoms2, unitcell)
+    if atoms2 is None:
+        n_cols, cols = n_rows, rows
+        # pairs within the same group are on the diagonal and counted once
+        other = rows[i] != rows[j]
+        i, j = np.concatenate([i, j[other]]), np.concatenate([j, i[other]])
+    else:
+        coords2, _, atomic2 = _getNeighborCoords(atoms2, None, 'atoms2')
+        n_cols, cols = _getGroups(coords2 if level == 'atom' else atomic2,
+                                  level, 'atoms2')
+    rows, cols = rows[i], cols[j]
+
+    if sparse:
+        from scipy.sparse import coo_matrix
+        return coo_matrix((np.ones(len(rows), int), (rows, cols)),
+                          shape=(n_rows, n_cols)).tocsr()
+    counts = np.bincount(rows * n_cols + cols, minlength=n_rows * n_cols)
+    return counts.reshape((n_rows, n_cols))
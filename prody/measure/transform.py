@@ -9,11 +9,9 @@ from prody.utilities import importLA
 
 from .measure import calcCenter
 
-linalg = importLA()
-
 __all__ = ['Transformation', 'applyTransformation', 'alignCoordsets',
            'calcRMSD', 'calcTransformation', 'superpose',
-           'moveAtoms', 'wrapAtoms',
+           'moveAtoms', 'wrapAtoms', 'calcRMSDMatrix',
            'printRMSD']
 
 
@@ -147,6 +145,7 @@ def getTransformation(mob, tar, weights=None):
         tar = tar - tar_com
         matrix = np.dot((mob * weights).T, (tar * weights)) / weights_dot
 
+    linalg = importLA()
     U, s, Vh = linalg.svd(matrix)
     Id = np.array([[1, 0, 0],
                    [0, 1, 0],
@@ -432,6 +431,233 @@ def getRMSD(ref, tar, weights=None):
                 return np.sqrt(rmsd / weights.sum(1).flatten())
 
 
+def calcRMSDMatrix(coordsets, weights=None, superpose=True, condensed=False,
+                   **kwargs):
+    """Returns root-mean-square deviations (RMSDs) between all pairs of
+    *coordsets*. When *superpose* is **True**, the RMSD of each pair is
+    calculated after optimal superposition using the quaternion
+    characteristic polynomial (QCP) method, i.e. the largest eigenvalue of
+    the key matrix is found with Newton iterations, for all pairs in a block
+    at once. The matrix is built in blocks of conformation pairs so that the
+    memory usage is bounded, and row blocks can be processed in parallel.
+
+    :arg coordsets: coordinate sets with shape ``(n_confs, n_atoms, 3)``, or
+        an object with :meth:`getCoordsets` method, e.g. :class:`.Ensemble`
+    :type coordsets: :class:`~numpy.ndarray`
+
+    :arg weights: atomic weights with shape ``(n_atoms, 1)`` or per
+        conformation weights with shape ``(n_confs, n_atoms, 1)``, in which
+        case the product of the weights of two conformations is used for
+        their RMSD, so that e.g. atoms missing in either are ignored
+    :type weights: :class:`~numpy.ndarray`
+
+    :arg superpose: whether to superpose each pair optimally, default is
+        **True**
+    :type superpose: bool
+
+    :arg condensed: return the upper triangle of the matrix as a condensed
+        array, as used by :func:`scipy.cluster.hierarchy.linkage`, default is
+        **False**
+    :type condensed: bool
+
+    :arg block_size: number of conformations in a block, default is 256
+    :type block_size: int
+
+    :arg n_cpu: number of threads to process row blocks, default is 1
+    :type n_cpu: int
+    """
+
+    block_size = int(kwargs.pop('block_size', 256))
+    n_cpu = kwargs.pop('n_cpu', 1)
+
+    if not isinstance(coordsets, np.ndarray):
+        try:
+            if weights is None:
+                weights = coordsets._getWeights()
+            coordsets = coordsets._getCoordsets()
+        except AttributeError:
+            raise TypeError('coordsets must be a numpy array or an object '
+                            'with getCoordsets method')
+    if coordsets.ndim != 3 or coordsets.shape[2] != 3:
+        raise ValueError('coordsets must have shape (n_confs, n_atoms, 3)')
+    n_confs, n_atoms, _ = coordsets.shape
+
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape == (n_atoms, 1):
+            weights = weights[:, 0]
+        elif weights.shape == (n_confs, n_atoms, 1):
+            weights = weights[:, :, 0]
+        else:
+            raise ValueError('weights must have shape ([n_confs,] n_atoms, 1)')
+    if block_size < 1:
+        raise ValueError('block_size must be a positive integer')
+    if not isinstance(n_cpu, int):
+        raise TypeError('n_cpu must be an integer')
+    elif n_cpu < 1:
+        raise ValueError('n_cpu must be equal to or greater than 1')
+
+    coords = np.array(coordsets, dtype=float)
+    if superpose:
+        # RMSDs after superposition do not depend on the position of each
+        # conformation, so they are centered to reduce round-off errors
+        if weights is None:
+            coords -= coords.mean(1)[:, np.newaxis]
+        elif weights.ndim == 1:
+            coords -= (np.dot(weights, coords) / weights.sum())[:, np.newaxis]
+        else:
+            sums = weights.sum(1)
+            sums[sums == 0] = 1.
+            coords -= ((weights[:, :, np.newaxis] * coords).sum(1) /
+                       sums[:, np.newaxis])[:, np.newaxis]
+
+    if condensed:
+        rmsds = np.zeros(n_confs * (n_confs - 1) // 2)
+    else:
+        rmsds = np.zeros((n_confs, n_confs))
+
+    blocks = [(start, min(start + block_size, n_confs))
+              for start in range(0, n_confs, block_size)]
+
+    def calcRowBlock(index):
+        I = blocks[index]
+        for J in blocks[index:]:
+            tile = _calcRMSDBlock(coords, weights, I, J, superpose)
+            if condensed:
+                i = np.arange(*I)[:, np.newaxis]
+                j = np.arange(*J)
+                upper = j > i
+                pos = n_confs * i - i * (i + 1) // 2 + j - i - 1
+                rmsds[pos[upper]] = tile[upper]
+            else:
+                rmsds[I[0]:I[1], J[0]:J[1]] = tile
+                rmsds[J[0]:J[1], I[0]:I[1]] = tile.T
+
+    if n_cpu == 1 or len(blocks) == 1:
+        for index in range(len(blocks)):
+            calcRowBlock(index)
+    else:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(n_cpu, len(blocks)))
+        try:
+            pool.map(calcRowBlock, range(len(blocks)))
+        finally:
+            pool.close()
+            pool.join()
+
+    if not condensed:
+        rmsds[np.diag_indices(n_confs)] = 0.
+    return rmsds
+
+
+def _calcRMSDBlock(coords, weights, I, J, superpose):
+    """Returns RMSDs between conformations in ranges *I* and *J* of
+    *coords*."""
+
+    A = coords[I[0]:I[1]]
+    B = coords[J[0]:J[1]]
+    m, n = len(A), len(B)
+    n_atoms = coords.shape[1]
+
+    # inner products over atoms, weighted by the product of weights
+    if weights is None:
+        Aw, Bw = A, B
+        W = np.ones((m, n)) * n_atoms
+        Ga = (A ** 2).sum(2).sum(1)[:, np.newaxis]
+        Gb = (B ** 2).sum(2).sum(1)[np.newaxis, :]
+    elif weights.ndim == 1:
+        Aw, Bw = A * weights[:, np.newaxis], B
+        W = np.ones((m, n)) * weights.sum()
+        Ga = (Aw * A).sum(2).sum(1)[:, np.newaxis]
+        Gb = (Bw * B * weights[:, np.newaxis]).sum(2).sum(1)[np.newaxis, :]
+    else:
+        Wa = weights[I[0]:I[1]]
+        Wb = weights[J[0]:J[1]]
+        Aw = A * Wa[:, :, np.newaxis]
+        Bw = B * Wb[:, :, np.newaxis]
+        W = np.dot(Wa, Wb.T)
+        Ga = np.dot((Aw * A).sum(2), Wb.T)
+        Gb = np.dot(Wa, (Bw * B).sum(2).T)
+
+    if not superpose:
+        AB = np.dot(Aw.reshape(m, n_atoms * 3), Bw.reshape(n, n_atoms * 3).T)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(np.clip(Ga + Gb - 2 * AB, 0, None) / W)
+
+    # correlation matrices M[i, j] = sum_k w_k a_ik b_jk^T
+    M = np.dot(Aw.transpose(0, 2, 1).reshape(m * 3, n_atoms),
+               Bw.transpose(0, 2, 1).reshape(n * 3, n_atoms).T)
+    M = M.reshape(m, 3, n, 3).transpose(0, 2, 1, 3)
+
+    if weights is not None and weights.ndim == 2:
+        # center each pair using the product of weights
+        Sa = np.dot(Aw.transpose(0, 2, 1).reshape(m * 3, n_atoms), Wb.T)
+        Sa = Sa.reshape(m, 3, n).transpose(0, 2, 1)
+        Sb = np.dot(Wa, Bw.transpose(0, 2, 1).reshape(n * 3, n_atoms).T)
+        Sb = Sb.reshape(m, n, 3)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            Winv = np.where(W > 0, 1. / W, 0.)
+        M = M - Sa[:, :, :, np.newaxis] * Sb[:, :, np.newaxis, :] * \
+            Winv[:, :, np.newaxis, np.newaxis]
+        Ga = Ga - (Sa ** 2).sum(2) * Winv
+        Gb = Gb - (Sb ** 2).sum(2) * Winv
+
+    E0 = (Ga + Gb) / 2.
+    lmax = _calcQCPEigenvalue(M.reshape(-1, 3, 3), E0.ravel())
+    with np.errstate(invalid='ignore', divide='ignore'):
+        msd = np.clip(2 * (E0.ravel() - lmax), 0, None) / W.ravel()
+    return np.sqrt(msd).reshape(m, n)
+
+
+def _calcQCPEigenvalue(M, E0, maxiter=50):
+    """Returns the largest eigenvalue of the key matrices built from 3x3
+    correlation matrices *M* using Newton iterations on their characteristic
+    polynomials starting from upper bounds *E0*."""
+
+    Sxx, Sxy, Sxz = M[:, 0, 0], M[:, 0, 1], M[:, 0, 2]
+    Syx, Syy, Syz = M[:, 1, 0], M[:, 1, 1], M[:, 1, 2]
+    Szx, Szy, Szz = M[:, 2, 0], M[:, 2, 1], M[:, 2, 2]
+
+    K = np.empty((len(M), 4, 4))
+    K[:, 0, 0] = Sxx + Syy + Szz
+    K[:, 1, 1] = Sxx - Syy - Szz
+    K[:, 2, 2] = -Sxx + Syy - Szz
+    K[:, 3, 3] = -Sxx - Syy + Szz
+    K[:, 0, 1] = K[:, 1, 0] = Syz - Szy
+    K[:, 0, 2] = K[:, 2, 0] = Szx - Sxz
+    K[:, 0, 3] = K[:, 3, 0] = Sxy - Syx
+    K[:, 1, 2] = K[:, 2, 1] = Sxy + Syx
+    K[:, 1, 3] = K[:, 3, 1] = Szx + Sxz
+    K[:, 2, 3] = K[:, 3, 2] = Syz + Szy
+
+    C2 = -2. * (M ** 2).sum(2).sum(1)
+    C1 = -8. * (Sxx * (Syy * Szz - Syz * Szy) - Sxy * (Syx * Szz - Syz * Szx) +
+                Sxz * (Syx * Szy - Syy * Szx))
+    # determinant of the symmetric key matrix from its 2x2 minors
+    K00, K01, K02, K03 = K[:, 0, 0], K[:, 0, 1], K[:, 0, 2], K[:, 0, 3]
+    K11, K12, K13 = K[:, 1, 1], K[:, 1, 2], K[:, 1, 3]
+    K22, K23, K33 = K[:, 2, 2], K[:, 2, 3], K[:, 3, 3]
+    C0 = ((K00 * K11 - K01 * K01) * (K22 * K33 - K23 * K23) -
+          (K00 * K12 - K01 * K02) * (K12 * K33 - K23 * K13) +
+          (K00 * K13 - K01 * K03) * (K12 * K23 - K22 * K13) +
+          (K01 * K12 - K11 * K02) * (K02 * K33 - K23 * K03) -
+          (K01 * K13 - K11 * K03) * (K02 * K23 - K22 * K03) +
+          (K02 * K13 - K12 * K03) * (K02 * K13 - K12 * K03))
+
+    lmax = E0.copy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(maxiter):
+            l2 = lmax * lmax
+            P = (l2 + C2) * l2 + C1 * lmax + C0
+            dP = 4 * l2 * lmax + 2 * C2 * lmax + C1
+            step = np.where(dP != 0, P / dP, 0.)
+            lmax -= step
+            # convergence is quadratic, so the last step is accurate enough
+            if not (np.abs(step) > 1e-11 * np.abs(lmax)).any():
+                break
+    return lmax
+
+
 def printRMSD(reference, target=None, weights=None, log=True, msg=None):
     """Print RMSD to the screen.  If *target* has multiple coordinate sets,
     minimum, maximum and mean RMSD values are printed.  If *log* is **True**
@@ -15,7 +15,6 @@ from prody import LOGGER, SETTINGS
 
 from .localpdb import fetchPDB
 
-import struct as st
 import numpy as np
 
 __all__ = ['parseEMDStream', 'parseEMD', 'writeEMD', 'TRNET']
@@ -55,6 +54,14 @@ def parseEMD(emd, **kwargs):
     :arg make_nodes: Use the topology representing network algorithm to fit pseudoatom nodes to the map.
         Default is False and sets return_map to True.
     :type make_nodes: bool
+
+    :arg batch_size: Number of map samples processed at once by the topology representing network
+        algorithm. Default is 100, pass 1 to process samples one at a time.
+    :type batch_size: int
+
+    :arg memmap: Memory map density values of uncompressed map files instead of reading them,
+        when no cutoff is given. Default is True.
+    :type memmap: bool
     """
 
     title = kwargs.get('title', None)
@@ -91,7 +98,8 @@ def parseEMD(emd, **kwargs):
 
     return result
 
-def _parseEMDLines(atomgroup, stream, cutoff=None, n_nodes=1000, num_iter=20, map=True, make_nodes=False):
+def _parseEMDLines(atomgroup, stream, cutoff=None, n_nodes=1000, num_iter=20, map=True, make_nodes=False,
+                   memmap=True, batch_size=100):
     """ Returns an AtomGroup. see also :func:`.parseEMDStream()`.
 
     :arg stream: stream from parser.
@@ -100,7 +108,7 @@ def _parseEMDLines(atomgroup, stream, cutoff=None, n_nodes=1000, num_iter=20, ma
     if not n_nodes > 0:
         raise ValueError('n_nodes should be larger than 0')
 
-    emd = EMDMAP(stream, cutoff)
+    emd = EMDMAP(stream, cutoff, memmap)
 
     if make_nodes:
         coordinates = np.zeros((n_nodes, 3), dtype=float)
@@ -112,7 +120,9 @@ def _parseEMDLines(atomgroup, stream, cutoff=None, n_nodes=1000, num_iter=20, ma
         trn = TRNET(n_nodes = n_nodes)
         trn.inputMap(emd, sample='density')
 
-        trn.run(tmax = num_iter)
+        trn.run(tmax = num_iter, batch_size = batch_size)
+        LOGGER.debug('Root mean square distance of map samples to closest nodes '
+                     'is {0:.2f} A.'.format(np.sqrt(np.nanmean(trn.calcQuantizationErrors() ** 2))))
         for i in range(n_nodes):
             coordinates[i,:] = trn.W[i,:]
             atomnames[i] = 'B'
@@ -154,6 +164,8 @@ def parseEMDStream(stream, **kwargs):
     num_iter = int(kwargs.get('num_iter', 20))
     map = kwargs.get('map',True)
     make_nodes = kwargs.get('make_nodes',False)
+    memmap = kwargs.get('memmap', True)
+    batch_size = int(kwargs.get('batch_size', 100))
 
     if map is False and make_nodes is False:
         LOGGER.warn('At least one of map and make_nodes should be True. '
@@ -170,16 +182,19 @@ def parseEMDStream(stream, **kwargs):
 
         if map:
             emd, atomgroup = _parseEMDLines(atomgroup, stream, cutoff=cutoff, n_nodes=n_nodes, \
-                                            num_iter=num_iter, map=map, make_nodes=make_nodes)
+                                            num_iter=num_iter, map=map, make_nodes=make_nodes,
+                                       memmap=memmap, batch_size=batch_size)
         else:
             atomgroup = _parseEMDLines(atomgroup, stream, cutoff=cutoff, n_nodes=n_nodes, \
-                                       num_iter=num_iter, map=map, make_nodes=make_nodes)
+                                       num_iter=num_iter, map=map, make_nodes=make_nodes,
+                                       memmap=memmap, batch_size=batch_size)
 
         LOGGER.report('{0} atoms and {1} coordinate sets were '
                       'parsed in %.2fs.'.format(atomgroup.numAtoms(), atomgroup.numCoordsets()))
     else: 
         emd = _parseEMDLines(atomgroup, stream, cutoff=cutoff, n_nodes=n_nodes, \
-                             num_iter=num_iter, map=map, make_nodes=make_nodes)
+                             num_iter=num_iter, map=map, make_nodes=make_nodes,
+                             memmap=memmap, batch_size=batch_size)
 
     if make_nodes:
         if map:
@@ -197,256 +212,360 @@ def writeEMD(filename,emd):
     :type emd: :class:`.EMD`
     '''
 
-    f = open(filename, "wb")
-    f.write(st.pack('<L',emd.NC))
-    f.write(st.pack('<L',emd.NR))
-    f.write(st.pack('<L',emd.NS))
-    f.write(st.pack('<L',emd.mode))
-    f.write(st.pack('<L',emd.ncstart))
-    f.write(st.pack('<L',emd.nrstart))
-    f.write(st.pack('<L',emd.nsstart))
-    f.write(st.pack('<L',emd.Nx))
-    f.write(st.pack('<L',emd.Ny))
-    f.write(st.pack('<L',emd.Nz))
-    f.write(st.pack('<f',emd.Lx))
-    f.write(st.pack('<f',emd.Ly))
-    f.write(st.pack('<f',emd.Lz))
-    f.write(st.pack('<f',emd.a))
-    f.write(st.pack('<f',emd.b))
-    f.write(st.pack('<f',emd.c))
-    f.write(st.pack('<L',emd.mapc))
-    f.write(st.pack('<L',emd.mapr))
-    f.write(st.pack('<L',emd.maps))
-    f.write(st.pack('<f',emd.dmin))
-    f.write(st.pack('<f',emd.dmax))
-    f.write(st.pack('<f',emd.dmean))
-    f.write(st.pack('<L',emd.ispg))
-    f.write(st.pack('<L',emd.nsymbt))
-    f.write(st.pack('<100s',emd.extra))
-    f.write(st.pack('<f',emd.x0))
-    f.write(st.pack('<f',emd.y0))
-    f.write(st.pack('<f',emd.z0))
-    f.write(st.pack('<4s',emd.wordMAP))
-    f.write(st.pack('<4s',emd.machst))
-    f.write(st.pack('<f',emd.rms))
-    f.write(st.pack('<L',emd.nlabels))
-    f.write(st.pack('<800s',emd.labels))
-
-    for s in range(0, emd.NS):
-        for r in range(0, emd.NR):
-            for c in range(0, emd.NC):
-                f.write(st.pack('<f',emd.density[s,r,c]))
+    header = np.zeros(1, dtype=MRC_HEADER_DTYPE)
+    for field, attr in MRC_HEADER_FIELDS:
+        header[field] = getattr(emd, attr)
+    # density is written as 32-bit reals without an extended header
+    header['mode'] = 2
+    header['nsymbt'] = 0
 
+    f = open(filename, "wb")
+    f.write(header.tobytes())
+    f.write(np.ascontiguousarray(emd.density, dtype='<f4').tobytes())
     f.close()
 
-class EMDMAP:
-    def __init__(self, stream, cutoff):
-        # Number of columns, rows, and sections (3 words, 12 bytes, 1-12)
-        self.NC = st.unpack('<L', stream.read(4))[0]
-        self.NR = st.unpack('<L', stream.read(4))[0]
-        self.NS = st.unpack('<L', stream.read(4))[0]
-        self.Ntot = self.NC * self.NR * self.NS
-
-        # Mode (1 word, 4 bytes, 13-16)
-        self.mode = st.unpack('<L', stream.read(4))[0]
 
-        # Number of first column, row, section (3 words, 12 bytes, 17-28)
-        self.ncstart = st.unpack('<l', stream.read(4))[0]
-        self.nrstart = st.unpack('<l', stream.read(4))[0]
-        self.nsstart = st.unpack('<l', stream.read(4))[0
+MRC_HEADER_DTYPE = np.dtype([
+    # Number of columns, rows, and sections (3 words, 12 bytes, 1-12)
+    ('nc', '<i4'), ('nr', '<i4'), ('ns', '<i4'),
+    # Mode (1 word, 4 bytes, 13-16)
+    ('mode', '<i4'),
+    # Number of first column, row, section (3 words, 12 bytes, 17-28)
+    ('ncstart', '<i4'), ('nrstart', '<i4'), ('nsstart', '<i4'),
+    # Number of intervals along x, y, z (3 words, 12 bytes, 29-40)
+    ('nx', '<i4'), ('ny', '<i4'), ('nz', '<i4'),
+    # Cell dimensions (Angstroms) (3 words, 12 bytes, 41-52)
+    ('lx', '<f4'), ('ly', '<f4'), ('lz', '<f4'),
+    # Cell angles (Degrees) (3 words, 12 bytes, 53-64)
+    ('alpha', '<f4'), ('beta', '<f4'), ('gamma', '<f4'),
+    # Which axis corresponds to column, row, and sections (1, 2, 3 for x, y ,z)
+    # (3 words, 12 bytes, 65-76)
+    ('mapc', '<i4'), ('mapr', '<i4'), ('maps', '<i4'),
+    # Density values (min, max, mean) (3 words, 12 bytes, 77-88)
+    ('dmin', '<f4'), ('dmax', '<f4'), ('dmean', '<f4'),
+    # Space group number (1 word, 4 bytes, 89-92)
+    # For EM/ET, this encodes the type of data:
+    # 0 for 2D images and image stacks, 1 for 3D volumes, 401 for volume stacks
+    ('ispg', '<i4'),
+    # size of extended header (1 word, 4 bytes, 93-96)
+    # contained symmetry records in original format definition
+    ('nsymbt', '<i4'),
+    # we treat this all as extra stuff like MRC2014 format (25 word, 100 bytes, 97-196)
+    ('extra', 'S100'),
+    # origins for x, y, z (3 words, 12 bytes, 197-208)
+    ('x0', '<f4'), ('y0', '<f4'), ('z0', '<f4'),
+    # the character string 'MAP' to identify file type (1 word, 4 bytes, 209-212)
+    ('map', 'S4'),
+    # machine stamp encoding byte ordering of data (1 word, 4 bytes, 213-216)
+    ('machst', 'S4'),
+    # rms deviation of map from mean density (1 word, 4 bytes, 217-220)
+    ('rms', '<f4'),
+    # number of labels being used (1 word, 4 bytes, 221-224)
+    ('nlabels', '<i4'),
+    # 10 80-character text labels, which we leave concatenated (200 words, 800 bytes, 225-1024)
+    ('labels', 'S800'),
+])
+
+# header fields and corresponding EMDMAP attributes
+MRC_HEADER_FIELDS = [
+    ('nc', 'NC'), ('nr', 'NR'), ('ns', 'NS'), ('mode', 'mode'),
+    ('ncstart', 'ncstart'), ('nrstart', 'nrstart'), ('nsstart', 'nsstart'),
+    ('nx', 'Nx'), ('ny', 'Ny'), ('nz', 'Nz'),
+    ('lx', 'Lx'), ('ly', 'Ly'), ('lz', 'Lz'),
+    ('alpha', 'a'), ('beta', 'b'), ('gamma', 'c'),
+    ('mapc', 'mapc'), ('mapr', 'mapr'), ('maps', 'maps'),
+    ('dmin', 'dmin'), ('dmax', 'dmax'), ('dmean', 'dmean'),
+    ('ispg', 'ispg'), ('nsymbt', 'nsymbt'), ('extra', 'extra'),
+    ('x0', 'x0'), ('y0', 'y0'), ('z0', 'z0'),
+    ('map', 'wordMAP'), ('machst', 'machst'), ('rms', 'rms'),
+    ('nlabels', 'nlabels'), ('labels', 'labels'),
 ]
-        # Number of intervals along x, y, z (3 words, 12 bytes, 29-40)
-        self.Nx = st.unpack('<L', stream.read(4))[0]
-        self.Ny = st.unpack('<L', stream.read(4))[0]
-        self.Nz = st.unpack('<L', stream.read(4))[0]
-
-        # Cell dimensions (Angstroms) (3 words, 12 bytes, 41-52)
-        self.Lx = st.unpack('<f', stream.read(4))[0]
-        self.Ly = st.unpack('<f', stream.read(4))[0]
-        self.Lz = st.unpack('<f', stream.read(4))[0]
-    
-        # Cell angles (Degrees) (3 words, 12 bytes, 53-64)
-        self.a = st.unpack('<f', stream.read(4))[0]
-        self.b = st.unpack('<f', stream.read(4))[0]
-        self.c = st.unpack('<f', stream.read(4))[0]
-
-        # Which axis corresponds to column, row, and sections (1, 2, 3 for x, y ,z)
-        # (3 words, 12 bytes, 65-76)
-        self.mapc = st.unpack('<L', stream.read(4))[0]
-        self.mapr = st.unpack('<L', stream.read(4))[0]
-        self.maps = st.unpack('<L', stream.read(4))[0]
-
-        # Density values (min, max, mean) (3 words, 12 bytes, 77-88)
-        self.dmin = st.unpack('<f', stream.read(4))[0]
-        self.dmax = st.unpack('<f', stream.read(4))[0]
-        self.dmean = st.unpack('<f', stream.read(4))[0]
-
-        # Space group number (1 word, 4 bytes, 89-92)
-        # For EM/ET, this encodes the type of data:
-        # 0 for 2D images and image stacks, 1 for 3D volumes, 401 for volume stacks
-        self.ispg = st.unpack('<L', stream.read(4))[0]
-
-        # size of extended header (1 word, 4 bytes, 93-96)
-        # contained symmetry records in original format definition
-        self.nsymbt = st.unpack('<L', stream.read(4))[0]
-
-        # we treat this all as extra stuff like MRC2014 format (25 word, 100 bytes, 97-196)
-        self.extra = st.unpack('<100s', stream.read(100))[0]
-
-        # origins for x, y, z (3 words, 12 bytes, 197-208)
-        self.x0 = st.unpack('<f', stream.read(4))[0]
-        self.y0 = st.unpack('<f', stream.read(4))[0]
-        self.z0 = st.unpack('<f', stream.read(4))[0]
-
-        # the character string 'MAP' to identify file type (1 word, 4 bytes, 209-212)
-        self.wordMAP = st.unpack('<4s', stream.read(4))[0] 
-
-        # machine stamp encoding byte ordering of data (1 word, 4 bytes, 213-216)
-        self.machst = st.unpack('<4s', stream.read(4))[0]
-
-        # rms deviation of map from mean density (1 word, 4 bytes, 217-220)
-        self.rms = st.unpack('<f', stream.read(4))[0]
-
-        # number of labels being used (1 word, 4 bytes, 221-224)
-        self.nlabels = st.unpack('<L', stream.read(4))[0]
-
-        # 10 80-character text labels, which we leave concatenated (200 words, 800 bytes, 225-1024)
-        self.labels = st.unpack('<800s', stream.read(800))[0]
-
-        # Data blocks (1024-end)
-        self.density = np.empty([self.NS, self.NR, self.NC])
-        for s in range(0, self.NS):
-            for r in range(0, self.NR):
-                for c in range(0, self.NC):
-                    d = st.unpack('<f', stream.read(4))[0]
-                    if cutoff is not None and d < cutoff:
-                        d = 0
-                    self.density[s, r, c] = d
 
+# data types of density values for MRC modes
+MRC_MODE_DTYPES = {0: 'i1', 1: 'i2', 2: 'f4', 6: 'u2', 12: 'f2'}
+
+# number of density values processed at once for memory mapped maps
+_CUMSUM_SIZE = 2 ** 24
+
+
+class EMDMAP(object):
+    """Electron density map parsed from an MRC/CCP4 formatted stream.
+
+    The 1024-byte header is parsed in one go.  When *memmap* is **True** and
+    *stream* is an uncompressed file without a density *cutoff*, density
+    values are memory mapped in copy-on-write mode instead of being read,
+    so that large maps can be opened and sampled without loading them.
+    :attr:`density` is indexed by section, row and column, see
+    :meth:`getDensityXYZ` for a view indexed by x, y and z."""
+
+    def __init__(self, stream, cutoff, memmap=True):
+        data = stream.read(1024)
+        header = np.frombuffer(data, dtype=MRC_HEADER_DTYPE)[0]
+        if header['mode'] not in MRC_MODE_DTYPES:
+            # try big-endian byte ordering
+            header = np.frombuffer(data, dtype=MRC_HEADER_DTYPE.newbyteorder('>'))[0]
+            if header['mode'] not in MRC_MODE_DTYPES:
+                raise EMDParseError('density map mode is not supported')
+        byteorder = header.dtype['nc'].byteorder
+
+        for field, attr in MRC_HEADER_FIELDS:
+            value = header[field]
+            setattr(self, attr, value if isinstance(value, bytes)
+                                else value.item())
+        self.Ntot = self.NC * self.NR * self.NS
 
-        self.sampled = False
+        # Data blocks (1024 + size of extended header - end)
+        dtype = np.dtype(MRC_MODE_DTYPES[self.mode]).newbyteorder(byteorder)
+        shape = (self.NS, self.NR, self.NC)
+        filename = getattr(stream, 'name', None)
+        if (memmap and cutoff is None and isinstance(filename, str) and
+            os.path.isfile(filename) and
+            os.path.splitext(filename)[1].lower() not in ('.gz', '.zip')):
+            self.density = np.memmap(filename, dtype=dtype, mode='c',
+                                     offset=1024 + self.nsymbt, shape=shape)
+        else:
+            if self.nsymbt:
+                stream.read(self.nsymbt)
+            density = np.frombuffer(stream.read(self.Ntot * dtype.itemsize),
+                                    dtype=dtype).reshape(shape)
+            density = density.astype(float)
+            if cutoff is not None:
+                density[density < cutoff] = 0
+            self.density = density
+
+    @property
+    def density(self):
+        """Density values indexed by section, row, and column.  Cumulative
+        sums used by :meth:`drawsamples` are calculated again when a new array
+        is set, so after changing values in place, set the array again, e.g.
+        ``emd.density = emd.density``."""
+
+        return self._density
+
+    @density.setter
+    def density(self, density):
+
+        self._density = density
+        self._sectioncumsum = None
+        self._localcumsum = None
+        self._localcumsums = {}
+
+    def getDensityXYZ(self):
+        """Returns a view of :attr:`density` with axes in x, y, z order."""
+
+        axes = [0, 0, 0]
+        axes[self.mapc - 1] = 2
+        axes[self.mapr - 1] = 1
+        axes[self.maps - 1] = 0
+        return self.density.transpose(axes)
 
     def numidx2matidx(self, numidx):
         """ Given index of the position, it will return the numbers of section, row and column. """
-        # calculate section idx
-        s = numidx / (self.NC * self.NR)
-        numidx = numidx - s * self.NC * self.NR
-        # calculate row idx
-        r = numidx / self.NC
-        # calculate column idx
-        c = numidx - r * self.NC
-        return s, r, c
+        return np.unravel_index(numidx, (self.NS, self.NR, self.NC))
+
+    def _getSectionCumsum(self):
+        """Returns cumulative sum of non-negative densities of sections, which
+        is calculated a few sections at a time."""
+
+        if self._sectioncumsum is None:
+            totals = np.empty(self.NS)
+            step = max(1, _CUMSUM_SIZE // max(1, self.NR * self.NC))
+            for s in range(0, self.NS, step):
+                block = np.asarray(self.density[s:s + step], dtype=float)
+                totals[s:s + step] = np.clip(block, 0, None).sum(axis=(1, 2))
+            self._sectioncumsum = np.cumsum(totals)
+        return self._sectioncumsum
+
+    def _getLocalCumsum(self, sec):
+        """Returns cumulative sum of non-negative densities in section *sec*.
+        Cumulative sums of all sections are calculated at once for maps in
+        memory, and those of memory mapped maps are cached for sections that
+        fit in a limited number of values."""
+
+        if not isinstance(self.density, np.memmap):
+            if self._localcumsum is None:
+                density = np.clip(np.asarray(self.density, dtype=float), 0, None)
+                self._localcumsum = np.cumsum(density.reshape((self.NS, -1)),
+                                              axis=1)
+            return self._localcumsum[sec]
+
+        local = self._localcumsums.get(sec)
+        if local is None:
+            if (len(self._localcumsums) + 1) * self.NR * self.NC > _CUMSUM_SIZE:
+                self._localcumsums.clear()
+            section = np.clip(np.asarray(self.density[sec], dtype=float), 0, None)
+            local = self._localcumsums[sec] = np.cumsum(section.ravel())
+        return local
+
+    def drawsamples(self, n_samples, uniform=False):
+        """Returns an array of shape (*n_samples*, 3) containing section, row
+        and column indices of voxels drawn with probabilities proportional to
+        their densities, or uniformly if *uniform* is **True**.  Negative
+        densities are treated as zero."""
+
+        n_samples = int(n_samples)
+        if uniform:
+            numidx = (np.random.rand(n_samples) * self.Ntot).astype(int)
+            return np.column_stack(self.numidx2matidx(numidx))
+
+        cumsum = self._getSectionCumsum()
+        r = np.random.rand(n_samples) * cumsum[-1]
+        secs = np.searchsorted(cumsum, r, side='right')
+        secs = np.minimum(secs, self.NS - 1)
+        r -= np.concatenate([[0.], cumsum])[secs]
+
+        indices = np.empty((n_samples, 3), dtype=int)
+        indices[:, 0] = secs
+        for sec in np.unique(secs):
+            which = secs == sec
+            local = self._getLocalCumsum(sec)
+            j = np.searchsorted(local, r[which], side='right')
+            j = np.minimum(j, local.size - 1)
+            indices[which, 1], indices[which, 2] = \
+                np.unravel_index(j, (self.NR, self.NC))
+        return indices
 
     def drawsample(self):
-        if not self.sampled:
-            self.cumsumdens = np.cumsum(self.density)
-            self.sampled = True
-        summ = self.cumsumdens[-1]
-        r = np.random.rand() * summ
-        j = np.searchsorted(self.cumsumdens,r)
-        return self.numidx2matidx(j)
+        return tuple(self.drawsamples(1)[0])
 
     def drawsample_uniform(self):
-        r = int(np.random.rand() * self.Ntot)
-        return self.numidx2matidx(r)
+        return tuple(self.drawsamples(1, uniform=True)[0])
 
     def center(self):
         return self.NS / 2, self.NR / 2, self.NC / 2
 
-    def coordinate(self, sec, row, col ):
-        # calculate resolution
+    def _getResolution(self):
         res = np.empty(3)
         res[self.mapc - 1] = self.NC
         res[self.mapr - 1] = self.NR
         res[self.maps - 1] = self.NS
-        res = np.divide(np.array([self.Lx, self.Ly, self.Lz]), res)
-        
-        ret = np.empty(3)
-        ret[self.mapc - 1] = col + self.ncstart
-        ret[self.mapr - 1] = row + self.nrstart
-        ret[self.maps - 1] = sec + self.nsstart
-
-        ret = np.multiply(ret, res)
+        return np.divide(np.array([self.Lx, self.Ly, self.Lz]), res)
+
+    def coordinates(self, indices):
+        """Returns Cartesian coordinates for an array of section, row and
+        column *indices* with shape (n, 3)."""
+
+        indices = np.asarray(indices)
+        ret = np.empty(indices.shape)
+        ret[..., self.mapc - 1] = indices[..., 2] + self.ncstart
+        ret[..., self.mapr - 1] = indices[..., 1] + self.nrstart
+        ret[..., self.maps - 1] = indices[..., 0] + self.nsstart
+        ret *= self._getResolution()
         return ret
 
-class TRNET:
+    def coordinate(self, sec, row, col ):
+        return self.coordinates([sec, row, col])
+
+    def samplecoordinates(self, n_samples, uniform=False):
+        """Returns Cartesian coordinates of *n_samples* voxels drawn using
+        :meth:`drawsamples`."""
+
+        return self.coordinates(self.drawsamples(n_samples, uniform))
+
+class TRNET(object):
+    """Topology representing network fitted to a density map with the neural
+    gas algorithm.  Samples can be processed one at a time, as in the
+    original algorithm, or in batches of *batch_size* samples, see
+    :meth:`run`.  Connections are kept as arrays of node pairs and ages
+    rather than a dense matrix, see :meth:`getAgeMatrix`."""
+
     def __init__(self, n_nodes):
         self.N = n_nodes
         self.W = np.empty([n_nodes, 3])
-        self.C = np.eye(n_nodes, n_nodes)
-        # test
-        self.V = np.array([])
-        
+        # connections between nodes i < j stored as keys i * N + j
+        self._edges = np.zeros(0, dtype=np.int64)
+        self._ages = np.zeros(0)
+
+    @property
+    def C(self):
+        """Dense matrix of connection ages with ones on the diagonal."""
+
+        return self.getAgeMatrix().toarray() + np.eye(self.N)
+
     def inputMap(self, emdmap, sample = 'density'):
         self.map = emdmap
         # initialize the positions of nodes
-        for i in range(self.N):
-            if sample == 'density':
-                p = self.map.drawsample()
-            elif sample == 'uniform':
-                p = self.map.drawsample_uniform()
-            elif sample == 'center':
-                p = self.map.center()
-            else:
-                p = (0, 0, 0)
-            self.W[i, :] = self.map.coordinate(p[0], p[1], p[2])
-        
-    def runOnce(self, t, l, ep, T, c=0):
-        # draw a point from the map
-        p = self.map.drawsample()
-        v = self.map.coordinate(p[0], p[1], p[2])
-        if len(self.V) == 0:
-            self.V = v
+        if sample == 'density':
+            self.W[:] = self.map.samplecoordinates(self.N)
+        elif sample == 'uniform':
+            self.W[:] = self.map.samplecoordinates(self.N, uniform=True)
+        elif sample == 'center':
+            self.W[:] = self.map.coordinate(*self.map.center())
         else:
-            self.V = np.vstack((self.V, v))
-        
-        # calc the squared distances \\ws - v\\^2
-        D = v - self.W
-        sD = np.empty(self.N)
-        for i in range(self.N):
-            d = D[i, :]
-            sD[i] = np.dot(d,d)
-        
+            self.W[:] = self.map.coordinate(0, 0, 0)
+
+    def _runBatch(self, V, l, ep, T, c=0):
+        """Move nodes towards samples *V* (an array of shape (n, 3)) and
+        refresh connections between the closest pairs of nodes."""
+
+        N = self.N
+        # calc the squared distances \\ws - v\\^2 for all samples
+        sD = ((V ** 2).sum(1)[:, np.newaxis] + (self.W ** 2).sum(1)
+              - 2 * np.dot(V, self.W.T))
+
         # calc the closeness rank k's
-        I = np.argsort(sD)
+        I = np.argsort(sD, axis=1)
         K = np.empty(I.shape)
-        K[I] = range(len(I))       
-        
-        # move the nodes
-        if c == 0:
-            K = K[:, np.newaxis]
-            self.W += ep * np.exp(-K/l) * D
-        else:
+        K[np.arange(len(V))[:, np.newaxis], I] = np.arange(N)
+
+        # move the nodes, compounding the steps towards each sample
+        E = ep * np.exp(-K/l)
+        if c != 0:
             kc = - l * np.log(c/ep)
-            idx = K < kc
-            K = K[:, np.newaxis]
-            self.W[idx, :] += ep * np.exp(-K[idx]/l) * D[idx, :]
-            
-        
+            E[K >= kc] = 0
+        if len(V) == 1:
+            self.W += E[0][:, np.newaxis] * (V[0] - self.W)
+        else:
+            total = E.sum(0)
+            moved = total > 0
+            alpha = -np.expm1(np.log1p(-E[:, moved]).sum(0))
+            M = np.dot(E[:, moved].T, V) / total[moved, np.newaxis]
+            self.W[moved] += alpha[:, np.newaxis] * (M - self.W[moved])
+
         if T>=0:
             # search for i0 and i1
-            i0 = I[0]
-            i1 = I[1]
-            
+            i0 = I[:, 0]
+            i1 = I[:, 1]
+
+            # age connections of winners in bulk
+            edges, ages = self._edges, self._ages
+            if len(edges):
+                wins = np.bincount(i0, minlength=N)
+                ages += wins[edges // N] + wins[edges % N]
+
             # refresh connections
-            for i in range(self.N):
-                if i == i1:
-                    self.C[i0, i] = 1
-                    self.C[i, i0] = 1
-                elif i!=i0 and self.C[i0, i] > 0:
-                    self.C[i0, i] = self.C[i0, i] + 1
-                    if self.C[i0, i] > T:
-                        self.C[i0, i] = 0
-                    self.C[i, i0] = self.C[i0, i]
+            new = np.unique(np.minimum(i0, i1) * N + np.maximum(i0, i1))
+            edges = np.union1d(edges, new)
+            if len(edges) != len(ages):
+                ages_ = np.zeros(len(edges))
+                ages_[np.searchsorted(edges, self._edges)] = ages
+                ages = ages_
+            ages[np.searchsorted(edges, new)] = 1
+
+            keep = ages <= T
+            self._edges, self._ages = edges[keep], ages[keep]
+
+    def runOnce(self, t, l, ep, T, c=0):
+        # draw a point from the map
+        v = self.map.samplecoordinates(1)
+        self._runBatch(v, l, ep, T, c)
                 
     def run(self, tmax = 200, li = 0.2, lf = 0.01, ei = 0.3,
-            ef = 0.05, Ti = 0.1, Tf = 2, c = 0, calcC = False):
+            ef = 0.05, Ti = 0.1, Tf = 2, c = 0, calcC = False,
+            batch_size = 1):
+        """Fit nodes to the map using *tmax* times number of nodes samples.
+        When *batch_size* is larger than 1, samples are drawn in batches and
+        distances and ranks are calculated for the whole batch at once.  Node
+        moves towards samples of a batch are compounded as if they were made
+        one after another with fixed ranks."""
+
         tmax = int(tmax * self.N)
         li = li * self.N
         if calcC:
             Ti = Ti * self.N
             Tf = Tf * self.N        
-        for t in range(1, tmax + 1):
+        batch_size = max(1, int(batch_size))
+        for t in range(1, tmax + 1, batch_size):
             # calc the parameters
             tt = float(t) / tmax
             l = li * np.power(lf / li, tt)
@@ -456,7 +575,8 @@ class TRNET:
             else:
                 T = -1
             # run once
-            self.runOnce(t, l, ep, T, c)
+            n = min(batch_size, tmax + 1 - t)
+            self._runBatch(self.map.samplecoordinates(n), l, ep, T, c)
             
             #if t % 1000 == 0:
             #    print str(t) + " steps have been run"
@@ -478,6 +598,42 @@ class TRNET:
             
             #if t % 1000 == 0:
             #    print str(t) + " steps have been run"
-        
+
+    def calcQuantizationErrors(self, n_samples=None, batch_size=1000):
+        """Returns root mean square distances of nodes to map samples that
+        are closest to them, which measures how well each node is placed.
+        *n_samples* samples are drawn from the map, default is 10 times the
+        number of nodes.  Nodes that are closest to no samples get **nan**."""
+
+        if n_samples is None:
+            n_samples = 10 * self.N
+        sums = np.zeros(self.N)
+        counts = np.zeros(self.N)
+        w2 = (self.W ** 2).sum(1)
+        for i in range(0, int(n_samples), batch_size):
+            V = self.map.samplecoordinates(min(batch_size, n_samples - i))
+            sD = (V ** 2).sum(1)[:, np.newaxis] + w2 - 2 * np.dot(V, self.W.T)
+            i0 = sD.argmin(1)
+            sums += np.bincount(i0, np.maximum(sD[np.arange(len(V)), i0], 0),
+                                minlength=self.N)
+            counts += np.bincount(i0, minlength=self.N)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(sums / counts)
+
+    def getAgeMatrix(self):
+        """Returns a sparse matrix containing ages of connections."""
+
+        from scipy.sparse import coo_matrix
+
+        i, j = self._edges // self.N, self._edges % self.N
+        ages = coo_matrix((np.concatenate([self._ages, self._ages]),
+                           (np.concatenate([i, j]), np.concatenate([j, i]))),
+                          shape=(self.N, self.N))
+        return ages.tocsr()
+
     def outputEdges(self):
-        return self.C > 0
+        C = np.eye(self.N, dtype=bool)
+        i, j = self._edges // self.N, self._edges % self.N
+        C[i, j] = C[j, i] = True
+        return C
@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 """This module defines functions for handling local PDB folders."""
 
-from glob import glob, iglob
+import os
+import re
+import json
+from time import time
+from hashlib import md5
 from os.path import sep as pathsep
 from os.path import abspath, isdir, isfile, join, split, splitext, normpath
 
 from prody import LOGGER, SETTINGS
 from prody.utilities import makePath, gunzip, relpath, copyFile, isWritable
-from prody.utilities import sympath
+from prody.utilities import sympath, USERHOME
 
 from . import wwpdb
 from .wwpdb import checkIdentifiers, fetchPDBviaFTP, fetchPDBviaHTTP
@@ -17,6 +21,206 @@ __all__ = ['pathPDBFolder', 'pathPDBMirror',
            'fetchPDB', 'fetchPDBfromMirror',
            'iterPDBFilenames', 'findPDBFiles']
 
+_CATALOG_PATH = None
+_CATALOG_MINSIZE = 1000
+_CATALOGS = {}
+
+_PDB_FILENAME = re.compile(r'^(.+)\.(pdb|ent|cif|xml)(\.gz)?$', re.IGNORECASE)
+
+
+def _pathCatalog(path, divided):
+    """Returns name of the file that stores the catalog of *path*, which is
+    in :file:`pdbcatalogs` folder of the package path, or **None**."""
+
+    folder = _CATALOG_PATH
+    if folder is None:
+        folder = SETTINGS.get('package_path')
+        if folder is None:
+            if USERHOME is None:
+                return None
+            folder = join(USERHOME, '.prody')
+        folder = join(folder, 'pdbcatalogs')
+    key = '{0}:{1}'.format(path, int(bool(divided))).encode('utf-8')
+    return join(folder, md5(key).hexdigest() + '.json')
+
+
+class _PDBCatalog(object):
+
+    """Catalog of PDB files in a folder, or in two-letter subfolders of a
+    folder with the divided structure of wwPDB servers.  Identifiers are
+    mapped to file names, extensions, and compression.  A folder is scanned
+    again only when its modification time changes, and catalogs of large
+    folders are saved as JSON files in the package path so that they persist
+    between sessions."""
+
+    def __init__(self, path, divided=False):
+
+        self._path = path
+        self._divided = divided
+        self._subfolders = (None, [])
+        self._folders = {}
+        self._dirty = False
+
+        filename = _pathCatalog(path, divided)
+        if filename is not None and isfile(filename):
+            try:
+                with open(filename) as inp:
+                    self._load(json.load(inp))
+            except Exception as err:
+                self._subfolders = (None, [])
+                self._folders = {}
+                LOGGER.debug('PDB catalog {0} could not be read ({1}).'
+                             .format(filename, str(err)))
+
+    def _load(self, catalog):
+        """Set catalog contents from *catalog* read from a JSON file.  Folders
+        and file names that could not have been listed in the catalog folder
+        are ignored."""
+
+        if catalog['path'] != self._path or \
+                catalog['divided'] != self._divided:
+            return
+        mtime, subfolders = catalog['subfolders']
+        subfolders = [str(name) for name in subfolders
+                      if name and pathsep not in name and name != '..']
+        self._subfolders = (mtime, subfolders)
+        for folder, (mtime, files) in catalog['folders'].items():
+            if folder and (not self._divided or folder not in subfolders):
+                continue
+            entries = {}
+            for pdb, items in files.items():
+                for filename, ext, gz in items:
+                    match = _PDB_FILENAME.match(filename)
+                    if match is None or pathsep in filename or \
+                            (ext, gz) != (match.group(2).lower(),
+                                          match.group(3) is not None):
+                        raise ValueError('invalid entry ' + repr(filename))
+                    entries.setdefault(str(pdb), []).append(
+                        (str(filename), str(ext), bool(gz)))
+            self._folders[str(folder)] = (mtime, entries)
+
+    def _getMTime(self, path):
+
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        # folders modified within the resolution of file system clocks are
+        # scanned again on the next lookup
+        if time() - mtime < 2:
+            return -1
+        return mtime
+
+    def _update(self, folder):
+        """Returns catalog of *folder*, after scanning it if it was modified
+        since it was last scanned."""
+
+        path = join(self._path, folder)
+        mtime = self._getMTime(path)
+        current = self._folders.get(folder)
+        if current is not None and mtime is not None and mtime != -1 and \
+                current[0] == mtime:
+            return current[1]
+
+        files = {}
+        if mtime is not None:
+            for filename in os.listdir(path):
+                match = _PDB_FILENAME.match(filename)
+                if match is None or filename.startswith('.'):
+                    continue
+                pdb, ext, gz = match.groups()
+                if len(pdb) == 7 and pdb.startswith('pdb'):
+                    pdb = pdb[3:]
+                files.setdefault(pdb, []).append((filename, ext.lower(),
+                                                  gz is not None))
+            for entries in files.values():
+                entries.sort()
+
+        if current is None or current[0] != mtime or current[1] != files:
+            self._dirty = True
+        self._folders[folder] = (mtime, files)
+        return files
+
+    def _listFolders(self):
+        """Returns folders of the catalog."""
+
+        if not self._divided:
+            return ['']
+
+        mtime = self._getMTime(self._path)
+        if mtime is None:
+            self._subfolders = (None, [])
+        elif mtime == -1 or mtime != self._subfolders[0]:
+            subfolders = sorted(name for name in os.listdir(self._path)
+                                if isdir(join(self._path, name)))
+            if subfolders != self._subfolders[1]:
+                self._dirty = True
+            self._subfolders = (mtime, subfolders)
+        return self._subfolders[1]
+
+    def find(self, pdb, exts=('pdb', 'ent'), compressed=None):
+        """Returns path of a file for identifier *pdb* with one of *exts*
+        extensions relative to the catalog folder, or **None**."""
+
+        folder = pdb[1:3] if self._divided else ''
+        for rescan in (False, True):
+            if rescan:
+                self._folders.pop(folder, None)
+            files = self._update(folder)
+            for filename, ext, gz in reversed(files.get(pdb, ())):
+                if ext in exts and (compressed is None or gz == compressed):
+                    if isfile(join(self._path, folder, filename)):
+                        return join(folder, filename)
+                    # a file removed without changing folder mtime
+                    break
+            else:
+                return
+
+    def iterFilenames(self, exts=('pdb', 'ent'), compressed=None):
+        """Yield identifiers and paths of files with one of *exts* extensions
+        relative to the catalog folder."""
+
+        for folder in self._listFolders():
+            for pdb, entries in self._update(folder).items():
+                for filename, ext, gz in entries:
+                    if ext in exts and (compressed is None or
+                                        gz == compressed):
+                        yield pdb, join(folder, filename)
+
+    def save(self):
+        """Save the catalog in the package path, if it is changed and
+        large."""
+
+        if not self._dirty:
+            return
+        self._dirty = False
+        size = sum(len(files) for _, files in self._folders.values())
+        filename = _pathCatalog(self._path, self._divided)
+        if size < _CATALOG_MINSIZE or filename is None:
+            return
+        try:
+            makePath(split(filename)[0])
+            with open(filename, 'w') as out:
+                json.dump({'path': self._path,
+                           'divided': self._divided,
+                           'subfolders': self._subfolders,
+                           'folders': self._folders}, out)
+        except (IOError, OSError) as err:
+            LOGGER.debug('PDB catalog {0} could not be saved ({1}).'
+                         .format(filename, str(err)))
+
+
+def _getCatalog(path, divided=False):
+    """Returns the catalog of PDB files in *path*."""
+
+    key = (abspath(path), bool(divided))
+    try:
+        catalog = _CATALOGS[key]
+    except KeyError:
+        catalog = _CATALOGS[key] = _PDBCatalog(*key)
+    return catalog
+
+
 def pathPDBFolder(folder=None, divided=False):
     """Returns or specify local PDB folder for storing PDB files downloaded from
     `wwPDB <http://www.wwpdb.org/>`_ servers.  Files stored in this folder can
@@ -129,25 +333,23 @@ def fetchPDBfromMirror(*pdb, **kwargs):
     else:
         identifiers = list(pdb)
 
+    suffix = ''
     if format == 'pdb':
         ftp_divided = 'data/structures/divided/pdb'
-        ftp_pdbext = '.ent.gz'
-        ftp_prefix = 'pdb'
+        ftp_pdbext = 'ent'
         extension = '.pdb'
     elif format == 'xml':
         if bool(kwargs.pop('noatom', False)):
             ftp_divided = 'data/structures/divided/XML-noatom'
-            ftp_pdbext = '-noatom.xml.gz'
+            suffix = '-noatom'
             extension = '-noatom.xml'
         else:
             ftp_divided = 'data/structures/divided/XML'
-            ftp_pdbext = '.xml.gz'
             extension = '.xml'
-        ftp_prefix = ''
+        ftp_pdbext = 'xml'
     elif format == 'cif':
         ftp_divided = 'data/structures/divided/mmCIF'
-        ftp_pdbext = '.cif.gz'
-        ftp_prefix = ''
+        ftp_pdbext = 'cif'
         extension = '.cif'
     else:
         if format:
@@ -162,6 +364,7 @@ def fetchPDBfromMirror(*pdb, **kwargs):
         ftp_divided = ''
     else:
         ftp_divided = join(*ftp_divided.split('/'))
+    catalog = _getCatalog(join(mirror, ftp_divided), divided=True)
     folder = kwargs.get('folder')
     compressed = kwargs.get('compressed', True)
     filenames = []
@@ -172,9 +375,9 @@ def fetchPDBfromMirror(*pdb, **kwargs):
         if pdb is None:
             append(None)
             continue
-        fn = join(mirror, ftp_divided, pdb[1:3],
-                  ftp_prefix + pdb + ftp_pdbext)
-        if isfile(fn):
+        fn = catalog.find(pdb + suffix, (ftp_pdbext,), compressed=True)
+        if fn is not None:
+            fn = join(mirror, ftp_divided, fn)
             if folder or not compressed:
                 if compressed:
                     fn = copyFile(fn, join(folder or '.',
@@ -186,6 +389,7 @@ def fetchPDBfromMirror(*pdb, **kwargs):
         else:
             append(None)
             failure += 1
+    catalog.save()
 
     if len(identifiers) == 1:
         fn = filenames[0]
@@ -206,7 +410,13 @@ def fetchPDB(*pdb, **kwargs):
     is set **True**, files will be copied into *folder*.  If *compressed* is
     **False**, all files will be decompressed.  See :func:`pathPDBFolder` and
     :func:`pathPDBMirror` for managing local resources, :func:`.fetchPDBviaFTP`
-    and :func:`.fetchPDBviaFTP` for downloading files from PDB servers."""
+    and :func:`.fetchPDBviaFTP` for downloading files from PDB servers.
+
+    Identifiers are looked up in catalogs of folders that map identifiers to
+    file names, so that folders are not listed for every call.  A folder is
+    scanned again only when it is modified, and catalogs of folders with more
+    than 1000 PDB files are saved in :file:`pdbcatalogs` folder of the package
+    path to be reused in later sessions."""
 
     if len(pdb) == 1 and isinstance(pdb[0], list):
         pdb = pdb[0]
@@ -220,20 +430,22 @@ def fetchPDB(*pdb, **kwargs):
     compressed = kwargs.get('compressed')
 
     # check *folder* specified by the user, usually pwd ('.')
-    filedict = findPDBFiles(folder, compressed=compressed)
+    catalog = _getCatalog(folder)
 
     filenames = []
     not_found = []
     exists = 0
     for i, pdb in enumerate(identifiers):
+        fn = None if pdb is None else catalog.find(pdb, compressed=compressed)
         if pdb is None:
             filenames.append(None)
-        elif pdb in filedict:
-            filenames.append(filedict[pdb])
+        elif fn is not None:
+            filenames.append(normpath(join(folder, fn)))
             exists += 1
         else:
             filenames.append(None)
             not_found.append((i, pdb))
+    catalog.save()
 
     if not not_found:
         if len(filenames) == 1:
@@ -248,11 +460,11 @@ def fetchPDB(*pdb, **kwargs):
                       'specify another folder'.format(folder))
 
     if compressed is not None and not compressed:
-        filedict = findPDBFiles(folder, compressed=True)
         not_found, decompress = [], not_found
         for i, pdb in decompress:
-            if pdb in filedict:
-                fn = filedict[pdb]
+            fn = catalog.find(pdb, compressed=True)
+            if fn is not None:
+                fn = normpath(join(folder, fn))
                 filenames[i] = gunzip(fn, splitext(fn)[0])
             else:
                 not_found.append((i, pdb))
@@ -373,9 +585,9 @@ def iterPDBFilenames(path=None, sort=False, unique=True, **kwargs):
     mirror (see :func:`.pathPDBMirror`).  When *unique* is **True**, files
     one of potentially identical files will be yielded (e.g. :file:`1mkp.pdb`
     and :file:`pdb1mkp.ent.gz1`).  :file:`.pdb` and :file:`.ent` extensions,
-    and compressed files are considered."""
-
-    from re import compile, IGNORECASE
+    and compressed files are considered.  Files are listed from a catalog of
+    the folder that is updated when the folder is modified, see
+    :func:`.fetchPDB`."""
 
     if path is None or kwargs.get('mirror') is True:
         if path is None:
@@ -383,34 +595,27 @@ def iterPDBFilenames(path=None, sort=False, unique=True, **kwargs):
         if path is None:
             raise ValueError('path must be specified or PDB mirror path '
                              'must be set')
+        path = join(path, 'data', 'structures', 'divided', 'pdb')
+        catalog = _getCatalog(path, divided=True)
+        pdbs = [join(path, fn) for pdb, fn in
+                catalog.iterFilenames(('ent',), compressed=True)]
+        catalog.save()
         if sort:
-            pdbs = glob(join(path, 'data/structures/divided/pdb/',
-                        '*/*.ent.gz'))
-            pdbs.sort(reverse=kwargs.get('reverse'))
-        else:
-            pdbs = iglob(join(path, 'data/structures/divided/pdb/',
-                        '*/*.ent.gz'))
+            pdbs.sort(reverse=bool(kwargs.get('reverse')))
         for fn in pdbs:
             yield fn
     else:
         unique=bool(unique)
         if unique:
             yielded = set()
-        compressed = kwargs.get('compressed')
-        if compressed is None:
-            pdbext = compile('\.(pdb|ent)(\.gz)?$', IGNORECASE)
-        elif compressed:
-            pdbext = compile('\.(pdb|ent)\.gz$', IGNORECASE)
-        else:
-            pdbext = compile('\.(pdb|ent)$', IGNORECASE)
-        pdbs = [pdb for pdb in iglob(join(path, '*')) if pdbext.search(pdb)]
+        catalog = _getCatalog(path)
+        pdbs = [(join(path, fn), pdb) for pdb, fn in
+                catalog.iterFilenames(compressed=kwargs.get('compressed'))]
+        catalog.save()
         if sort:
-            pdbs.sort(reverse=kwargs.get('reverse'))
-        for fn in pdbs:
+            pdbs.sort(reverse=bool(kwargs.get('reverse')))
+        for fn, pdb in pdbs:
             if unique:
-                pdb = splitext(splitext(split(fn)[1])[0])[0]
-                if len(pdb) == 7 and pdb.startswith('pdb'):
-                    pdb = pdb[3:]
                 if pdb in yielded:
                     continue
                 else:
@@ -613,6 +613,8 @@ def _parsePDBLines(atomgroup, lines, split, model, chain, subset,
                     np.zeros(asize, ATOMIC_FIELDS['icode'].dtype)))
                 serials = np.concatenate((serials,
                     np.zeros(asize, ATOMIC_FIELDS['serial'].dtype)))
+                charges = np.concatenate((charges,
+                    np.zeros(asize, ATOMIC_FIELDS['charge'].dtype)))
                 if isPDB:
                     bfactors = np.concatenate((bfactors,
                         np.zeros(asize, ATOMIC_FIELDS['beta'].dtype)))
@@ -629,8 +631,6 @@ def _parsePDBLines(atomgroup, lines, split, model, chain, subset,
                         siguij = np.concatenate((siguij, np.zeros((asize, 6),
                             ATOMIC_FIELDS['siguij'].dtype)))
                 else:
-                    charges = np.concatenate((charges,
-                        np.zeros(asize, ATOMIC_FIELDS['charge'].dtype)))
                     radii = np.concatenate((radii,
                         np.zeros(asize, ATOMIC_FIELDS['radius'].dtype)))
         #elif startswith == 'END   ' or startswith == 'CONECT':
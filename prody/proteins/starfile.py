@@ -17,6 +17,7 @@ from prody import LOGGER, SETTINGS
 from .emdfile import parseEMD
 
 __all__ = ['parseSTAR', 'writeSTAR', 'parseImagesFromSTAR', 
+           'iterSTARLoops', 'parseSTARLoop',
            'StarDict', 'StarDataBlock', 'StarLoop',]
 
 
@@ -281,6 +282,181 @@ def parseSTARStream(stream):
     return finalDictionary, prog
 
 
+def _convertSTARColumn(column):
+    """Returns *column*, an array of strings, converted to integers or floats
+    when all of its entries can be interpreted as such."""
+
+    for dtype in (int, float):
+        try:
+            return column.astype(dtype)
+        except (ValueError, OverflowError):
+            pass
+    return column
+
+
+def _selectSTARRows(columns, rows):
+    """Returns *columns* with *rows* selected.  *rows* may be a slice, an
+    index or boolean array, or a callable that takes *columns* and returns
+    such an array."""
+
+    if rows is None or not columns:
+        return columns
+    if callable(rows):
+        rows = rows(columns)
+    if not isinstance(rows, slice):
+        rows = np.asarray(rows)
+    return dict((field, column[rows]) for field, column in columns.items())
+
+
+def iterSTARLoops(filename, fields=None, rows=None, chunk=100000):
+    """Yield ``(block, loop, columns)`` tuples for each loop in STAR file
+    *filename*, where *block* is the name of the data block, *loop* is the
+    index of the loop in that block, and *columns* is a :class:`dict` mapping
+    field names to :class:`~numpy.ndarray` instances.  Columns whose entries
+    are all numbers are converted to integer or float arrays, others are
+    kept as string arrays.
+
+    The file is read as a stream and loop rows are split and tabulated in
+    chunks, so only the requested columns are held in memory.
+
+    :arg filename: a filename, :file:`.gz` files are handled automatically
+    :type filename: str
+
+    :arg fields: names of fields to load, e.g. ``['_rlnImageName']``,
+        default is all fields in each loop
+    :type fields: list
+
+    :arg rows: rows to keep from each loop, a slice, an index or boolean
+        array, or a callable that takes *columns* and returns one of these,
+        e.g. ``lambda columns: columns['_rlnClassNumber'] == 1``
+    :type rows: slice, :class:`~numpy.ndarray`, callable
+
+    :arg chunk: number of lines tabulated at a time, default is 100000
+    :type chunk: int"""
+
+    if not os.path.isfile(filename) and os.path.isfile(filename + '.star'):
+        filename += '.star'
+    if not os.path.isfile(filename):
+        raise IOError('There is no file with that name.')
+
+    if fields is not None:
+        fields = set(fields)
+
+    state = {'block': None, 'loop': -1, 'fields': [], 'usecols': [],
+             'chunks': None, 'lines': [], 'data': False}
+
+    def tabulate():
+        lines = state['lines']
+        if not lines:
+            return
+        tokens = ''.join(lines).split()
+        n_fields = len(state['fields'])
+        if len(tokens) % n_fields:
+            raise TypeError('This file does not conform to the STAR file '
+                            'format. Loop {0} in data block {1} has rows with '
+                            'a wrong number of entries.'
+                            .format(state['loop'], state['block']))
+        table = np.array(tokens).reshape((-1, n_fields))
+        for i, chunks in zip(state['usecols'], state['chunks']):
+            chunks.append(table[:, i].copy())
+        state['lines'] = []
+
+    def finalize():
+        tabulate()
+        chunks = state['chunks']
+        state['chunks'] = None
+        if chunks is None or not state['usecols']:
+            return None
+        columns = {}
+        for i, column in zip(state['usecols'], chunks):
+            if column:
+                column = np.concatenate(column)
+            else:
+                column = np.array([], dtype=str)
+            columns[state['fields'][i]] = _convertSTARColumn(column)
+        return state['block'], state['loop'], _selectSTARRows(columns, rows)
+
+    # text streams of gzipped files cannot be iterated over, so lines are
+    # read in binary mode and decoded
+    stream = openFile(filename, 'rb')
+    try:
+        for line in stream:
+            if not isinstance(line, str):
+                line = line.decode()
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+
+            if stripped.startswith('data_'):
+                result = finalize()
+                if result is not None:
+                    yield result
+                state['block'] = stripped[5:]
+                state['loop'] = -1
+
+            elif stripped.startswith('loop_'):
+                result = finalize()
+                if result is not None:
+                    yield result
+                state['loop'] += 1
+                state['fields'] = []
+                state['usecols'] = []
+                state['chunks'] = []
+                state['data'] = False
+
+            elif stripped.startswith('_'):
+                field = stripped.split()[0]
+                if state['chunks'] is not None and not state['data']:
+                    if fields is None or field in fields:
+                        state['usecols'].append(len(state['fields']))
+                        state['chunks'].append([])
+                    state['fields'].append(field)
+                else:
+                    # a key-value pair of the data block ends the loop
+                    result = finalize()
+                    if result is not None:
+                        yield result
+
+            elif state['chunks'] is not None:
+                state['lines'].append(line)
+                state['data'] = True
+                if len(state['lines']) >= chunk:
+                    tabulate()
+
+            else:
+                raise TypeError('This file does not conform to the STAR file '
+                                'format. There is a problem with line:\n '
+                                '{0}'.format(line))
+
+        result = finalize()
+        if result is not None:
+            yield result
+    finally:
+        stream.close()
+
+
+def parseSTARLoop(filename, block=None, loop=0, **kwargs):
+    """Returns a :class:`dict` mapping field names to column arrays for
+    *loop* in data *block* of STAR file *filename*.  See
+    :func:`.iterSTARLoops` for *fields*, *rows* and *chunk* keyword
+    arguments.  *rows* are selected from this loop only.
+
+    :arg block: name of the data block, default is the first block that
+        contains loops
+    :type block: str
+
+    :arg loop: index of the loop in the data block, default is 0
+    :type loop: int"""
+
+    rows = kwargs.pop('rows', None)
+    for title, index, columns in iterSTARLoops(filename, **kwargs):
+        if (block is None or title == block) and index == loop:
+            return _selectSTARRows(columns, rows)
+
+    raise ValueError('There is no loop {0} in data block {1} of {2}.'
+                     .format(loop, repr(block), filename))
+
+
 def writeSTAR(filename, starDict):
     """Writes a STAR file from a dictionary containing data
     such as that parsed from a Relion STAR file.
@@ -290,24 +466,37 @@ def writeSTAR(filename, starDict):
 
     :arg dictionary: a dictionary in STAR format
         This should have nested entries starting with data blocks then loops/tables then
-        field names and finally data.
+        field names and finally data. A loop may also be given as a dictionary
+        mapping field names to column arrays, such as those yielded by
+        :func:`.iterSTARLoops`.
     """
 
+    if isinstance(starDict, StarDict):
+        starDict = starDict.getDict()
+
     star = open(filename, 'w')
 
     for dataBlockKey in starDict:
         star.write('\ndata_' + dataBlockKey + '\n')
         for loopNumber in starDict[dataBlockKey]:
+            loop = starDict[dataBlockKey][loopNumber]
+            if 'fields' in loop and 'data' in loop:
+                fields = [loop['fields'][fieldNumber]
+                          for fieldNumber in loop['fields']]
+                data = loop['data']
+                columns = [[data[dataItemNumber][field] for dataItemNumber in data]
+                           for field in fields]
+            else:
+                fields = list(loop)
+                columns = [loop[field] for field in fields]
+
             star.write('\nloop_\n')
-            for fieldNumber in starDict[dataBlockKey][loopNumber]['fields']:
-                star.write('_' + starDict[dataBlockKey]
-                           [loopNumber]['fields'][fieldNumber] + '\n')
-            for dataItemNumber in starDict[dataBlockKey][loopNumber]['data']:
-                for fieldNumber in starDict[dataBlockKey][loopNumber]['fields']:
-                    currentField = starDict[dataBlockKey][loopNumber]['fields'][fieldNumber]
-                    star.write(starDict[dataBlockKey][loopNumber]
-                               ['data'][dataItemNumber][currentField] + ' ')
-                star.write('\n')
+            star.write(''.join('_' + field.lstrip('_') + '\n' for field in fields))
+            if not fields or not len(columns[0]):
+                continue
+            table = np.column_stack([np.asarray(column).astype(str)
+                                     for column in columns])
+            star.write(' \n'.join(map(' '.join, table.tolist())) + ' \n')
 
     star.close()
     return
@@ -17,7 +17,6 @@ from prody.sequence.sequence import Sequence
 from prody.atomic import Atomic
 from prody.measure import calcDistance
 
-from Bio import pairwise2
 import sys
 
 __all__ = ['calcShannonEntropy', 'buildMutinfoMatrix', 'calcMSAOccupancy',
@@ -1000,6 +999,7 @@ def alignSequenceToMSA(seq, msa, label, match=5, mismatch=-1, gap_opening=-10, g
     else:
         raise TypeError('The output from querying that label against msa is not a single sequence.')
 
+    from Bio import pairwise2
     alignment = pairwise2.align.globalms(sequence, str(refMsaSeq), \
                                          match, mismatch, gap_opening, gap_extension)
 
@@ -1028,6 +1028,7 @@ def alignSequenceToMSA(seq, msa, label, match=5, mismatch=-1, gap_opening=-10, g
 
 def alignTwoSequencesWithBiopython(seq1, seq2, match=5, mismatch=-1, gap_opening=-10, gap_extension=-1):
     
+    from Bio import pairwise2
     alignment = pairwise2.align.globalms(seq1, seq2, match, mismatch, gap_opening, gap_extension)
 
     seq_indices = [0]
@@ -6,13 +6,9 @@ from numbers import Integral
 from numpy import all, zeros, dtype, array, char, cumsum, ceil, reshape
 from numpy import where, sort, concatenate, vstack, isscalar, chararray
 
-from Bio import AlignIO
-from Bio import pairwise2
-from Bio.SubsMat import MatrixInfo as matlist
-
 from prody import LOGGER, PY3K
 from prody.atomic import Atomic
-from prody.utilities import toChararray
+from prody.utilities import toChararray, extendArray
 from .sequence import Sequence, splitSeqLabel
 
 import sys
@@ -39,6 +35,8 @@ class MSA(object):
         
         if labels is None:
             labels = [str(i+1) for i in range(numseq)]
+        else:
+            labels = list(labels)
 
         if PY3K:
             for i, label in enumerate(labels):
@@ -50,12 +48,19 @@ class MSA(object):
         mapping = kwargs.get('mapping')
         self._map(mapping)
         self._msa = msa
+        self._buffer = None
         self._title = str(title) or 'Unknown'
         self._split = bool(kwargs.get('split', True))
 
-    def _map(self, mapping=None):
+    def _map(self, mapping=None, start=0):
 
         labels = self._labels
+        if start:
+            mapping = self._mapping
+            for index in range(start, len(labels)):
+                self._mapLabel(labels[index], index)
+            return mapping
+
         if mapping is not None:
             try:
                 mapping['isdict']
@@ -72,18 +77,23 @@ class MSA(object):
         
         self._mapping = mapping = {}
         for index, label in enumerate(labels):
-            label = splitSeqLabel(label)[0]
-            try:
-                value = mapping[label]
-            except KeyError:
-                mapping[label] = index
-            else:
-                try:
-                    value.append(index)
-                except AttributeError:
-                    mapping[label] = [value, index]
+            self._mapLabel(label, index)
         return mapping
 
+    def _mapLabel(self, label, index):
+
+        mapping = self._mapping
+        label = splitSeqLabel(label)[0]
+        try:
+            value = mapping[label]
+        except KeyError:
+            mapping[label] = index
+        else:
+            try:
+                value.append(index)
+            except AttributeError:
+                mapping[label] = [value, index]
+
     def __str__(self):
 
         return 'MSA ' + self._title
@@ -102,6 +112,13 @@ class MSA(object):
 
         return len(self._msa)
 
+    def __getstate__(self):
+
+        # sequences are pickled without spare rows of their buffer
+        state = self.__dict__.copy()
+        state['_buffer'] = None
+        return state
+
     def __add__(self, other):
         """Concatenate two MSAs."""
 
@@ -238,9 +255,9 @@ class MSA(object):
     def extend(self, other):
         """Adds *other* to this MSA."""
 
-        A = self.getArray()
+        A = self._msa
         if isinstance(other, MSA):
-            B = other.getArray()
+            B = other._getArray()
             otherlabels = other._labels
         elif isinstance(other, Sequence):
             B = other.getArray()
@@ -254,18 +271,19 @@ class MSA(object):
             except:
                 raise ValueError('failed to add {1} to {0}'
                              .format(repr(self), repr(other)))
-        try:
-            AB = vstack((A, B))
-        except:
+        if A.ndim != B.ndim or A.shape[1:] != B.shape[1:]:
             raise ValueError('failed to add {1} to {0}: shapes do not match'
                              .format(repr(self), repr(other)))
 
-        labels = list(self._labels)
-        labels.extend(otherlabels)
+        # rows are appended to a buffer with spare capacity, so that
+        # extending an MSA one sequence at a time takes linear time
+        self._msa, self._buffer = extendArray(A, B, self._buffer)
 
-        self._msa = AB
-        self._labels = labels
-        self._map()
+        start = len(self._labels)
+        if isinstance(otherlabels, str):
+            otherlabels = [otherlabels]
+        self._labels.extend(otherlabels)
+        self._map(start=start)
 
     def isAligned(self):
         """Returns **True** if MSA is aligned."""
@@ -0,0 +1,136 @@
+"""This module contains unit tests for :mod:`~prody.chromatin.hic`."""
+
+import os
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+from scipy.sparse import issparse, diags
+
+from prody.chromatin import HiC, parseHiC, parseHiCStream, saveHiC, loadHiC
+from prody.chromatin import writeMap, VCnorm, SQRTVCnorm, ICEnorm
+from prody.utilities import createStringIO
+from prody.tests import unittest, TEMPDIR
+
+from prody import LOGGER
+
+LOGGER.verbosity = 'none'
+
+MAP = np.array([[5., 2., 0., 1., 0.],
+                [2., 4., 0., 3., 1.],
+                [0., 0., 0., 0., 0.],
+                [1., 3., 0., 6., 2.],
+                [0., 1., 0., 2., 3.]])
+BIN = 1000
+MASK = np.array([True, True, False, True, True])
+
+
+def _stream(text):
+
+    stream = createStringIO()
+    stream.write(text)
+    stream.seek(0)
+    return stream
+
+
+class TestHiC(unittest.TestCase):
+
+    def setUp(self):
+
+        self.hic = HiC('test', MAP, bin=BIN)
+        self.filename = os.path.join(TEMPDIR, 'prody_test_hic')
+
+    def testParseDense(self):
+
+        text = '\n'.join('\t'.join(str(v) for v in row) for row in MAP)
+        hic = parseHiCStream(_stream(text), title='dense')
+        self.assertEqual(hic.getTitle(), 'dense')
+        assert_array_equal(hic.getCompleteMap(), MAP)
+        assert_array_equal(hic.mask, MASK)
+
+    def testParseSparse(self):
+
+        I, J = np.nonzero(np.triu(MAP))
+        lines = ['{0} {1} {2}'.format(i * BIN, j * BIN, MAP[i, j])
+                 for i, j in zip(I, J)]
+        hic = parseHiCStream(_stream('\n'.join(lines)))
+        self.assertEqual(hic.bin, BIN)
+        assert_array_equal(hic.getCompleteMap(), MAP)
+
+    def testParseFile(self):
+
+        filename = writeMap(self.filename + '.txt', MAP, bin=BIN)
+        try:
+            hic = parseHiC(filename, title='file')
+        finally:
+            os.remove(filename)
+        assert_array_equal(hic.getCompleteMap(), MAP)
+
+    def testMap(self):
+
+        self.assertTrue(issparse(self.hic.map))
+        assert_array_equal(self.hic.map.toarray(), MAP[MASK][:, MASK])
+        self.assertIsInstance(self.hic.getTrimedMap(), np.ndarray)
+        assert_array_equal(self.hic.getTrimedMap(), MAP[MASK][:, MASK])
+        self.hic.masked = False
+        self.assertTrue(issparse(self.hic.map))
+        assert_array_equal(self.hic.map.toarray(), MAP)
+        self.assertIsInstance(self.hic.getCompleteMap(), np.ndarray)
+        self.assertTrue(issparse(self.hic.getCompleteMap(sparse=True)))
+        self.assertEqual(len(self.hic), 5)
+        self.assertEqual(self.hic[0, 1], 2.)
+
+    def testView(self):
+
+        for masked in (True, False):
+            self.hic.masked = masked
+            im = self.hic.view()
+            assert_array_equal(im.get_array(), self.hic.map.toarray())
+
+    def testNormalize(self):
+
+        for method in (VCnorm, SQRTVCnorm):
+            hic = HiC('test', MAP)
+            N = hic.normalize(method)
+            self.assertTrue(issparse(N))
+            assert_allclose(N.toarray(), method(MAP))
+            assert_allclose(hic.getCompleteMap(), method(MAP))
+            self.assertAlmostEqual(N.sum(), MAP.sum())
+
+    def testSaveAndLoad(self):
+
+        self.hic.setTitle('saved')
+        filename = saveHiC(self.hic, self.filename)
+        try:
+            self.assertEqual(filename, self.filename + '.hic.npz')
+            hic = loadHiC(filename)
+        finally:
+            os.remove(filename)
+        self.assertEqual(hic.getTitle(), 'saved')
+        self.assertEqual(hic.bin, BIN)
+        self.assertTrue(issparse(hic.getCompleteMap(sparse=True)))
+        assert_array_equal(hic.getCompleteMap(), MAP)
+        assert_array_equal(hic.mask, MASK)
+        assert_array_equal(hic.map.toarray(), self.hic.map.toarray())
+
+        filename = saveHiC(self.hic, self.filename, map=False)
+        try:
+            hic = loadHiC(filename)
+        finally:
+            os.remove(filename)
+        self.assertIsNone(hic.getCompleteMap())
+        assert_array_equal(hic.mask, MASK)
+
+    def testNormalizeLarge(self):
+
+        n_bins, width = 50000, 5
+        offsets = list(range(-width, width + 1))
+        band = diags([np.full(n_bins - abs(k), 10. / (1 + abs(k)))
+                      for k in offsets], offsets, format='csr')
+        hic = HiC('large', band, bin=BIN)
+        for method in (VCnorm, ICEnorm):
+            N = hic.normalize(method)
+            self.assertTrue(issparse(N))
+            self.assertTrue(issparse(hic.map))
+            self.assertEqual(N.shape, (n_bins, n_bins))
+            self.assertEqual(N.nnz, band.nnz)
+            self.assertAlmostEqual(N.sum() / band.sum(), 1.)
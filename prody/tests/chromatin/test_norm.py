@@ -0,0 +1,104 @@
+"""This module contains unit tests for :mod:`~prody.chromatin.norm`."""
+
+import os
+
+import numpy as np
+from numpy.testing import assert_allclose
+from scipy.sparse import csr_matrix, issparse
+
+from prody.chromatin import VCnorm, SQRTVCnorm, SCN, ICEnorm, Filenorm
+from prody.tests import unittest, TEMPDIR
+
+from prody import LOGGER
+
+LOGGER.verbosity = 'none'
+
+
+def _buildMap(n=30, seed=0):
+    """Returns a symmetric contact map with decaying contacts, zero entries,
+    and an unmapped locus."""
+
+    random = np.random.RandomState(seed)
+    I, J = np.indices((n, n))
+    M = random.poisson(50. / (1 + np.abs(I - J))).astype(float)
+    M = np.triu(M) + np.triu(M, 1).T
+    M[5, :] = M[:, 5] = 0
+    return M
+
+
+class TestNormalization(unittest.TestCase):
+
+    def setUp(self):
+
+        self.dense = _buildMap()
+        self.sparse = csr_matrix(self.dense)
+        self.filename = os.path.join(TEMPDIR, 'prody_test_norm.txt')
+
+    def assertSameNorm(self, method, **kwargs):
+
+        dense = method(self.dense, **kwargs)
+        sparse = method(self.sparse, **kwargs)
+        self.assertIsInstance(dense, np.ndarray)
+        self.assertTrue(issparse(sparse))
+        assert_allclose(sparse.toarray(), dense, rtol=1e-10, atol=1e-12)
+        return dense
+
+    def testVCnorm(self):
+
+        N = self.assertSameNorm(VCnorm)
+        sums = self.dense.sum(0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = np.nan_to_num(self.dense / np.outer(sums, sums))
+        assert_allclose(N, expected * self.dense.sum() / expected.sum())
+        self.assertAlmostEqual(N.sum(), self.dense.sum())
+
+    def testSQRTVCnorm(self):
+
+        N = self.assertSameNorm(SQRTVCnorm, total_count=None)
+        sums = np.sqrt(self.dense.sum(0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = np.nan_to_num(self.dense / np.outer(sums, sums))
+        assert_allclose(N, expected)
+
+    def testSCN(self):
+
+        N = self.assertSameNorm(SCN)
+        assert_allclose(N, N.T)
+        sums = N.sum(0)
+        self.assertEqual(sums[5], 0)
+        assert_allclose(np.delete(sums, 5), 1., rtol=1e-4)
+
+    def testICEnorm(self):
+
+        N = self.assertSameNorm(ICEnorm, tol=1e-8)
+        assert_allclose(N, N.T)
+        sums = N.sum(1)
+        self.assertEqual(sums[5], 0)
+        nonzero = np.delete(sums, 5)
+        assert_allclose(nonzero, nonzero.mean(), rtol=1e-6)
+        self.assertAlmostEqual(N.sum(), self.dense.sum())
+
+        # row sums are equal without rescaling, too
+        N = ICEnorm(self.sparse, total_count=None, max_loops=1000)
+        sums = np.delete(np.asarray(N.sum(1)).ravel(), 5)
+        assert_allclose(sums, sums.mean(), rtol=1e-4)
+
+    def testFilenorm(self):
+
+        factors = np.linspace(1., 3., len(self.dense))
+        np.savetxt(self.filename, factors)
+
+        N = self.assertSameNorm(Filenorm, filename=self.filename)
+        assert_allclose(N, self.dense / np.outer(factors, factors))
+
+        N = self.assertSameNorm(Filenorm, filename=self.filename,
+                                expected=True)
+        I, J = np.indices(self.dense.shape)
+        assert_allclose(N, self.dense / factors[np.abs(I - J)])
+
+        self.assertRaises(IOError, Filenorm, self.dense)
+
+    def tearDown(self):
+
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
@@ -0,0 +1,150 @@
+"""This module contains unit tests for :mod:`~prody.chromatin.straw`."""
+
+import zlib
+import struct
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from prody.chromatin.straw import decodeBlock, _decompressBlock
+from prody.tests import unittest
+
+
+def _decodeRecords(uncompressedBytes, version):
+    """Decodes a block one record at a time, as :func:`.readBlock` did before
+    blocks were decoded with structured arrays, except that missing float
+    values of dense blocks are detected as NaN."""
+
+    nRecords = struct.unpack('<i', uncompressedBytes[0:4])[0]
+    v = []
+    if version < 7:
+        for i in range(nRecords):
+            binX, binY, counts = struct.unpack(
+                '<iif', uncompressedBytes[(12*i+4):(12*i+16)])
+            v.append((binX, binY, counts))
+        return v
+
+    binXOffset, binYOffset, useShort, type_ = \
+        struct.unpack('<iibb', uncompressedBytes[4:14])
+    if type_ == 1:
+        rowCount = struct.unpack('<h', uncompressedBytes[14:16])[0]
+        temp = 16
+        for i in range(rowCount):
+            y, colCount = struct.unpack('<hh', uncompressedBytes[temp:temp+4])
+            temp = temp + 4
+            for j in range(colCount):
+                x = struct.unpack('<h', uncompressedBytes[temp:temp+2])[0]
+                temp = temp + 2
+                if useShort == 0:
+                    counts = struct.unpack('<h',
+                                           uncompressedBytes[temp:temp+2])[0]
+                    temp = temp + 2
+                else:
+                    counts = struct.unpack('<f',
+                                           uncompressedBytes[temp:temp+4])[0]
+                    temp = temp + 4
+                v.append((binXOffset + x, binYOffset + y, counts))
+    elif type_ == 2:
+        nPts, w = struct.unpack('<ih', uncompressedBytes[14:20])
+        temp = 20
+        for i in range(nPts):
+            row = int(i / w)
+            col = i - row * w
+            if useShort == 0:
+                c = struct.unpack('<h', uncompressedBytes[temp:temp+2])[0]
+                temp = temp + 2
+                if c != -32768:
+                    v.append((binXOffset + col, binYOffset + row, c))
+            else:
+                c = struct.unpack('<f', uncompressedBytes[temp:temp+4])[0]
+                temp = temp + 4
+                if c == c:
+                    v.append((binXOffset + col, binYOffset + row, c))
+    return v
+
+
+def _encodeRecords(records):
+
+    data = struct.pack('<i', len(records))
+    for binX, binY, counts in records:
+        data += struct.pack('<iif', binX, binY, counts)
+    return data
+
+
+def _encodeRows(rows, useShort, binXOffset=100, binYOffset=200):
+    """Encodes *rows*, a list of ``(y, [(x, counts), ...])``, as a list of
+    rows block."""
+
+    data = b''
+    nRecords = 0
+    for y, cols in rows:
+        data += struct.pack('<hh', y, len(cols))
+        for x, counts in cols:
+            data += struct.pack('<h' + ('h' if useShort == 0 else 'f'),
+                                x, counts)
+        nRecords += len(cols)
+    header = struct.pack('<iiibbh', nRecords, binXOffset, binYOffset,
+                         useShort, 1, len(rows))
+    return header + data
+
+
+def _encodeDense(values, w, useShort, binXOffset=100, binYOffset=200):
+
+    fmt = '<{0}{1}'.format(len(values), 'h' if useShort == 0 else 'f')
+    header = struct.pack('<iiibbih', len(values), binXOffset, binYOffset,
+                         useShort, 2, len(values), w)
+    return header + struct.pack(fmt, *values)
+
+
+class TestDecodeBlock(unittest.TestCase):
+
+    def assertDecoded(self, data, version, n_records):
+
+        binX, binY, counts = decodeBlock(data, version)
+        self.assertEqual(binX.dtype, np.int64)
+        self.assertEqual(binY.dtype, np.int64)
+        self.assertEqual(counts.dtype, float)
+        expected = _decodeRecords(data, version)
+        self.assertEqual(len(expected), n_records)
+        assert_array_equal(np.column_stack([binX, binY, counts]),
+                           np.array(expected, dtype=float).reshape((-1, 3)))
+
+        # blocks read with a thread pool are decoded the same way
+        for array, other in zip((binX, binY, counts),
+                                _decompressBlock((zlib.compress(data),
+                                                  version))):
+            assert_array_equal(array, other)
+
+    def testRecords(self):
+
+        records = [(0, 0, 1.5), (3, 7, 2.), (100000, 2, 0.25)]
+        self.assertDecoded(_encodeRecords(records), 6, 3)
+        self.assertDecoded(_encodeRecords([]), 6, 0)
+
+    def testRowsShort(self):
+
+        rows = [(0, [(0, 5), (3, -2), (7, 32767)]), (4, []), (9, [(1, 1)])]
+        self.assertDecoded(_encodeRows(rows, 0), 8, 4)
+
+    def testRowsFloat(self):
+
+        rows = [(2, [(0, 0.5), (1, 1e6)]), (5, [(6, 3.25)])]
+        self.assertDecoded(_encodeRows(rows, 1), 8, 3)
+
+    def testDenseShort(self):
+
+        values = [1, -32768, 3, 4, -32768, 6, 7]
+        self.assertDecoded(_encodeDense(values, 3, 0), 8, 5)
+
+    def testDenseFloat(self):
+
+        values = [0.5, float('nan'), 2.5, 4., float('nan'), float('nan')]
+        self.assertDecoded(_encodeDense(values, 2, 1), 8, 3)
+
+    def testEmpty(self):
+
+        self.assertDecoded(_encodeRows([], 0), 8, 0)
+        self.assertDecoded(_encodeDense([], 4, 1), 8, 0)
+        binX, binY, counts = decodeBlock(struct.pack('<iiibb', 0, 0, 0, 0, 3),
+                                         8)
+        self.assertEqual(len(binX) + len(binY) + len(counts), 0)
@@ -118,6 +118,9 @@ DATA_FILES = {
     'RTER': {
         'file': 'pdbRTER.pdb'
     },
+    'star': {
+        'file': 'star_particles.star'
+    },
 }
 
 
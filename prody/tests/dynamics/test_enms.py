@@ -189,6 +189,22 @@ class TestGNMResults(testGNMBase):
         hitTime = gnm.getHitTime()
         commuteTime = gnm.getCommuteTime()
 
+        K = gnm.getKirchhoff()
+        D = np.diag(K)
+        K_inv = np.linalg.pinv(K)
+        c = np.dot(K_inv, D)
+        expected = (D.sum() * (np.diag(K_inv)[:, np.newaxis] - K_inv) +
+                    c - c[:, np.newaxis])
+        assert_allclose(hitTime, expected, rtol=1e-6, atol=1e-6)
+        assert_allclose(commuteTime, expected + expected.T,
+                        rtol=1e-6, atol=1e-6)
+
+        indices = [0, 5, 20]
+        hits, commutes = gnm.calcHitTime(indices=indices)
+        assert_allclose(hits, expected[indices], rtol=1e-6, atol=1e-6)
+        assert_allclose(commutes, commuteTime[np.ix_(indices, indices)],
+                        rtol=1e-6, atol=1e-6)
+
 class TestGNM(unittest.TestCase):
 
     def setUp(self):
@@ -290,6 +306,47 @@ class TestANM(TestGNM):
                      'slow method does not reproduce same Kirchhoff')
     
 
+class TestCrossCorr(unittest.TestCase):
+
+    def testBlocks(self):
+
+        modes = anm[6:26]
+        array = modes._getArray()
+        cov = np.dot(array * modes.getVariances(), array.T)
+        n_atoms = modes.numAtoms()
+        cross = cov.reshape((n_atoms, 3, n_atoms, 3)).trace(axis1=1, axis2=3)
+        assert_allclose(calcCovariance(modes, n_cpu=2, block_size=10), cov,
+                        atol=1e-12)
+        assert_allclose(calcCrossCorr(modes, n_cpu=3, block_size=7,
+                                      norm=False), cross, atol=1e-12)
+
+        out = np.zeros((n_atoms, n_atoms), dtype=np.float32)
+        result = calcCrossCorr(modes, n_cpu=2, out=out)
+        self.assertIs(result, out)
+        diag = cross.diagonal() ** 0.5
+        assert_allclose(out, cross / np.outer(diag, diag), atol=1e-5)
+
+
+class TestModeArrays(unittest.TestCase):
+
+    def testSqFlucts(self):
+
+        modes = anm[6:26]
+        expected = np.zeros(modes.numAtoms())
+        for mode in modes:
+            expected += (mode.getArrayNx3() ** 2).sum(1) * mode.getVariance()
+        assert_allclose(calcSqFlucts(modes), expected, atol=1e-12)
+        assert_allclose(calcSqFlucts(list(modes)), expected, atol=1e-12)
+
+    def testCollectivity(self):
+
+        modes = gnm[1:11]
+        colls = calcCollectivity(modes)
+        self.assertEqual(len(colls), len(modes))
+        for coll, mode in zip(colls, modes):
+            assert_allclose(coll, calcCollectivity(mode), atol=1e-12)
+
+
 class TestGNMCalcModes(unittest.TestCase):
 
     def setUp():
@@ -314,5 +371,31 @@ class TestRTB(unittest.TestCase):
 
         rtb.calcModes()
 
+class TestReduceModel(unittest.TestCase):
+
+    def testSchurComplement(self):
+
+        select = 'resnum < 20'
+        system = ATOMS.select(select).getIndices()
+        other = np.setdiff1d(arange(len(ATOMS)), system)
+        K = gnm.getKirchhoff()
+        expected = (K[np.ix_(system, system)] -
+                    np.dot(K[np.ix_(system, other)],
+                           np.dot(np.linalg.inv(K[np.ix_(other, other)]),
+                                  K[np.ix_(other, system)])))
+        reduced, sel = reduceModel(gnm, ATOMS, select)
+        assert_allclose(reduced.getKirchhoff(), expected, rtol=0, atol=ATOL)
+
+    def testSelections(self):
+
+        selects = ['resnum < 20', 'resnum 30 to 50']
+        sparse = ANM()
+        sparse.buildHessian(ATOMS, sparse=True)
+        for (reduced, sel), select in zip(
+                reduceModel(sparse, ATOMS, selects), selects):
+            expected = reduceModel(anm, ATOMS, select)[0].getHessian()
+            assert_allclose(reduced.getHessian(), expected,
+                            rtol=0, atol=ATOL)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,89 @@
+"""This module contains unit tests for :mod:`~prody.dynamics.sampling`."""
+
+import os
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from prody.dynamics import calcANM, sampleModes, iterSampleModes
+from prody.measure import calcRMSD
+from prody.trajectory import parseDCD
+
+from prody.tests import unittest, TEMPDIR
+from prody.tests.datafiles import parseDatafile
+
+from prody import LOGGER
+
+LOGGER.verbosity = 'none'
+
+ATOMS = parseDatafile('1ubi').protein.copy()
+ANM = calcANM(ATOMS.ca)[0]
+CA = ATOMS.ca.copy()
+
+
+class TestSampleModes(unittest.TestCase):
+
+    def setUp(self):
+
+        self.dcd = os.path.join(TEMPDIR, 'prody_test_sampling.dcd')
+        self.memmap = os.path.join(TEMPDIR, 'prody_test_sampling.dat')
+
+    def testSeed(self):
+
+        one = sampleModes(ANM[:3], CA, n_confs=20, seed=1).getCoordsets()
+        two = sampleModes(ANM[:3], CA, n_confs=20, seed=1).getCoordsets()
+        assert_array_equal(one, two)
+        other = sampleModes(ANM[:3], CA, n_confs=20, seed=2).getCoordsets()
+        self.assertFalse(np.allclose(one, other))
+
+    def testRMSD(self):
+
+        confs = sampleModes(ANM[:3], CA, n_confs=50, rmsd=1.5, seed=1)
+        rmsd = calcRMSD(CA.getCoords(), confs.getCoordsets())
+        self.assertAlmostEqual(rmsd.mean(), 1.5)
+
+    def testChunked(self):
+
+        whole = sampleModes(ANM[:3], CA, n_confs=20, seed=1).getCoordsets()
+        chunked = sampleModes(ANM[:3], CA, n_confs=20, seed=1,
+                              chunk_size=7).getCoordsets()
+        assert_allclose(whole, chunked)
+
+        blocks = list(iterSampleModes(ANM[:3], CA.getCoords(), n_confs=20,
+                                      seed=1, chunk_size=7))
+        self.assertEqual([len(block) for block in blocks], [7, 7, 6])
+        assert_allclose(np.concatenate(blocks), whole)
+
+    def testDCD(self):
+
+        confs = sampleModes(ANM[:3], CA, n_confs=10, seed=1).getCoordsets()
+        self.assertEqual(sampleModes(ANM[:3], CA, n_confs=10, seed=1,
+                                     chunk_size=4, dcd=self.dcd), self.dcd)
+        assert_allclose(parseDCD(self.dcd).getCoordsets(), confs, atol=1e-4)
+
+    def testMemmap(self):
+
+        confs = sampleModes(ANM[:3], CA, n_confs=10, seed=1).getCoordsets()
+        ensemble = sampleModes(ANM[:3], CA, n_confs=10, seed=1, chunk_size=4,
+                               memmap=self.memmap)
+        self.assertEqual(ensemble.numConfs(), 10)
+        assert_allclose(ensemble.getCoordsets(), confs)
+
+    def testInvalidArguments(self):
+
+        self.assertRaises(TypeError, sampleModes, 'x')
+        self.assertRaises(TypeError, iterSampleModes, 'x')
+        self.assertRaises(ValueError, iterSampleModes, ANM[:3],
+                          ATOMS.getCoords())
+        self.assertRaises(ValueError, sampleModes, ANM[:3], ATOMS,
+                          dcd=self.dcd)
+        self.assertFalse(os.path.isfile(self.dcd))
+        self.assertRaises(ValueError, sampleModes, ANM[:3], ATOMS,
+                          memmap=self.memmap)
+        self.assertFalse(os.path.isfile(self.memmap))
+
+    def tearDown(self):
+
+        for filename in (self.dcd, self.memmap):
+            if os.path.isfile(filename):
+                os.remove(filename)
@@ -1,9 +1,15 @@
 """This module contains unit tests for :mod:`~prody.KDTree` module."""
 
-from numpy.testing import assert_array_equal, assert_equal
-from numpy.random import rand, randint
+from numpy import abs, arccos
+from numpy.testing import assert_array_equal, assert_equal, assert_allclose
+from numpy.random import rand, randint, RandomState
 
-from prody.dynamics import sdarray
+from prody.dynamics import sdarray, ANM, ModeEnsemble
+from prody.dynamics import calcSqFlucts, calcCrossCorr, calcOverlap
+from prody.dynamics import calcSignatureSqFlucts, calcSignatureCrossCorr
+from prody.dynamics import calcSignatureOverlaps, matchModes, pairModes
+from prody.dynamics import calcEnsembleSpectralOverlaps, calcSpectralOverlap
+from prody.dynamics import compare
 
 from prody.tests import unittest
 from prody.tests.datafiles import parseDatafile
@@ -43,3 +49,106 @@ class TestSDArray(unittest.TestCase):
 
         s = S[0, 0, 0]
         #assert_array_equal(s, A[0, 0, 0], 'failed at sdarray slicing')
+
+
+UBI = parseDatafile('1ubi').ca
+MODE_ENSEMBLE = ModeEnsemble('ubi')
+for i in range(3):
+    anm = ANM()
+    anm.buildHessian(UBI.getCoords() + RandomState(i).randn(len(UBI), 3) * 0.1)
+    anm.calcModes(5)
+    MODE_ENSEMBLE.addModeSet(anm, label=str(i))
+
+class TestModeEnsemble(unittest.TestCase):
+
+    def testSignatureSqFlucts(self):
+
+        sqfs = calcSignatureSqFlucts(MODE_ENSEMBLE)
+        for i, modeset in enumerate(MODE_ENSEMBLE):
+            assert_allclose(sqfs[i], calcSqFlucts(modeset),
+                            err_msg='failed to get signature sqflucts')
+
+    def testSignatureCrossCorr(self):
+
+        corr = calcSignatureCrossCorr(MODE_ENSEMBLE)
+        for i, modeset in enumerate(MODE_ENSEMBLE):
+            assert_allclose(corr[i], calcCrossCorr(modeset), atol=1e-12,
+                            err_msg='failed to get signature cross-correlations')
+
+    def testSignatureOverlaps(self):
+
+        overlaps = calcSignatureOverlaps(MODE_ENSEMBLE, diag=True)
+        full = calcSignatureOverlaps(MODE_ENSEMBLE, diag=False)
+        modesets = MODE_ENSEMBLE.getModeSets()
+        for i in range(3):
+            for j in range(3):
+                expected = abs(calcOverlap(modesets[i], modesets[j]))
+                assert_allclose(full[:, :, i, j], expected, atol=1e-12)
+                assert_allclose(overlaps[:, i, j], expected.diagonal(),
+                                atol=1e-12)
+
+    def testMatchModes(self):
+
+        modesets = MODE_ENSEMBLE.getModeSets()
+        perms = matchModes(*modesets, index=True)
+        assert_equal(perms[0], list(range(5)))
+        for perm, modeset in zip(perms[1:], modesets[1:]):
+            _, expected = pairModes(modesets[0], modeset, index=True)
+            assert_equal(perm, expected)
+
+        subsets = [modeset[1:4] for modeset in modesets]
+        perms = matchModes(*subsets, index=True)
+        assert_equal(perms[0], subsets[0].getIndices())
+        for perm, subset in zip(perms[1:], subsets[1:]):
+            _, expected = pairModes(subsets[0], subset, index=True)
+            assert_equal(perm, expected)
+
+        matched = matchModes(*modesets, n_iter=5)
+        for modeset in matched:
+            assert_equal(sorted(modeset.getIndices()), list(range(5)))
+
+    def testEnsembleSpectralOverlaps(self):
+
+        overlaps = calcEnsembleSpectralOverlaps(MODE_ENSEMBLE)
+        modesets = MODE_ENSEMBLE.getModeSets()
+        for i in range(3):
+            for j in range(3):
+                assert_allclose(overlaps[i, j],
+                                calcSpectralOverlap(modesets[i], modesets[j]),
+                                atol=1e-12)
+        for kwargs in ({'block_size': 1}, {'block_size': 2},
+                       {'block_size': 1, 'turbo': 2}):
+            assert_allclose(calcEnsembleSpectralOverlaps(MODE_ENSEMBLE,
+                                                         **kwargs),
+                            overlaps, atol=1e-12,
+                            err_msg='failed with {0}'.format(kwargs))
+        assert_allclose(calcEnsembleSpectralOverlaps(MODE_ENSEMBLE,
+                                                     distance=True,
+                                                     block_size=1),
+                        arccos(overlaps), atol=1e-6)
+
+    def testSpectralOverlapCache(self):
+
+        modesets = MODE_ENSEMBLE.getModeSets()
+        size = compare.SO_CACHE_SIZE
+        compare.SO_CACHE.clear()
+        try:
+            for rows, cols in [(slice(None), slice(None)), (slice(1, 4), [0, 2]),
+                               (2, slice(0, 3))]:
+                for i, j in [(0, 1), (1, 0), (2, 2)]:
+                    modes1, modes2 = modesets[i][rows], modesets[j][cols]
+                    assert_allclose(calcSpectralOverlap(modes1, modes2,
+                                                        turbo=True),
+                                    calcSpectralOverlap(modes1, modes2),
+                                    atol=1e-12)
+            self.assertEqual(len(compare.SO_CACHE), 2)
+
+            # the oldest results are discarded when the cache is full
+            compare.SO_CACHE_SIZE = 2 * 5 * 5
+            calcSpectralOverlap(modesets[1], modesets[2], turbo=True)
+            self.assertEqual(len(compare.SO_CACHE), 2)
+            self.assertNotIn((modesets[0].getModel(), modesets[1].getModel()),
+                             compare.SO_CACHE)
+        finally:
+            compare.SO_CACHE_SIZE = size
+            compare.SO_CACHE.clear()
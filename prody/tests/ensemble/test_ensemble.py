@@ -1,13 +1,17 @@
 """This module contains unit tests for :mod:`~prody.ensemble`."""
 
 import os.path
+import pickle
 from prody.tests import TestCase
 
 import numpy as np
 from numpy import arange
 from numpy.testing import assert_equal, assert_allclose
 
-from . import ATOMS, COORDS, ENSEMBLE, ENSEMBLEW
+from prody import Ensemble
+from prody.tests import TEMPDIR
+
+from . import ATOMS, COORDS, COORDSETS, ENSEMBLE, ENSEMBLEW
 from . import ENSEMBLE_RMSD, ENSEMBLE_SUPERPOSE
 from . import ATOL, RTOL
 
@@ -135,6 +139,56 @@ class TestEnsemble(TestCase):
         assert_equal(ensemble.getCoords(), COORDS,
                      'failed when deleting all coordinate sets')
 
+    def testAddCoordsetOneByOne(self):
+
+        ensemble = Ensemble('Test')
+        ensemble.setCoords(COORDS)
+        for xyz in ATOMS.iterCoordsets():
+            ensemble.addCoordset(xyz)
+        ensemble.delCoordset(1)
+        ensemble.addCoordset(COORDSETS[1])
+        assert_equal(ensemble.getCoordsets(), COORDSETS[[0, 2, 1]],
+                     'failed to add coordinate sets one by one')
+
+    def testMemmap(self):
+
+        filename = os.path.join(TEMPDIR, 'ensemble_memmap.dat')
+        ensemble = ENSEMBLE[:]
+        ensemble.setMemmap(filename)
+        ensemble.addCoordset(COORDSETS)
+        assert_equal(ensemble.getCoordsets(), np.concatenate([COORDSETS] * 2),
+                     'failed to add coordinate sets to memory-mapped file')
+        ensemble.setMemmap(None)
+        os.remove(filename)
+        assert_equal(ensemble.getCoordsets(), np.concatenate([COORDSETS] * 2),
+                     'failed to load coordinate sets from memory-mapped file')
+
+    def testPickle(self):
+
+        ensemble = Ensemble('Test')
+        ensemble.setCoords(COORDS)
+        for xyz in ATOMS.iterCoordsets():
+            ensemble.addCoordset(xyz)
+        self.assertGreater(len(ensemble._buffer), len(ensemble))
+        copied = pickle.loads(pickle.dumps(ensemble))
+        self.assertIsNone(copied._buffer)
+        assert_equal(copied.getCoordsets(), COORDSETS,
+                     'failed to pickle coordinate sets')
+        copied.addCoordset(COORDSETS[0])
+        assert_equal(copied.getCoordsets(), COORDSETS[[0, 1, 2, 0]],
+                     'failed to add coordinate sets after unpickling')
+        self.assertLess(len(pickle.dumps(ensemble)),
+                        len(pickle.dumps(ensemble.__dict__)))
+
+        filename = os.path.join(TEMPDIR, 'ensemble_memmap.dat')
+        ensemble.setMemmap(filename)
+        copied = pickle.loads(pickle.dumps(ensemble))
+        ensemble.setMemmap(None)
+        os.remove(filename)
+        self.assertNotIsInstance(copied._confs, np.memmap)
+        assert_equal(copied.getCoordsets(), COORDSETS,
+                     'failed to pickle memory-mapped coordinate sets')
+
 
     def testConcatenation(self):
         """Test concatenation of ensembles without weights."""
@@ -1,9 +1,11 @@
 """This module contains unit tests for :mod:`~prody.ensemble`."""
 
+import pickle
+
 from prody.tests import TestCase
 
 from numpy import arange
-from numpy.testing import assert_equal
+from numpy.testing import assert_equal, assert_allclose
 
 from . import ATOMS, PDBENSEMBLE, PDBENSEMBLEA, COORDS, WEIGHTS_BOOL, ENSEMBLE, WEIGHTS
 
@@ -94,6 +96,20 @@ class TestPDBEnsemble(TestCase):
                          ATOMS.numCoordsets(),
                          'failed to get correct number of coordinate sets')
 
+    def testGetStatistics(self):
+
+        weights = WEIGHTS > 0
+        confs = ATOMS.getCoordsets()
+        mean = (confs * weights).sum(0) / weights.sum(0)
+        msfs = (((confs - mean) ** 2) * weights).sum(0).sum(1)
+        msfs /= weights.sum(0).flatten()
+        stats = PDBENSEMBLE.getStatistics(chunk_size=2)
+        assert_allclose(stats[0], mean, err_msg='failed to get mean')
+        assert_allclose(stats[1], msfs, err_msg='failed to get MSFs')
+        assert_allclose(stats[2], msfs ** 0.5, err_msg='failed to get RMSFs')
+        assert_allclose(stats[3], weights.mean(0).flatten(),
+                        err_msg='failed to get occupancies')
+
     def testDelCoordsetMiddle(self):
 
         ensemble = PDBENSEMBLEA[:]
@@ -151,3 +167,22 @@ class TestPDBEnsemble(TestCase):
         ensemble.addCoordset(ATOMS, degeneracy=True)
         assert_equal(ensemble.numCoordsets(), n_conf+n_csets+1,
                      'adding coordsets failed')
+
+    def testPickle(self):
+
+        ensemble = PDBENSEMBLEA[:]
+        ensemble.addCoordset(ATOMS)
+        ensemble.addCoordset(ATOMS)
+        self.assertGreater(len(ensemble._weights_buffer), len(ensemble))
+        copied = pickle.loads(pickle.dumps(ensemble))
+        self.assertIsNone(copied._buffer)
+        self.assertIsNone(copied._weights_buffer)
+        assert_equal(copied.getCoordsets(), ensemble.getCoordsets(),
+                     'failed to pickle coordinate sets')
+        assert_equal(copied.getWeights(), ensemble.getWeights(),
+                     'failed to pickle weights')
+        assert_equal(copied.getMSA().getArray(), ensemble.getMSA().getArray(),
+                     'failed to pickle associated MSA')
+        copied.addCoordset(ATOMS)
+        assert_equal(copied.numCoordsets(), len(ensemble) + ATOMS.numCoordsets(),
+                     'failed to add coordinate sets after unpickling')
@@ -1,10 +1,12 @@
-from numpy import array, concatenate, unique
+from numpy import array, concatenate, unique, nonzero, triu, zeros
 from numpy.testing import assert_array_equal, assert_equal
+from numpy.testing import assert_array_almost_equal
 
 from prody.tests import unittest
 from prody.tests.datafiles import parseDatafile, pathDatafile
 
 from prody.measure import Contacts, findNeighbors, iterNeighbors
+from prody.measure import findNeighborArrays, buildContactMap
 from prody.measure import buildDistMatrix, calcDistance
 
 
@@ -118,3 +120,72 @@ class TestNeighbors(unittest.TestCase):
         neighbors1.sort()
         neighbors2.sort()
         self.assertEqual(neighbors1, neighbors2)
+
+
+class TestNeighborArrays(unittest.TestCase):
+
+    def assertPairs(self, pairs, dist, cutoff, upper=False):
+
+        i, j, d = pairs
+        mask = dist <= cutoff
+        if upper:
+            mask = triu(mask, 1)
+        self.assertEqual(set(zip(i, j)), set(zip(*nonzero(mask))))
+        assert_array_almost_equal(d, dist[i, j], 4)
+
+    def testSelf(self):
+
+        dist = buildDistMatrix(UCA_XYZ, format='mat')
+        pairs = findNeighborArrays(UCA, 12.)
+        self.assertTrue((pairs[0] < pairs[1]).all())
+        self.assertPairs(pairs, dist, 12., upper=True)
+
+    def testSelfPBC(self):
+
+        dist = buildDistMatrix(UCA_XYZ, unitcell=UCA_UC, format='mat')
+        self.assertPairs(findNeighborArrays(UCA_XYZ, 12., unitcell=UCA_UC),
+                         dist, 12., upper=True)
+
+    def testTwoSelections(self):
+
+        first, second = UBI.select('resnum < 40'), UBI.select('resnum > 30')
+        for atoms, atoms2 in [(first, second), (second, first),
+                              (first, second[:20]), (second[:20], first)]:
+            for unitcell in [None, UBI_UC]:
+                dist = buildDistMatrix(atoms, atoms2, unitcell=unitcell,
+                                       format='arr')
+                pairs = findNeighborArrays(atoms, 5., atoms2,
+                                           unitcell=unitcell)
+                self.assertPairs(pairs, dist, 5.)
+
+    def testNoPairs(self):
+
+        i, j, d = findNeighborArrays(UCA_XYZ, .1)
+        self.assertEqual((len(i), len(j), len(d)), (0, 0, 0))
+
+    def testContactMap(self):
+
+        atoms = UBI.protein
+        residues, resindices = unique(atoms.getResindices(),
+                                      return_inverse=True)
+        contacts = buildDistMatrix(atoms, format='mat') <= 4.5
+        i, j = nonzero(triu(contacts, 1))
+        expected = zeros((len(residues),) * 2, int)
+        for i, j in zip(resindices[i], resindices[j]):
+            expected[i, j] += 1
+            if i != j:
+                expected[j, i] += 1
+
+        assert_array_equal(buildContactMap(atoms, 4.5), expected)
+        assert_array_equal(buildContactMap(atoms, 4.5, sparse=True).toarray(),
+                           expected)
+        assert_array_equal(buildContactMap(atoms, 4.5, level='chain'),
+                           [[(expected.sum() + expected.trace()) // 2]])
+
+    def testContactMapTwoSelections(self):
+
+        first, second = UBI.select('resnum 1 to 10'), UBI.select('resnum > 60')
+        contacts = buildContactMap(first, 4.5, second, level='atom')
+        dist = buildDistMatrix(first, second, format='arr')
+        assert_array_equal(contacts, dist <= 4.5)
+        self.assertRaises(ValueError, buildContactMap, UCA_XYZ, 4.5)
@@ -1,13 +1,15 @@
 """This module contains unit tests for :mod:`prody.measure.transform` module.
 """
 
-from numpy import zeros, ones, eye, all
-from numpy.testing import assert_equal
+from numpy import zeros, ones, eye, all, array, triu_indices
+from numpy.random import RandomState
+from numpy.testing import assert_equal, assert_allclose
 
 from prody.tests import unittest
 from prody.tests.datafiles import parseDatafile
 
-from prody.measure import moveAtoms, wrapAtoms
+from prody.measure import moveAtoms, wrapAtoms, calcRMSDMatrix, calcRMSD
+from prody.measure import calcTransformation
 
 UBI = parseDatafile('1ubi')
 
@@ -52,3 +54,33 @@ class TestWrapAtoms(unittest.TestCase):
         diff = xyz - UBI.getCoords()
         self.assertTrue(all(diff == unitcell))
 
+
+
+class TestCalcRMSDMatrix(unittest.TestCase):
+
+    def setUp(self):
+
+        rng = RandomState(0)
+        xyz = UBI.ca.getCoords()
+        self.coordsets = array([xyz + rng.randn(*xyz.shape) for _ in range(5)])
+        self.weights = (rng.rand(5, len(xyz), 1) > 0.1).astype(float)
+
+    def testSuperpose(self):
+
+        rmsds = calcRMSDMatrix(self.coordsets, self.weights, block_size=2)
+        for i, mob in enumerate(self.coordsets):
+            for j, tar in enumerate(self.coordsets):
+                if i == j:
+                    continue
+                weights = self.weights[i] * self.weights[j]
+                moved = calcTransformation(mob, tar, weights).apply(mob.copy())
+                assert_allclose(rmsds[i, j], calcRMSD(moved, tar, weights),
+                                rtol=0, atol=1e-6)
+
+    def testCondensed(self):
+
+        rmsds = calcRMSDMatrix(self.coordsets, superpose=False)
+        condensed = calcRMSDMatrix(self.coordsets, superpose=False,
+                                   condensed=True, block_size=3)
+        assert_allclose(condensed, rmsds[triu_indices(5, 1)])
+        assert_allclose(rmsds[0], calcRMSD(self.coordsets[0], self.coordsets))
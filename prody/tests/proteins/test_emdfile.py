@@ -0,0 +1,314 @@
+"""This module contains unit tests for :mod:`~prody.proteins.emdfile`."""
+
+import os
+import gzip
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from prody import parseEMD, writeEMD, TRNET, LOGGER
+from prody.proteins.emdfile import MRC_HEADER_DTYPE
+from prody.tests import unittest, TEMPDIR
+
+LOGGER.verbosity = 'none'
+
+SHAPE = (4, 3, 5)
+
+
+def _writeMap(filename, density, mode=2, byteorder='<', **fields):
+    """Writes *density* with section, row, and column axes to an MRC file."""
+
+    header = np.zeros(1, dtype=MRC_HEADER_DTYPE.newbyteorder(byteorder))
+    ns, nr, nc = density.shape
+    header['nc'], header['nr'], header['ns'] = nc, nr, ns
+    header['nx'], header['ny'], header['nz'] = nc, nr, ns
+    header['lx'], header['ly'], header['lz'] = nc * 2., nr * 2., ns * 2.
+    header['alpha'] = header['beta'] = header['gamma'] = 90.
+    header['mapc'], header['mapr'], header['maps'] = 1, 2, 3
+    header['map'] = b'MAP '
+    header['mode'] = mode
+    for field, value in fields.items():
+        header[field] = value
+    dtype = {1: 'i2', 2: 'f4'}[mode]
+    data = header.tobytes() + density.astype(byteorder + dtype).tobytes()
+    if filename.endswith('.gz'):
+        out = gzip.open(filename, 'wb')
+    else:
+        out = open(filename, 'wb')
+    out.write(data)
+    out.close()
+    return filename
+
+
+class TestEMDMAP(unittest.TestCase):
+
+    def setUp(self):
+
+        self.density = np.arange(np.prod(SHAPE), dtype=float).reshape(SHAPE)
+        self.density[1] = -1.
+        self.filename = os.path.join(TEMPDIR, 'prody_test_emd.map')
+        self.filenames = [self.filename]
+        _writeMap(self.filename, self.density)
+
+    def testHeaderDtype(self):
+
+        self.assertEqual(MRC_HEADER_DTYPE.itemsize, 1024)
+        self.assertEqual(MRC_HEADER_DTYPE.fields['map'][1], 208)
+        self.assertEqual(MRC_HEADER_DTYPE.fields['labels'][1], 224)
+
+    def testHeader(self):
+
+        emd = parseEMD(self.filename)
+        self.assertEqual((emd.NS, emd.NR, emd.NC), SHAPE)
+        self.assertEqual(emd.Ntot, np.prod(SHAPE))
+        self.assertEqual(emd.mode, 2)
+        self.assertEqual(emd.Lx, 10.)
+        self.assertEqual(emd.wordMAP, b'MAP ')
+
+    def testBigEndianAndIntegerModes(self):
+
+        filename = os.path.join(TEMPDIR, 'prody_test_emd_big.map')
+        self.filenames.append(filename)
+        for mode in (1, 2):
+            _writeMap(filename, self.density, mode=mode, byteorder='>')
+            for memmap in (True, False):
+                emd = parseEMD(filename, memmap=memmap)
+                self.assertEqual(emd.mode, mode)
+                assert_array_equal(emd.density, self.density)
+
+    def testMemmap(self):
+
+        emd = parseEMD(self.filename)
+        self.assertIsInstance(emd.density, np.memmap)
+        assert_array_equal(emd.density, self.density)
+
+        # density values are copied on write
+        emd.density[0, 0, 0] = 100.
+        assert_array_equal(parseEMD(self.filename).density, self.density)
+
+        for kwargs in ({'memmap': False}, {'cutoff': -10.}):
+            emd = parseEMD(self.filename, **kwargs)
+            self.assertNotIsInstance(emd.density, np.memmap)
+            assert_array_equal(emd.density, self.density)
+
+        emd = parseEMD(self.filename, cutoff=10.)
+        assert_array_equal(emd.density,
+                           np.where(self.density < 10, 0, self.density))
+
+        filename = _writeMap(self.filename + '.gz', self.density)
+        self.filenames.append(filename)
+        emd = parseEMD(filename)
+        self.assertNotIsInstance(emd.density, np.memmap)
+        assert_array_equal(emd.density, self.density)
+
+    def testWrite(self):
+
+        filename = os.path.join(TEMPDIR, 'prody_test_emd_out.map')
+        self.filenames.append(filename)
+        emd = parseEMD(self.filename)
+        writeEMD(filename, emd)
+        out = parseEMD(filename)
+        assert_array_equal(out.density, emd.density)
+        self.assertEqual(out.Lz, emd.Lz)
+
+    def testDrawSamples(self):
+
+        mapped = parseEMD(self.filename)
+        loaded = parseEMD(self.filename, memmap=False)
+        np.random.seed(0)
+        samples = mapped.drawsamples(1000)
+        np.random.seed(0)
+        assert_array_equal(loaded.drawsamples(1000), samples)
+
+        # negative and zero densities are never sampled
+        self.assertTrue(np.all(self.density[tuple(samples.T)] > 0))
+
+        # repeated draws use cached cumulative sums
+        np.random.seed(0)
+        assert_array_equal(mapped.drawsamples(1000), samples)
+        self.assertTrue(len(mapped._localcumsums))
+
+        uniform = loaded.drawsamples(1000, uniform=True)
+        self.assertTrue(np.all(uniform >= 0))
+        self.assertTrue(np.all(uniform < SHAPE))
+
+    def testSampleFrequencies(self):
+
+        density = np.zeros(SHAPE)
+        density[0, 1, 2] = 1.
+        density[3, 2, 4] = 3.
+        emd = parseEMD(self.filename, memmap=False)
+        emd.density = density
+        np.random.seed(0)
+        samples = emd.drawsamples(4000)
+        first = np.all(samples == [0, 1, 2], axis=1).sum()
+        second = np.all(samples == [3, 2, 4], axis=1).sum()
+        self.assertEqual(first + second, 4000)
+        self.assertAlmostEqual(first / 4000., .25, places=1)
+
+        # setting density again invalidates cached cumulative sums
+        density = np.zeros(SHAPE)
+        density[2, 0, 1] = 1.
+        emd.density = density
+        assert_array_equal(emd.drawsamples(10), [[2, 0, 1]] * 10)
+
+    def testCoordinates(self):
+
+        emd = parseEMD(self.filename)
+        assert_allclose(emd.coordinates([[0, 0, 0], [1, 2, 3]]),
+                        [[0., 0., 0.], [6., 4., 2.]])
+        assert_allclose(emd.coordinate(1, 2, 3), [6., 4., 2.])
+
+        # columns along z, rows along x, and sections along y with offsets
+        _writeMap(self.filename, self.density, mapc=3, mapr=1, maps=2,
+                  ncstart=1, nrstart=2, nsstart=3,
+                  lx=SHAPE[1] * 1., ly=SHAPE[0] * 2., lz=SHAPE[2] * 3.)
+        emd = parseEMD(self.filename)
+        indices = np.array([[1, 2, 3], [0, 0, 0]])
+        assert_allclose(emd.coordinates(indices),
+                        [[(2 + 2) * 1., (1 + 3) * 2., (3 + 1) * 3.],
+                         [2 * 1., 3 * 2., 1 * 3.]])
+        self.assertEqual(emd.getDensityXYZ().shape,
+                         (SHAPE[1], SHAPE[0], SHAPE[2]))
+        assert_array_equal(emd.getDensityXYZ()[2, 1, 3], self.density[1, 2, 3])
+
+        np.random.seed(0)
+        samples = emd.drawsamples(5)
+        np.random.seed(0)
+        assert_allclose(emd.samplecoordinates(5), emd.coordinates(samples))
+
+    def tearDown(self):
+
+        for filename in self.filenames:
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+
+class TestTRNET(unittest.TestCase):
+
+    def setUp(self):
+
+        # two blobs of density centered at voxels (2, 2, 2) and (7, 7, 7)
+        grid = np.indices((10, 10, 10)).transpose(1, 2, 3, 0)
+        density = sum(np.exp(-((grid - center) ** 2).sum(-1) / 2.)
+                      for center in ([2, 2, 2], [7, 7, 7]))
+        self.filename = _writeMap(os.path.join(TEMPDIR, 'prody_test_trn.map'),
+                                  density, lx=10., ly=10., lz=10.)
+        self.emd = parseEMD(self.filename, memmap=False)
+
+    def _network(self, coords):
+
+        trn = TRNET(len(coords))
+        trn.inputMap(self.emd)
+        trn.W[:] = coords
+        return trn
+
+    def testRunBatch(self):
+
+        coords = np.array([[0., 0., 0.], [1., 0., 0.], [3., 0., 0.]])
+        trn = self._network(coords)
+        v = np.array([[0.4, 0., 0.]])
+        trn._runBatch(v, 1., .5, -1)
+        # nodes are ranked 0, 1, and 2
+        E = .5 * np.exp(-np.arange(3.))
+        assert_allclose(trn.W, coords + E[:, np.newaxis] * (v - coords))
+        self.assertEqual(len(trn._edges), 0)
+
+        # moves towards identical samples of a batch are compounded
+        one = self._network(coords)
+        for i in range(3):
+            one._runBatch(v, 1., .5, -1)
+        batch = self._network(coords)
+        batch._runBatch(np.repeat(v, 3, 0), 1., .5, -1)
+        assert_allclose(batch.W, one.W)
+
+    def testEdgeAging(self):
+
+        coords = np.array([[0., 0., 0.], [1., 0., 0.],
+                           [5., 0., 0.], [6., 0., 0.]])
+        trn = self._network(coords)
+        for v in ([[0.1, 0., 0.]], [[5.9, 0., 0.]], [[0.4, 0., 0.]],
+                  [[-0.1, 0., 0.]]):
+            trn._runBatch(np.array(v), 1., 0., 10)
+        # connection 0-1 is refreshed by the last sample, and 3-2 is aged
+        # by neither of the other samples
+        assert_array_equal(trn._edges, [0 * 4 + 1, 2 * 4 + 3])
+        assert_array_equal(trn._ages, [1, 1])
+
+        trn._runBatch(np.array([[-0.1, 0., 0.], [-0.2, 0., 0.],
+                                [5.1, 0., 0.]]), 1., 0., 10)
+        # winners age connections in bulk, before connections are refreshed
+        assert_array_equal(trn._ages, [1, 1])
+        trn._runBatch(np.array([[0.9, 0., 0.]] * 2), 1., 0., 2)
+        assert_array_equal(trn._edges, [0 * 4 + 1, 2 * 4 + 3])
+        # node 1 wins 3 times with node 2 as the runner-up, and its
+        # connection to node 0 becomes older than T and is removed
+        trn._runBatch(np.array([[2.9, 0., 0.]] * 3), 1., 0., 2)
+        assert_array_equal(trn._edges, [1 * 4 + 2, 2 * 4 + 3])
+        assert_array_equal(trn._ages, [1, 1])
+
+    def testAgeMatrix(self):
+
+        trn = self._network(np.zeros((4, 3)))
+        trn._edges = np.array([0 * 4 + 1, 1 * 4 + 3])
+        trn._ages = np.array([2., 5.])
+        ages = trn.getAgeMatrix()
+        self.assertEqual(ages.shape, (4, 4))
+        expected = np.zeros((4, 4))
+        expected[0, 1] = expected[1, 0] = 2.
+        expected[1, 3] = expected[3, 1] = 5.
+        assert_array_equal(ages.toarray(), expected)
+        assert_array_equal(trn.C, expected + np.eye(4))
+        assert_array_equal(trn.outputEdges(), (expected + np.eye(4)) > 0)
+
+    def testQuantizationErrors(self):
+
+        trn = self._network([[2., 2., 2.], [7., 7., 7.], [50., 50., 50.]])
+        np.random.seed(0)
+        errors = trn.calcQuantizationErrors(500, batch_size=64)
+        self.assertEqual(errors.shape, (3,))
+        self.assertTrue(np.isnan(errors[2]))
+
+        # samples are voxels whose coordinates are within a few A of centers
+        np.random.seed(0)
+        V = self.emd.samplecoordinates(500)
+        D = ((V[:, np.newaxis] - trn.W[:2]) ** 2).sum(-1)
+        assert_allclose(errors[:2], [np.sqrt(D[D.argmin(1) == i, i].mean())
+                                     for i in range(2)])
+
+    def testConvergence(self):
+
+        errors = []
+        for batch_size in (1, 20):
+            np.random.seed(1)
+            trn = TRNET(10)
+            trn.inputMap(self.emd)
+            trn.run(tmax=50, calcC=True, batch_size=batch_size)
+            np.random.seed(2)
+            errors.append(np.sqrt(np.nanmean(
+                trn.calcQuantizationErrors(2000) ** 2)))
+            # nodes are placed on both blobs, and connections are made
+            centers = ((trn.W[:, np.newaxis] - [[2., 2., 2.], [7., 7., 7.]])
+                       ** 2).sum(-1).argmin(1)
+            self.assertEqual(set(centers), set([0, 1]))
+            self.assertTrue(len(trn._edges))
+        sequential, batch = errors
+        self.assertLess(sequential, 1.5)
+        self.assertLess(batch, sequential * 1.2)
+
+    def testRunAndPause(self):
+
+        np.random.seed(0)
+        trn = TRNET(5)
+        trn.inputMap(self.emd, sample='center')
+        assert_allclose(trn.W, [self.emd.coordinate(5, 5, 5)] * 5)
+        trn.run_n_pause(1, 20, tmax=10)
+        self.assertEqual(len(np.unique(trn.W.round(6), axis=0)), 5)
+        # connections are not older than the threshold T of the last step
+        self.assertTrue(len(trn._edges))
+        self.assertTrue(np.all(trn._ages <= 0.1 * 5 * 20 ** (20 / 50.)))
+
+    def tearDown(self):
+
+        self.emd = None
+        os.remove(self.filename)
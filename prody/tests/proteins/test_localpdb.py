@@ -1,6 +1,7 @@
 """This module contains unit tests for :mod:`~prody.proteins`."""
 
 import os
+import json
 
 import numpy as np
 from numpy.testing import *
@@ -74,3 +75,91 @@ class TestFetchPDB(unittest.TestCase):
                 os.remove(fn)
             except:
                 pass
+
+
+
+class TestPDBCatalog(unittest.TestCase):
+
+    """Test catalogs of PDB files in local folders."""
+
+    def setUp(self):
+
+        from prody.proteins import localpdb
+        self.localpdb = localpdb
+        self.minsize = localpdb._CATALOG_MINSIZE
+        self.cache = localpdb._CATALOG_PATH
+        self.folder = os.path.join(TEMPDIR, 'prody_test_catalog')
+        localpdb._CATALOG_MINSIZE = 1
+        localpdb._CATALOG_PATH = os.path.join(TEMPDIR, 'prody_test_cache')
+        localpdb._CATALOGS.clear()
+        for path in (self.folder, localpdb._CATALOG_PATH):
+            if not os.path.isdir(path):
+                os.mkdir(path)
+        self.touch('1abc.pdb', '2xyz.pdb.gz')
+
+    def touch(self, *filenames):
+
+        for filename in filenames:
+            open(os.path.join(self.folder, filename), 'w').close()
+        # make the folder look older than the file system clock resolution
+        past = os.stat(self.folder).st_mtime - 100
+        os.utime(self.folder, (past, past))
+
+    def testRescan(self):
+        """Test that files added to and removed from a folder are found."""
+
+        catalog = self.localpdb._PDBCatalog(self.folder)
+        self.assertEqual(catalog.find('1abc'), '1abc.pdb')
+        self.assertIsNone(catalog.find('3def'))
+
+        self.touch('3def.ent')
+        self.assertEqual(catalog.find('3def'), '3def.ent')
+
+        os.remove(os.path.join(self.folder, '1abc.pdb'))
+        self.assertIsNone(catalog.find('1abc'))
+        self.assertEqual(sorted(catalog.iterFilenames()),
+                         [('2xyz', '2xyz.pdb.gz'), ('3def', '3def.ent')])
+
+    def testSaveAndReload(self):
+        """Test that saved catalogs are reused and checked against the
+        folder."""
+
+        catalog = self.localpdb._PDBCatalog(self.folder)
+        self.assertEqual(catalog.find('2xyz', compressed=True),
+                         '2xyz.pdb.gz')
+        catalog.save()
+        self.assertEqual(sorted(os.listdir(self.folder)),
+                         ['1abc.pdb', '2xyz.pdb.gz'])
+        filename = self.localpdb._pathCatalog(self.folder, False)
+        self.assertTrue(os.path.isfile(filename))
+
+        catalog = self.localpdb._PDBCatalog(self.folder)
+        self.assertEqual(sorted(catalog._folders[''][1]), ['1abc', '2xyz'])
+        self.assertEqual(catalog.find('1abc'), '1abc.pdb')
+
+        # a file removed without changing folder modification time
+        mtime = os.stat(self.folder).st_mtime
+        os.remove(os.path.join(self.folder, '1abc.pdb'))
+        os.utime(self.folder, (mtime, mtime))
+        catalog = self.localpdb._PDBCatalog(self.folder)
+        self.assertIsNone(catalog.find('1abc'))
+
+        # catalogs with entries pointing outside of the folder are ignored
+        with open(filename) as inp:
+            data = json.load(inp)
+        data['folders'][''][1]['1bad'] = [['../1bad.pdb', 'pdb', False]]
+        with open(filename, 'w') as out:
+            json.dump(data, out)
+        catalog = self.localpdb._PDBCatalog(self.folder)
+        self.assertEqual(catalog._folders, {})
+        self.assertIsNone(catalog.find('1bad'))
+
+    def tearDown(self):
+
+        self.localpdb._CATALOG_MINSIZE = self.minsize
+        self.localpdb._CATALOG_PATH = self.cache
+        self.localpdb._CATALOGS.clear()
+        for path in (self.folder, os.path.join(TEMPDIR, 'prody_test_cache')):
+            for filename in os.listdir(path):
+                os.remove(os.path.join(path, filename))
+            os.rmdir(path)
@@ -8,7 +8,7 @@ import numpy.testing.decorators as dec
 
 from prody import *
 from prody import LOGGER
-from prody.utilities import which
+from prody.utilities import which, createStringIO
 from prody.tests import TEMPDIR, unittest
 from prody.tests.datafiles import *
 
@@ -135,6 +135,22 @@ class TestParsePDB(unittest.TestCase):
             'parsePDB failed to append coordinate sets to given ag')
         assert_equal(coords, ag.getCoordsets(np.arange(ncsets, ncsets*2)))
 
+    def testManyAtoms(self):
+        """Test parsing more atoms than the initial size of arrays."""
+
+        line = ('ATOM  {0:5s}  CA  ALA A   1       1.000   2.000   3.000'
+                '  1.00 20.00           C\n')
+        n_atoms = 100005
+        lines = [line.format('{0:5x}'.format(i) if i > 99999 else str(i))
+                 for i in range(1, n_atoms + 1)]
+        stream = createStringIO()
+        stream.write(''.join(lines))
+        stream.seek(0)
+        ag = parsePDBStream(stream)
+        self.assertEqual(ag.numAtoms(), n_atoms,
+            'parsePDB failed to parse more than 99999 atoms')
+        assert_equal(ag.getSerials()[-1], 0x186a5)
+
 '''
     def testBiomolArgument(self):
 
@@ -0,0 +1,161 @@
+"""This module contains unit tests for :mod:`~prody.proteins.starfile`."""
+
+import os
+import gzip
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from prody import parseSTAR, writeSTAR, LOGGER
+from prody.proteins.starfile import iterSTARLoops, parseSTARLoop
+from prody.tests import unittest, TEMPDIR
+from prody.tests.datafiles import pathDatafile
+
+LOGGER.verbosity = 'none'
+
+STAR = pathDatafile('star')
+
+
+class TestSTARLoops(unittest.TestCase):
+
+    def setUp(self):
+
+        self.filename = os.path.join(TEMPDIR, 'prody_test.star')
+
+    def testLoops(self):
+
+        loops = [(block, loop, sorted(columns))
+                 for block, loop, columns in iterSTARLoops(STAR)]
+        self.assertEqual([loop[:2] for loop in loops],
+                         [('optics', 0), ('particles', 0), ('particles', 1)])
+        self.assertEqual(loops[2][2], ['_rlnGroupName', '_rlnGroupNumber'])
+        self.assertEqual(len(loops[1][2]), 7)
+
+    def testTypedColumns(self):
+
+        columns = parseSTARLoop(STAR, 'particles')
+        self.assertEqual(columns['_rlnClassNumber'].dtype.kind, 'i')
+        self.assertEqual(columns['_rlnCoordinateX'].dtype.kind, 'f')
+        self.assertEqual(columns['_rlnImageName'].dtype.kind, 'U')
+        assert_array_equal(columns['_rlnClassNumber'], [1, 2, 1, 3, 1])
+        assert_array_equal(columns['_rlnAngleRot'],
+                           [-81.9032, 165.2110, 3.5, -120., 44.25])
+        self.assertEqual(columns['_rlnImageName'][3],
+                         '000001@Particles/mic002.mrcs')
+
+        optics = parseSTARLoop(STAR)
+        assert_array_equal(optics['_rlnVoltage'], [300., 200.])
+        assert_array_equal(parseSTARLoop(STAR, 'particles', 1)
+                           ['_rlnGroupName'], ['group_1', 'group_2'])
+        self.assertRaises(ValueError, parseSTARLoop, STAR, 'particles', 2)
+        self.assertRaises(ValueError, parseSTARLoop, STAR, 'model')
+
+    def testFields(self):
+
+        fields = ['_rlnClassNumber', '_rlnGroupNumber']
+        loops = [(block, loop, sorted(columns)) for block, loop, columns
+                 in iterSTARLoops(STAR, fields=fields)]
+        self.assertEqual(loops, [('particles', 0, ['_rlnClassNumber']),
+                                 ('particles', 1, ['_rlnGroupNumber'])])
+
+    def testRows(self):
+
+        every = parseSTARLoop(STAR, 'particles')
+        for rows, which in [(slice(1, 4), [1, 2, 3]),
+                            (np.array([4, 0]), [4, 0]),
+                            (every['_rlnClassNumber'] == 1, [0, 2, 4]),
+                            (lambda columns: columns['_rlnOpticsGroup'] == 2,
+                             [3, 4])]:
+            columns = parseSTARLoop(STAR, 'particles', rows=rows)
+            for field, column in every.items():
+                assert_array_equal(columns[field], column[which])
+
+        # callables select rows of each loop using fields they need
+        columns = parseSTARLoop(STAR, 'particles', 0, rows=lambda c:
+                                c['_rlnCoordinateX'] > 1000,
+                                fields=['_rlnCoordinateX', '_rlnImageName'])
+        assert_array_equal(columns['_rlnCoordinateX'], [1213., 1840., 2901.])
+
+    def testChunks(self):
+
+        for (_, _, whole), (_, _, chunked) in zip(iterSTARLoops(STAR),
+                                                  iterSTARLoops(STAR, chunk=2)):
+            self.assertEqual(sorted(whole), sorted(chunked))
+            for field in whole:
+                assert_array_equal(whole[field], chunked[field])
+                self.assertEqual(whole[field].dtype, chunked[field].dtype)
+
+    def testCompressed(self):
+
+        filename = self.filename + '.gz'
+        with open(STAR, 'rb') as inp:
+            data = inp.read()
+        out = gzip.open(filename, 'wb')
+        out.write(data)
+        out.close()
+        try:
+            columns = parseSTARLoop(filename, 'particles')
+        finally:
+            os.remove(filename)
+        assert_array_equal(columns['_rlnCoordinateY'],
+                           parseSTARLoop(STAR, 'particles')['_rlnCoordinateY'])
+
+    def testParseSTAR(self):
+
+        star = parseSTAR(STAR).getDict()
+        for block, index, columns in iterSTARLoops(STAR):
+            loop = star[block][index]
+            self.assertEqual(sorted(loop['fields'].values()), sorted(columns))
+            for field, column in columns.items():
+                values = [loop['data'][i][field] for i in sorted(loop['data'])]
+                assert_array_equal(np.array(values).astype(column.dtype),
+                                   column)
+
+    def testWriteColumns(self):
+
+        loops = {}
+        for block, loop, columns in iterSTARLoops(STAR):
+            loops.setdefault(block, {})[loop] = columns
+        writeSTAR(self.filename, loops)
+
+        written = list(iterSTARLoops(self.filename))
+        self.assertEqual([item[:2] for item in written],
+                         [item[:2] for item in iterSTARLoops(STAR)])
+        for block, loop, columns in written:
+            expected = loops[block][loop]
+            self.assertEqual(sorted(columns), sorted(expected))
+            for field in columns:
+                assert_array_equal(columns[field], expected[field])
+                self.assertEqual(columns[field].dtype.kind,
+                                 expected[field].dtype.kind)
+
+    def testWriteSelectedRows(self):
+
+        columns = parseSTARLoop(STAR, 'particles',
+                                rows=lambda c: c['_rlnClassNumber'] == 1)
+        writeSTAR(self.filename, {'particles': {0: columns}})
+        written = parseSTARLoop(self.filename)
+        assert_array_equal(written['_rlnCoordinateX'], [1213., 412., 2901.])
+        assert_array_equal(written['_rlnImageName'],
+                           columns['_rlnImageName'])
+
+    def testWriteParsedSTAR(self):
+
+        writeSTAR(self.filename, parseSTAR(STAR))
+        for (block, loop, columns), (_, _, expected) in \
+                zip(iterSTARLoops(self.filename), iterSTARLoops(STAR)):
+            for field in expected:
+                assert_array_equal(columns[field], expected[field])
+
+    def testInvalid(self):
+
+        with open(self.filename, 'w') as out:
+            out.write('data_test\n\nloop_\n_a\n_b\n1 2\n3\n')
+        self.assertRaises(TypeError, parseSTARLoop, self.filename)
+        self.assertRaises(IOError, parseSTARLoop,
+                          os.path.join(TEMPDIR, 'prody_missing.star'))
+
+    def tearDown(self):
+
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
@@ -1,3 +1,5 @@
+import pickle
+
 from prody.tests import TestCase
 
 from numpy import array, log, zeros, char
@@ -112,6 +114,20 @@ class TestRefinement(TestCase):
         msa.extend(FASTA)
         assert_equal(msa[numSeq:].getArray(), FASTA.getArray(), 'MSA extension failed')
 
+    def testPickle(self):
+        numSeq = FASTA.numSequences()
+        msa = FASTA[:]
+        msa.extend(FASTA)
+        msa.extend(FASTA)
+        self.assertGreater(len(msa._buffer), len(msa))
+        copied = pickle.loads(pickle.dumps(msa))
+        self.assertIsNone(copied._buffer)
+        assert_equal(copied.getArray(), msa.getArray(), 'MSA pickling failed')
+        assert_equal(copied.getLabels(), msa.getLabels(), 'MSA pickling failed')
+        copied.extend(FASTA)
+        assert_equal(copied[3 * numSeq:].getArray(), FASTA.getArray(),
+                     'MSA extension after pickling failed')
+
 class TestMerging(TestCase):
 
 
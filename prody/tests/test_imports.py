@@ -0,0 +1,66 @@
+"""This module contains unit tests for lazy importing of :mod:`prody`
+subpackages and their dependencies."""
+
+import sys
+import json
+from subprocess import check_output
+
+from prody.tests import unittest
+
+HEAVY = ['Bio', 'matplotlib', 'requests', 'pkg_resources']
+
+SUBPACKAGES = ['kdtree', 'atomic', 'proteins', 'measure', 'database',
+               'sequence', 'dynamics', 'ensemble', 'trajectory',
+               'chromatin', 'domain_decomposition']
+
+
+def loadedModules(code):
+    """Returns names of top level packages and :mod:`prody` subpackages that
+    are imported after running *code* in a new interpreter."""
+
+    code += ('\nimport sys, json\n'
+             'print(json.dumps(sorted(name for name in sys.modules\n'
+             '    if name.count(".") < 2)))')
+    output = check_output([sys.executable, '-c', code])
+    return set(json.loads(output.decode().splitlines()[-1]))
+
+
+@unittest.skipIf(sys.version_info[:2] < (3, 7),
+                 'subpackages are imported eagerly before Python 3.7')
+class TestLazyImports(unittest.TestCase):
+
+    def testImportProDy(self):
+
+        modules = loadedModules('import prody')
+        for name in HEAVY:
+            self.assertNotIn(name, modules,
+                             '{0} is imported with prody'.format(name))
+        for name in SUBPACKAGES:
+            self.assertNotIn('prody.' + name, modules,
+                             'prody.{0} is imported with prody'.format(name))
+
+    def testAttributeAccess(self):
+
+        modules = loadedModules('import prody\nprody.ANM')
+        self.assertIn('prody.dynamics', modules)
+        for name in ['database', 'chromatin', 'domain_decomposition']:
+            self.assertNotIn('prody.' + name, modules,
+                             'prody.{0} is imported for prody.ANM'
+                             .format(name))
+        for name in HEAVY:
+            self.assertNotIn(name, modules,
+                             '{0} is imported for prody.ANM'.format(name))
+
+    def testStarImport(self):
+
+        code = ('from prody import *\nimport prody\n'
+                'missing = [name for name in prody.__all__\n'
+                '           if name not in globals()]\n'
+                'assert not missing, missing')
+        modules = loadedModules(code)
+        for name in SUBPACKAGES:
+            self.assertIn('prody.' + name, modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
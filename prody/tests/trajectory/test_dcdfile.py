@@ -46,3 +46,14 @@ class TestDCDFile(TestCase):
         assert_allclose(coordsets[:n_csets], ENSEMBLE._getCoordsets(),
                         rtol=RTOL, atol=ATOL,
                         err_msg='failed to parse DCD file correctly')
+
+    def testNextCoordsets(self):
+        dcd = DCDFile(writeDCD(self.dcd, ENSEMBLE))
+        coordsets = dcd.getCoordsets()
+        n_csets = len(coordsets)
+        assert_equal(dcd.nextCoordsets(2), coordsets[:2],
+                     'failed to read coordinate sets in blocks')
+        assert_equal(dcd.nextCoordsets(n_csets), coordsets[2:],
+                     'failed to read coordinate sets in blocks')
+        self.assertIsNone(dcd.nextCoordsets(1))
+        dcd.close()
@@ -0,0 +1,102 @@
+import os
+import json
+
+from prody.tests import TestCase, TEMPDIR
+
+from prody.utilities import PackageLogger
+
+
+class TestTrace(TestCase):
+
+    def setUp(self):
+
+        self.logger = PackageLogger('.prody_test_trace')
+        self.logger.verbosity = 'none'
+
+    def testDisabled(self):
+
+        self.logger.timeit('_outer')
+        self.logger.report('%.2f', '_outer')
+        self.assertIsNone(self.logger.getTracer())
+        self.assertRaises(ValueError, self.logger.exportTrace,
+                          os.path.join(TEMPDIR, 'trace.json'))
+
+    def testNestedSpans(self):
+
+        self.logger.trace = True
+        self.logger.timeit('_outer')
+        for i in range(3):
+            self.logger.timeit('_inner')
+            self.logger.report('%.2f', '_inner')
+        self.logger.report('%.2f', '_outer')
+
+        tracer = self.logger.getTracer()
+        spans = tracer.getSpans()
+        self.assertEqual([span['label'] for span in spans],
+                         ['_inner'] * 3 + ['_outer'])
+        self.assertEqual([span['parent'] for span in spans],
+                         ['_outer'] * 3 + [None])
+        for span in spans:
+            self.assertEqual(span['function'], 'testNestedSpans')
+            self.assertTrue(span['callsite'].startswith(__file__.rstrip('c')))
+        self.assertGreaterEqual(spans[-1]['duration'],
+                                sum(span['duration'] for span in spans[:3]))
+
+        metrics = tracer.getMetrics()
+        self.assertEqual(metrics['_inner']['count'], 3)
+        self.assertEqual(metrics['_outer']['count'], 1)
+        self.assertAlmostEqual(metrics['_inner']['total'],
+                               sum(span['duration'] for span in spans[:3]))
+
+    def testRestartAndUnmatched(self):
+
+        self.logger.trace = True
+        self.logger.timeit('_span')
+        self.logger.timeit('_span')
+        self.logger.report('%.2f', '_span')
+        self.logger.timeit('_open')
+        tracer = self.logger.getTracer()
+        self.assertEqual(len(tracer.getSpans()), 1)
+        self.assertIsNone(tracer.stop('_missing'))
+
+        self.logger.trace = False
+        self.assertIsNone(self.logger.getTracer())
+
+    def testPolledSpan(self):
+
+        self.logger.trace = True
+        self.logger.timeit('_a')
+        self.logger.timing('_a')
+        self.logger.timeit('_b')
+        self.logger.report('%.2f', '_b')
+        self.logger.report('%.2f', '_a')
+
+        spans = self.logger.getTracer().getSpans()
+        self.assertEqual([span['label'] for span in spans], ['_b', '_a'])
+        self.assertEqual([span['parent'] for span in spans], [None, None])
+
+    def testExport(self):
+
+        self.logger.trace = True
+        self.logger.timeit()
+        self.logger.report('%.2f')
+        filename = os.path.join(TEMPDIR, 'prody_test_trace.json')
+        try:
+            self.logger.exportTrace(filename)
+            with open(filename) as inp:
+                data = json.load(inp)
+            self.assertEqual(data['metrics']['None']['count'], 1)
+            self.assertEqual(len(data['spans']), 1)
+
+            self.logger.exportTrace(filename, 'chrome')
+            with open(filename) as inp:
+                data = json.load(inp)
+            event = data['traceEvents'][0]
+            self.assertEqual(event['ph'], 'X')
+            self.assertEqual(event['name'], 'None')
+        finally:
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+        self.assertRaises(ValueError, self.logger.exportTrace, filename,
+                          'xml')
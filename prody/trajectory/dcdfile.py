@@ -287,6 +287,38 @@ class DCDFile(TrajFile):
 
     nextCoordset.__doc__ = TrajBase.nextCoordset.__doc__
 
+    def nextCoordsets(self, n):
+
+        if self._closed:
+            raise ValueError('I/O operation on closed file')
+        n = min(int(n), self._n_csets - self._nfi)
+        if n <= 0:
+            return None
+
+        # frames are read at once and unit cell data is skipped
+        n_bytes = self._bytes_per_frame
+        data = self._file.read(n_bytes * n)
+        n = len(data) // n_bytes
+        if n == 0:
+            return None
+        data = np.frombuffer(data[:n * n_bytes], np.uint8).reshape((n, n_bytes))
+        if self._unitcell:
+            data = data[:, 56:]
+        xyz = np.ascontiguousarray(data).view(self._dtype)
+        xyz = xyz.reshape((n, 3, self._n_atoms + 2))[:, :, 1:-1]
+        xyz = xyz.transpose(0, 2, 1)
+        if self._ag is not None:
+            self._ag._setCoords(xyz[-1].copy(), self._title + ' frame ' +
+                                str(self._nfi + n - 1), overwrite=True)
+        self._nfi += n
+        if self._astype is not None and self._astype != xyz.dtype:
+            xyz = xyz.astype(self._astype)
+        if self._indices is not None:
+            xyz = xyz[:, self._indices]
+        return xyz
+
+    nextCoordsets.__doc__ = TrajBase.nextCoordsets.__doc__
+
     def _nextUnitcell(self):
 
         if self._unitcell:
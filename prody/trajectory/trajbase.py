@@ -2,7 +2,7 @@
 """This module defines base class for trajectory handling."""
 
 from numbers import Integral
-from numpy import ndarray, unique
+from numpy import ndarray, unique, array
 
 from prody.ensemble import Ensemble
 from prody.utilities import checkCoords, checkWeights
@@ -326,6 +326,20 @@ class TrajBase(object):
 
         pass
 
+    def nextCoordsets(self, n):
+        """Returns next *n* coordinate sets in an array with shape
+        ``(n, n_atoms, 3)``, or fewer if the trajectory ends.  **None** is
+        returned when there are no frames left."""
+
+        coords = []
+        for i in range(n):
+            xyz = self.nextCoordset()
+            if xyz is None:
+                break
+            coords.append(xyz)
+        if coords:
+            return array(coords)
+
     def __next__(self):
         """Returns next coordinate set in a :class:`.Frame` instance.  Note that
         when atoms are set for the trajectory, this method will return the same
@@ -10,6 +10,7 @@ Package utilities
 ===============================================================================
 
   * :class:`.PackageLogger`
+  * :class:`.PackageTracer`
   * :class:`.PackageSettings`
   * :func:`.getPackagePath`
   * :func:`.setPackagePath`
@@ -8,8 +8,9 @@ import logging
 import datetime
 import logging.handlers
 import numbers
+import threading
 
-__all__ = ['PackageLogger', 'LOGGING_LEVELS']
+__all__ = ['PackageLogger', 'PackageTracer', 'LOGGING_LEVELS']
 
 LOGGING_PROGRESS = logging.INFO + 5
 
@@ -26,6 +27,159 @@ for key, value in LOGGING_LEVELS.items(): # PY3K: OK
 
 now = datetime.datetime.now
 
+clock = getattr(time, 'perf_counter', time.time)
+
+class PackageTracer(object):
+
+    """A class for recording spans that are labeled by calls to
+    :meth:`.PackageLogger.timeit` and :meth:`.PackageLogger.report`.  Each
+    span has a start time and duration in seconds, the call-site where it
+    was started, and the label of the span that it is nested in.  Count,
+    total, minimum, and maximum durations are aggregated for each label.
+    At most *maxspans* spans are kept, but aggregates include all spans."""
+
+    def __init__(self, maxspans=100000):
+
+        self._maxspans = int(maxspans)
+        self.reset()
+
+    def reset(self):
+        """Remove recorded spans and aggregated counters."""
+
+        self._epoch = time.time()
+        self._start = clock()
+        self._open = {}
+        self._stacks = {}
+        self._spans = []
+        self._metrics = {}
+        self._dropped = 0
+
+    def start(self, label, depth=1):
+        """Start a span for *label*.  Call-site is the caller *depth* frames
+        above the caller of this method.  Starting a span for a label that
+        is already open restarts it."""
+
+        frame = sys._getframe(depth + 1)
+        thread = threading.current_thread().ident
+        stack = self._stacks.setdefault(thread, [])
+        span = self._open.pop((thread, label), None)
+        if span is not None and span in stack:
+            stack.remove(span)
+        span = {'label': label,
+                'start': clock() - self._start,
+                'duration': None,
+                'callsite': '{0}:{1}'.format(frame.f_code.co_filename,
+                                             frame.f_lineno),
+                'function': frame.f_code.co_name,
+                'parent': stack[-1]['label'] if stack else None,
+                'thread': thread}
+        self._open[(thread, label)] = span
+        stack.append(span)
+
+    def stop(self, label):
+        """Stop span for *label* and return it.  **None** is returned, when
+        no span is open for *label*."""
+
+        thread = threading.current_thread().ident
+        span = self._open.pop((thread, label), None)
+        if span is None:
+            return None
+        stack = self._stacks[thread]
+        if span in stack:
+            stack.remove(span)
+        duration = span['duration'] = clock() - self._start - span['start']
+
+        if len(self._spans) < self._maxspans:
+            self._spans.append(span)
+        else:
+            self._dropped += 1
+
+        metrics = self._metrics.get(label)
+        if metrics is None:
+            self._metrics[label] = {'count': 1, 'total': duration,
+                                    'min': duration, 'max': duration}
+        else:
+            metrics['count'] += 1
+            metrics['total'] += duration
+            metrics['min'] = min(metrics['min'], duration)
+            metrics['max'] = max(metrics['max'], duration)
+        return span
+
+    def detach(self, label):
+        """Remove open span for *label* from the nesting stack, so that it is
+        not recorded as the parent of spans started later.  The span remains
+        open and is completed by :meth:`stop`."""
+
+        thread = threading.current_thread().ident
+        span = self._open.get((thread, label))
+        if span is not None:
+            stack = self._stacks[thread]
+            if span in stack:
+                stack.remove(span)
+
+    def getSpans(self):
+        """Returns a list of completed spans in the order they stopped."""
+
+        return [dict(span) for span in self._spans]
+
+    def getMetrics(self):
+        """Returns a dictionary that maps labels to aggregated counters,
+        which are *count*, *total*, *min*, *max*, and *mean* durations."""
+
+        metrics = {}
+        for label, values in self._metrics.items():
+            values = dict(values)
+            values['mean'] = values['total'] / values['count']
+            metrics[label] = values
+        return metrics
+
+    def numDropped(self):
+        """Returns number of completed spans that were not kept, because
+        *maxspans* was reached."""
+
+        return self._dropped
+
+    def toDict(self, format='json'):
+        """Returns recorded spans and counters as a dictionary that can be
+        written as a JSON file.  *format* may be ``'json'``, or ``'chrome'``
+        for trace event format that can be loaded in ``chrome://tracing``
+        or Perfetto."""
+
+        if format == 'json':
+            metrics = self.getMetrics()
+            return {'epoch': self._epoch,
+                    'dropped': self._dropped,
+                    'spans': self.getSpans(),
+                    'metrics': dict((str(label), metrics[label])
+                                    for label in metrics)}
+        elif format == 'chrome':
+            pid = os.getpid()
+            events = []
+            for span in self._spans:
+                args = {'callsite': span['callsite'],
+                        'function': span['function']}
+                if span['parent'] is not None:
+                    args['parent'] = str(span['parent'])
+                events.append({'name': str(span['label']), 'cat': 'prody',
+                               'ph': 'X', 'pid': pid, 'tid': span['thread'],
+                               'ts': span['start'] * 1e6,
+                               'dur': span['duration'] * 1e6, 'args': args})
+            return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+        else:
+            raise ValueError("format must be 'json' or 'chrome'")
+
+    def export(self, filename, format='json'):
+        """Write recorded spans and counters into *filename* in *format*,
+        see :meth:`toDict`, and return *filename*."""
+
+        import json
+
+        data = self.toDict(format)
+        with open(filename, 'w') as out:
+            json.dump(data, out, indent=1)
+        return filename
+
+
 class PackageLogger(object):
 
     """A class for package wide logging functionality."""
@@ -67,6 +221,7 @@ class PackageLogger(object):
         self._prev = None
         self._line = None
         self._times = {}
+        self._tracer = None
 
         self._n_progress = 0
 
@@ -100,6 +255,39 @@ class PackageLogger(object):
         none      Nothing will be printed.
         ========  =============================================""")
 
+    def _gettrace(self):
+
+        return self._tracer is not None
+
+    def _settrace(self, trace):
+
+        if not trace:
+            self._tracer = None
+        elif self._tracer is None:
+            self._tracer = PackageTracer()
+
+    trace = property(_gettrace, _settrace, doc=
+        """When **True**, spans labeled by calls to :meth:`timeit` and
+        :meth:`report` are recorded by a :class:`.PackageTracer`, which
+        can be accessed using :meth:`getTracer`.  Setting **False** discards
+        recorded spans.  Default is **False**, in which case timing has no
+        overhead.""")
+
+    def getTracer(self):
+        """Returns :class:`.PackageTracer` instance that records spans, or
+        **None** when :attr:`trace` is **False**."""
+
+        return self._tracer
+
+    def exportTrace(self, filename, format='json'):
+        """Write spans and counters recorded so far into *filename* in
+        *format*, ``'json'`` or ``'chrome'``, and return *filename*.  See
+        :meth:`.PackageTracer.toDict` for formats."""
+
+        if self._tracer is None:
+            raise ValueError('tracing is not turned on')
+        return self._tracer.export(filename, format)
+
     def _getprefix(self):
 
         return self._prefix
@@ -306,17 +494,27 @@ class PackageLogger(object):
 
     def timeit(self, label=None):
         """Start timing a process.  Use :meth:`timing` and :meth:`report` to
-        learn and report timing, respectively."""
+        learn and report timing, respectively.  When :attr:`trace` is
+        **True**, a span is started for *label*."""
 
         self._times[label] = time.time()
+        if self._tracer is not None:
+            self._tracer.start(label)
 
     def timing(self, label=None):
-        """Returns timing for a labeled or default (**None**) process."""
+        """Returns timing for a labeled or default (**None**) process.  When
+        :attr:`trace` is **True**, span for *label* is detached from nesting,
+        since processes that are polled for timing may never be reported."""
 
+        if self._tracer is not None:
+            self._tracer.detach(label)
         return time.time() - self._times.get(label, 0)
 
     def report(self, msg='Completed in %.2fs.', label=None):
         """Write *msg* with timing information for a labeled or default process
-        at *debug* logging level."""
+        at *debug* logging level.  When :attr:`trace` is **True**, span for
+        *label* is stopped."""
 
+        if self._tracer is not None:
+            self._tracer.stop(label)
         self.debug(msg % (time.time() - self._times[label]))
@@ -16,7 +16,7 @@ __all__ = ['Everything', 'rangeString', 'alnum', 'importLA', 'dictElement',
            'saxsWater', 'count', 'addEnds', 'copy', 'dictElementLoop', 
            'getDataPath', 'openData', 'chr2', 'toChararray', 'interpY', 'cmp',
            'getValue', 'indentElement', 'isPDB', 'isURL', 'isListLike',
-           'getDistance', 'fastin', 'createStringIO']
+           'getDistance', 'fastin', 'createStringIO', 'extendArray']
 
 # Note that the chain id can be blank (space). Examples:
 # 3TT1, 3tt1A, 3tt1:A, 3tt1_A, 3tt1-A, 3tt1 A
@@ -272,9 +272,74 @@ def copy(x):
         return None
     return x.copy()
 
+def extendArray(array, values, buffer=None):
+    """Returns ``(array, buffer)`` where *array* is a view of the first rows
+    of *buffer* holding the rows of *array* followed by the rows of *values*.
+    When *array* is a view of *buffer* that has room for *values*, they are
+    copied into place; otherwise, a new buffer with twice the needed capacity
+    is allocated, so that appending rows one at a time takes amortized linear
+    time. If *buffer* is a :class:`numpy.memmap` instance, the new buffer
+    grows the same file.
+
+    :arg array: array to extend, may be **None**
+    :type array: :class:`~numpy.ndarray`
+
+    :arg values: rows to append, e.g. an array with shape ``(n, ...)``
+    :type values: :class:`~numpy.ndarray`
+
+    :arg buffer: buffer that *array* is a view of, default is **None**
+    :type buffer: :class:`~numpy.ndarray`"""
+
+    from numpy import empty, memmap, promote_types, may_share_memory
+
+    if array is not None and array.shape[1:] != values.shape[1:]:
+        raise ValueError('shapes of array and values do not match')
+
+    n = 0 if array is None else len(array)
+    m = n + len(values)
+
+    owned = buffer is not None and (array is None or (array.base is buffer
+             and array.__array_interface__['data'][0] ==
+                 buffer.__array_interface__['data'][0]))
+
+    if owned and len(buffer) >= m and buffer.shape[1:] == values.shape[1:] \
+        and buffer.dtype == promote_types(buffer.dtype, values.dtype):
+        buffer[n:m] = values
+        return buffer[:m], buffer
+
+    if array is None:
+        if buffer is None:
+            return values, None
+        dtype = values.dtype
+    else:
+        dtype = promote_types(array.dtype, values.dtype)
+
+    capacity = max(m, 2 * n)
+    if isinstance(buffer, memmap) and buffer.filename:
+        # rows of an owned buffer are already in place in the file
+        inplace = owned and buffer.dtype == dtype
+        if not inplace and array is not None and may_share_memory(array, buffer):
+            array = array.copy()
+        if buffer.dtype == dtype:
+            capacity = max(capacity, len(buffer))
+        # mode r+ keeps the contents of the file and extends it as needed
+        buffer.flush()
+        new = memmap(buffer.filename, dtype=dtype, mode='r+',
+                     shape=(capacity,) + values.shape[1:])
+    else:
+        inplace = False
+        new = empty((capacity,) + values.shape[1:], dtype)
+        if isinstance(values, chararray) or isinstance(array, chararray):
+            new = new.view(chararray)
+
+    if n and not inplace:
+        new[:n] = array
+    new[n:m] = values
+    return new[:m], new
+
 def getDataPath(filename):
-    import pkg_resources
-    return pkg_resources.resource_filename('prody.utilities', 'datafiles/%s'%filename)
+    from os.path import dirname, join
+    return join(dirname(__file__), 'datafiles', filename)
 
 def openData(filename, mode='r'):
     return open(getDataPath(filename), mode)
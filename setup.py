@@ -83,7 +83,8 @@ PACKAGE_DATA = {
                     'datafiles/*.coo',
                     'datafiles/dcd*.dcd',
                     'datafiles/xml*.xml',
-                    'datafiles/msa*',]
+                    'datafiles/msa*',
+                    'datafiles/star*.star',]
 }
 
 PACKAGE_DIR = {}